@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the model instance pool
+Keeps the total core count fixed and measures generation throughput for pool sizes 1, 2, 4, ...
+
+Usage: python bench_model_pool.py [model_name] [total_cores] [requests]
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# Add backend directory to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '../python-backend'))
+
+from gpt4all import GPT4All
+from model_pool import ModelPool, available_cores
+
+PREFIX = "You are JARVIS, a helpful AI assistant. Answer in one short sentence.\n"
+PROMPTS = [
+    "\nUser: What is the capital of France?\nJARVIS:",
+    "\nUser: Give me a tip for staying focused.\nJARVIS:",
+    "\nUser: What does a CPU do?\nJARVIS:",
+    "\nUser: Suggest a name for a cat.\nJARVIS:",
+]
+MAX_TOKENS = 48
+
+async def run(pool: ModelPool, requests: int) -> float:
+    """Send all requests at once and return requests per second"""
+    await pool.start()
+    await pool.warm_up(PROMPTS[0])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        pool.generate(PROMPTS[i % len(PROMPTS)], max_tokens=MAX_TOKENS, temp=0.0)
+        for i in range(requests)
+    ))
+    return requests / (time.perf_counter() - start)
+
+def main():
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "orca-mini-3b-gguf2-q4_0.gguf"
+    cores = available_cores()
+    total_cores = int(sys.argv[2]) if len(sys.argv) > 2 else len(cores)
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    cores = cores[:total_cores]
+
+    try:
+        GPT4All.retrieve_model(model_name, allow_download=False)
+    except Exception as e:
+        print(f"Model {model_name} is not available: {e}")
+        return
+
+    print(f"{total_cores} cores, {requests} concurrent requests, {MAX_TOKENS} tokens each")
+    baseline = None
+    size = 1
+    while size <= total_cores:
+        pool = ModelPool.load(
+            lambda n_threads: GPT4All(model_name, allow_download=False, n_threads=n_threads),
+            size, PREFIX, max_queue_size=requests, cores=cores
+        )
+        try:
+            throughput = asyncio.run(run(pool, requests))
+        finally:
+            pool.close()
+
+        baseline = baseline or throughput
+        print(f"pool size {size:2d} ({total_cores // size:2d} threads each): "
+              f"{throughput:.2f} req/s ({throughput / baseline:.2f}x)")
+        size *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-request action selection in the prompt
+Compares the full action catalogue with the top-k prefiltered one: prompt
+tokens, whether the expected action survives the prefilter, and end-to-end
+latency with and without prompt-prefix reuse.
+
+Latency uses the GPT4All model if it is available, otherwise the mock
+backend's CPU latency model.
+
+Usage: python bench_prompt_selection.py [model_name] [top_k]
+"""
+
+import statistics
+import sys
+import os
+import time
+
+# Add backend directory to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '../python-backend'))
+
+from action_catalog import EXAMPLES, LLM_ACTIONS, PROMPT_PREAMBLE, ActionPrefilter, render_catalogue
+from llm_backends import MockModel
+from session_store import estimate_tokens
+
+UTTERANCES = [
+    ("Remind me to call mom in 10 minutes", "set_alarm"),
+    ("How busy is my CPU right now?", "get_system_info"),
+    ("Open spotify", "open_app"),
+    # Not selectable by the model: the prompt should lead to a null action
+    ("Delete notes.txt", None),
+    ("Find my pdf files in Downloads", "find_files"),
+    ("What reminders do I have?", "list_alarms"),
+    ("Cancel alarm 2", None),
+    ("Write a note about groceries", "create_document"),
+    ("Say good morning", "speak"),
+    ("Run ls in the terminal", None),
+    ("Which microphones do I have?", "get_voice_info"),
+    ("Tell me a joke", None),
+]
+MAX_TOKENS = 64
+
+def build_prompts(top_k: int):
+    """(static prefix, per-request suffix) for every utterance, full and selected"""
+    prefilter = ActionPrefilter()
+    full_prefix = PROMPT_PREAMBLE + "\n\n" + render_catalogue(LLM_ACTIONS, EXAMPLES)
+    full, selected, hits = [], [], 0
+    for utterance, expected in UTTERANCES:
+        turn = f"\n\nUser: {utterance}\nJARVIS:"
+        actions, examples = prefilter.select(utterance, top_k)
+        hits += expected is None or expected in [spec.name for spec in actions]
+        full.append((full_prefix, turn))
+        selected.append((PROMPT_PREAMBLE, "\n\n" + render_catalogue(actions, examples) + turn))
+    return full, selected, hits
+
+def load_model(model_name: str):
+    try:
+        from gpt4all import GPT4All
+        return GPT4All(model_name, allow_download=False), model_name
+    except Exception as e:
+        print(f"Model {model_name} is not available ({e}); using the mock latency model")
+        return MockModel(prompt_eval_ms=2.0, tokens_per_second=15.0, jitter=0.0, seed=0), "mock"
+
+def latency(model, prompts, reuse_prefix: bool) -> float:
+    """Median seconds per request"""
+    samples = []
+    for prefix, suffix in prompts:
+        start = time.perf_counter()
+        if reuse_prefix and hasattr(model, "generate_with_prefix"):
+            model.generate_with_prefix(prefix, suffix, max_tokens=MAX_TOKENS)
+        else:
+            model.generate(prefix + suffix, max_tokens=MAX_TOKENS, temp=0.0)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "orca-mini-3b-gguf2-q4_0.gguf"
+    top_k = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    full, selected, hits = build_prompts(top_k)
+    print(f"{len(LLM_ACTIONS)} actions in the catalogue, top {top_k} selected per request")
+    print(f"Prefilter kept the expected action for {hits}/{len(UTTERANCES)} utterances\n")
+
+    print(f"{'':12} {'prompt tokens':>14} {'evaluated/request':>18}")
+    for name, prompts in [("full", full), (f"top-{top_k}", selected)]:
+        total = statistics.mean(estimate_tokens(prefix + suffix) for prefix, suffix in prompts)
+        # With the prefix cache only the suffix is evaluated per request
+        evaluated = statistics.mean(estimate_tokens(suffix) for _, suffix in prompts)
+        print(f"{name:12} {total:14.0f} {evaluated:18.0f}")
+
+    model, label = load_model(model_name)
+    print(f"\nMedian end-to-end latency ({label}, up to {MAX_TOKENS} tokens):")
+    for name, prompts in [("full", full), (f"top-{top_k}", selected)]:
+        cold = latency(model, prompts, reuse_prefix=False)
+        warm = latency(model, prompts, reuse_prefix=True)
+        print(f"{name:12} no prefix reuse {cold * 1000:8.0f} ms   prefix reused {warm * 1000:8.0f} ms")
+
+if __name__ == "__main__":
+    main()
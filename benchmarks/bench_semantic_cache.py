@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the semantic response cache lookup
+Fills the cache with 100k synthetic embeddings and measures lookup latency and recall
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add backend directory to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '../python-backend'))
+
+from semantic_cache import SemanticCache
+
+ENTRIES = 100_000
+DIM = 384  # all-MiniLM-L6-v2, the default Embed4All model
+QUERIES = 2000
+
+def main():
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((ENTRIES, DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    cache = SemanticCache(dim=DIM, capacity=ENTRIES, threshold=0.9, n_lists=1024, nprobe=8)
+    
+    start = time.perf_counter()
+    for i in range(ENTRIES):
+        cache.add(vectors[i], {"response": f"answer {i}", "action": None, "params": {}})
+    print(f"Filled {ENTRIES} entries in {time.perf_counter() - start:.1f}s")
+    
+    # Paraphrase queries: stored vectors plus noise, cosine similarity ~0.95
+    targets = rng.choice(ENTRIES, QUERIES, replace=False)
+    noise = rng.standard_normal((QUERIES, DIM)).astype(np.float32)
+    noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+    queries = vectors[targets] + 0.33 * noise
+    
+    # Unrelated queries that should miss
+    misses = rng.standard_normal((QUERIES, DIM)).astype(np.float32)
+    
+    timings = []
+    found = 0
+    for target, query in zip(targets, queries):
+        start = time.perf_counter()
+        result = cache.lookup(query)
+        timings.append(time.perf_counter() - start)
+        if result is not None and result["response"] == f"answer {target}":
+            found += 1
+    
+    false_hits = sum(cache.lookup(query) is not None for query in misses)
+    
+    timings_ms = np.array(timings) * 1000
+    print(f"Lookup latency: mean {timings_ms.mean():.3f} ms, "
+          f"p50 {np.percentile(timings_ms, 50):.3f} ms, p99 {np.percentile(timings_ms, 99):.3f} ms")
+    print(f"Recall on paraphrases: {found / QUERIES:.1%}, false hits on unrelated queries: {false_hits}")
+    
+    # Reference: exhaustive scan of the full matrix
+    start = time.perf_counter()
+    for query in queries[:100]:
+        np.argmax(cache.vectors @ (query / np.linalg.norm(query)))
+    print(f"Exhaustive scan for comparison: {(time.perf_counter() - start) / 100 * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
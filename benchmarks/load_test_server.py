@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Load test for a running JARVIS backend over the WebSocket chat API
+Opens concurrent clients that each send a series of chats and reports time to
+first streamed token, total latency and failures.
+
+Run the backend with the latency-model mock to load-test without a model file,
+e.g. settings.json: {"mock_mode": true, "mock_prompt_eval_ms": 0.5,
+"mock_tokens_per_second": 15, "mock_jitter": 0.2, "mock_failure_rate": 0.01}
+
+Usage: python load_test_server.py [ws_url] [clients] [messages_per_client]
+"""
+
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+import websockets
+
+MESSAGES = [
+    "What can you do?",
+    "Tell me something interesting",
+    "Write a short note about testing",
+    "How busy is my computer?",
+]
+
+async def client(url: str, client_id: int, messages: int, results: list):
+    async with websockets.connect(url) as ws:
+        for i in range(messages):
+            message_id = f"{client_id}-{i}"
+            started = time.perf_counter()
+            first_token = None
+            await ws.send(json.dumps({
+                "type": "chat",
+                "id": message_id,
+                "session_id": f"load-{client_id}",
+                "message": f"{MESSAGES[i % len(MESSAGES)]} ({message_id})",
+                "force_llm": True,
+                # Delta frames are opt-in; time to first token is measured from them
+                "stream": True
+            }))
+
+            while True:
+                frame = json.loads(await ws.recv())
+                if frame.get("id") != message_id:
+                    continue
+                if frame["type"] == "chat_response_delta" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif frame["type"] == "chat_response":
+                    data = frame["data"]
+                    results.append({
+                        "ttft": first_token,
+                        "total": time.perf_counter() - started,
+                        "failed": "error" in data.get("response", "") or "busy" in data.get("response", ""),
+                        "queue_wait_ms": (data.get("queue") or {}).get("queue_wait_ms")
+                    })
+                    break
+
+def report(name: str, values):
+    values = np.array([v for v in values if v is not None]) * 1000
+    if len(values) == 0:
+        print(f"{name}: no samples")
+        return
+    print(f"{name}: p50 {np.percentile(values, 50):.0f} ms, p95 {np.percentile(values, 95):.0f} ms, "
+          f"max {values.max():.0f} ms")
+
+async def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "ws://127.0.0.1:8000/ws"
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    messages = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    results = []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(url, i, messages, results) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(results)} chats from {clients} clients in {elapsed:.1f}s ({len(results) / elapsed:.2f} chats/s)")
+    report("Time to first token", [r["ttft"] for r in results])
+    report("Total latency", [r["total"] for r in results])
+    report("Queue wait", [r["queue_wait_ms"] / 1000 if r["queue_wait_ms"] is not None else None for r in results])
+    print(f"Failed or rejected: {sum(r['failed'] for r in results)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -21,6 +21,13 @@ class ChatManager {
             }
         });
 
+        // First keystroke of a message: have the model loaded by the time it is sent
+        messageInput?.addEventListener('input', () => {
+            if (messageInput.value.length === 1) {
+                window.ipcManager?.prewarm();
+            }
+        });
+
         sendBtn?.addEventListener('click', () => {
             this.sendMessage();
         });
@@ -1,6 +1,7 @@
 const { app, BrowserWindow, Menu, ipcMain } = require('electron');
 const path = require('path');
 const { spawn } = require('child_process');
+const crypto = require('crypto');
 const WebSocket = require('ws');
 const Store = require('electron-store');
 const fs = require('fs');
@@ -21,6 +22,13 @@ const settings = {
     autoStart: store.get('autoStart', false)
 };
 
+// One conversation per install: the backend keeps its history, and a message
+// resent after a reconnect joins the generation already running for it
+if (!store.has('sessionId')) {
+    store.set('sessionId', crypto.randomUUID());
+}
+const sessionId = store.get('sessionId');
+
 function createMainWindow() {
     console.log('Creating main window...');
     
@@ -307,18 +315,27 @@ async function sendToPython(message) {
             id: messageId,
             type: 'chat',
             message: message,
+            session_id: sessionId,
+            // Reply text arrives as chat_response_delta frames before the final chat_response
+            stream: true,
             timestamp: new Date().toISOString()
         };
 
         // Set up response handler with timeout
         const timeout = setTimeout(() => {
+            ws.off('message', responseHandler);
             reject(new Error('Request timeout'));
         }, 30000);
 
         const responseHandler = (data) => {
             try {
                 const response = JSON.parse(data);
-                if (response.type === 'chat_response') {
+                if (response.id !== messageId) return;
+                if (response.type === 'chat_response_delta') {
+                    if (mainWindow) {
+                        mainWindow.webContents.send('chat-delta', response.data.delta);
+                    }
+                } else if (response.type === 'chat_response') {
                     clearTimeout(timeout);
                     ws.off('message', responseHandler);
                     resolve(response);
@@ -1,6 +1,7 @@
 const { app, BrowserWindow, Menu, Tray, ipcMain, shell, dialog } = require('electron');
 const path = require('path');
 const { spawn } = require('child_process');
+const crypto = require('crypto');
 const WebSocket = require('ws');
 const Store = require('electron-store');
 
@@ -22,6 +23,13 @@ class JarvisApp {
             autoStart: store.get('autoStart', false),
             pythonPort: store.get('pythonPort', 8000)
         };
+
+        // One conversation per install: the backend keeps its history, and a message
+        // resent after a reconnect joins the generation already running for it
+        if (!store.has('sessionId')) {
+            store.set('sessionId', crypto.randomUUID());
+        }
+        this.sessionId = store.get('sessionId');
     }
 
     async init() {
@@ -82,6 +90,11 @@ class JarvisApp {
             }
         });
 
+        // The backend may have unloaded an idle model; start reloading it before the user types
+        this.mainWindow.on('focus', () => {
+            this.prewarmModel();
+        });
+
         this.mainWindow.on('closed', () => {
             this.mainWindow = null;
         });
@@ -240,6 +253,10 @@ class JarvisApp {
             return await this.sendToPython(message);
         });
 
+        ipcMain.on('prewarm', () => {
+            this.prewarmModel();
+        });
+
         ipcMain.handle('get-backend-status', () => {
             return {
                 connected: this.ws && this.ws.readyState === WebSocket.OPEN,
@@ -354,6 +371,12 @@ class JarvisApp {
         }
     }
 
+    prewarmModel() {
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.ws.send(JSON.stringify({ type: 'prewarm' }));
+        }
+    }
+
     async sendToPython(message) {
         return new Promise((resolve, reject) => {
             if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
@@ -366,31 +389,41 @@ class JarvisApp {
                 id: messageId,
                 type: 'chat',
                 message: message,
+                session_id: this.sessionId,
+                // Reply text arrives as chat_response_delta frames before the final chat_response
+                stream: true,
                 timestamp: new Date().toISOString()
             };
 
-            // Set up response handler
+            // Set up response handler; only the final chat_response for this message completes it
             const responseHandler = (data) => {
                 try {
                     const response = JSON.parse(data);
-                    if (response.id === messageId || response.type === 'chat_response') {
+                    if (response.id !== messageId) return;
+                    if (response.type === 'chat_response_delta') {
+                        if (this.mainWindow) {
+                            this.mainWindow.webContents.send('chat-delta', response.data.delta);
+                        }
+                    } else if (response.type === 'chat_response') {
+                        clearTimeout(timeout);
                         this.ws.off('message', responseHandler);
                         resolve(response);
                     }
                 } catch (error) {
+                    clearTimeout(timeout);
                     this.ws.off('message', responseHandler);
                     reject(error);
                 }
             };
 
-            this.ws.on('message', responseHandler);
-            this.ws.send(JSON.stringify(fullMessage));
-
             // Timeout after 30 seconds
-            setTimeout(() => {
+            const timeout = setTimeout(() => {
                 this.ws.off('message', responseHandler);
                 reject(new Error('Request timeout'));
             }, 30000);
+
+            this.ws.on('message', responseHandler);
+            this.ws.send(JSON.stringify(fullMessage));
         });
     }
 
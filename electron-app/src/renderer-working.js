@@ -7,6 +7,8 @@ class WorkingJarvisRenderer {
         this.isInitialized = false;
         this.messageHistory = [];
         this.isProcessing = false;
+        // Bubble of the reply being streamed, if any
+        this.streamingReply = null;
         this.backendConnected = false;
         this.init();
     }
@@ -204,6 +206,11 @@ class WorkingJarvisRenderer {
             this.updateBackendStatus(status);
         });
 
+        // Reply text for the message being answered, as the model writes it
+        ipcRenderer.on('chat-delta', (event, delta) => {
+            this.appendDelta(delta);
+        });
+
         // Check initial backend status
         this.checkBackendStatus();
     }
@@ -278,11 +285,43 @@ class WorkingJarvisRenderer {
         } finally {
             this.isProcessing = false;
             this.showTypingIndicator(false);
+            this.streamingReply = null;
+        }
+    }
+
+    appendDelta(delta) {
+        if (!this.isProcessing || !delta) return;
+
+        // The first delta opens the reply bubble; later ones extend it
+        if (!this.streamingReply) {
+            this.showTypingIndicator(false);
+            this.addMessage('', 'ai');
+            const bubbles = document.querySelectorAll('#chatMessages .ai-message .message-text');
+            this.streamingReply = {
+                textDiv: bubbles[bubbles.length - 1],
+                entry: this.messageHistory[this.messageHistory.length - 1]
+            };
+        }
+
+        this.streamingReply.entry.text += delta;
+        if (this.streamingReply.textDiv) {
+            this.streamingReply.textDiv.textContent = this.streamingReply.entry.text;
         }
+
+        const chatMessages = document.getElementById('chatMessages');
+        if (chatMessages) chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
     handleChatResponse(response) {
-        if (response.response) {
+        if (this.streamingReply) {
+            // The final text replaces what was streamed (e.g. a reply written from the action result)
+            if (response.response) {
+                this.streamingReply.entry.text = response.response;
+                if (this.streamingReply.textDiv) {
+                    this.streamingReply.textDiv.textContent = response.response;
+                }
+            }
+        } else if (response.response) {
             this.addMessage(response.response, 'ai');
         }
 
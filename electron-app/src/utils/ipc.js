@@ -66,6 +66,11 @@ class IPCManager {
         }
     }
 
+    // Ask the backend to reload the model if it was unloaded while idle
+    prewarm() {
+        ipcRenderer.send('prewarm');
+    }
+
     async getBackendStatus() {
         return await ipcRenderer.invoke('get-backend-status');
     }
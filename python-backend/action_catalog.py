@@ -0,0 +1,234 @@
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+
+@dataclass
+class ActionSpec:
+    """One action JARVIS can run: its handler, prompt entry and prefilter vocabulary"""
+    name: str
+    group: str  # TaskRouter attribute holding the handler: file, alarm, system or voice
+    description: str
+    params: Dict[str, Any]  # Example parameters shown in the prompt
+    keywords: List[str] = field(default_factory=list)
+    # Reply once the action has run, filled from its params and TaskRouter result (see render_reply)
+    reply: str = "{message}."
+    # No side effects, so it may start before the model has finished choosing it (see speculation.py)
+    speculative: bool = False
+    # Allowlist: only these actions are shown to the LLM and run when the model picks them
+    llm_selectable: bool = False
+
+    def prompt_line(self) -> str:
+        params = {key: value for key, value in self.params.items() if key not in PROTECTED_PARAMS}
+        return f"- {self.name}: {self.description}. Params: {json.dumps(params)}"
+
+
+@dataclass
+class PromptExample:
+    user: str
+    reply: Dict[str, Any]
+
+    @property
+    def action(self) -> Optional[str]:
+        return self.reply.get("action")
+
+    def prompt_text(self) -> str:
+        return f'User: "{self.user}"\nJARVIS: {json.dumps(self.reply)}'
+
+
+# Start of every prompt; the action catalogue (whole, or selected per request) follows it
+PROMPT_PREAMBLE = """You are JARVIS, a helpful AI assistant. You help users with various tasks.
+
+IMPORTANT: You must respond with ONLY a JSON object in this exact format:
+{"response": "Your helpful response to the user", "action": "action_name or null", "params": {"param": "value"}}
+
+Only use an action listed below; otherwise set "action" to null."""
+
+# Safety switches only the user may set (via /action); never shown to or taken from the model
+PROTECTED_PARAMS = {"safe_mode", "confirm"}
+
+# Single source of truth for the actions TaskRouter runs; the LLM only sees the llm_selectable ones
+ACTIONS: List[ActionSpec] = [
+    ActionSpec("create_document", "file", "Create a new document with specified name and content",
+               {"name": "filename.txt", "content": "file content"},
+               ["write", "make", "new", "note", "save", "file", "text"],
+               "Done. I created {name}.", llm_selectable=True),
+    ActionSpec("find_files", "file", "Find files with specific extension in a folder",
+               {"extension": "txt", "folder": "."},
+               ["search", "look", "locate", "list", "where", "files", "pdf", "docs"],
+               "I found {count} .{extension} files.", speculative=True, llm_selectable=True),
+    ActionSpec("read_document", "file", "Read the content of a document",
+               {"name": "filename.txt"},
+               ["show", "contents", "file"],
+               "Here's the content of {name}.", speculative=True, llm_selectable=True),
+    ActionSpec("delete_document", "file", "Delete a document (requires confirmation)",
+               {"name": "filename.txt", "confirm": False},
+               ["remove", "erase", "trash", "file"],
+               "Deleted {name}."),
+    ActionSpec("set_alarm", "alarm", "Set an alarm for X minutes with a message",
+               {"minutes": 5, "message": "reminder text"},
+               ["remind", "reminder", "timer", "wake", "minutes", "later"],
+               "Reminder set for {minutes} minutes from now: {message}.", llm_selectable=True),
+    ActionSpec("list_alarms", "alarm", "List all active alarms",
+               {},
+               ["reminders", "timers", "show", "pending"], speculative=True, llm_selectable=True),
+    ActionSpec("cancel_alarm", "alarm", "Cancel an active alarm by ID",
+               {"alarm_id": 1},
+               ["stop", "remove", "delete", "reminder", "timer"],
+               "Reminder {alarm_id} cancelled."),
+    ActionSpec("open_app", "system", "Open an application by name",
+               {"app_name": "calculator"},
+               ["launch", "start", "run", "program", "browser", "calculator", "notepad"],
+               "Opening {app_name}.", llm_selectable=True),
+    ActionSpec("get_system_info", "system", "Get comprehensive system information",
+               {},
+               ["cpu", "memory", "ram", "disk", "status", "computer", "usage", "busy", "battery"],
+               "CPU usage is {cpu[usage_percent]}% and memory usage {memory[usage_percent]}%.", speculative=True,
+               llm_selectable=True),
+    ActionSpec("run_command", "system", "Run a system command (safe mode by default)",
+               {"command": "dir", "safe_mode": True},
+               ["execute", "shell", "terminal", "command", "script"],
+               "Ran {command}. Here's the output."),
+    ActionSpec("speak", "voice", "Convert text to speech",
+               {"text": "text to say"},
+               ["say", "read", "aloud", "voice", "tell"],
+               "Saying: {text}", llm_selectable=True),
+    ActionSpec("listen", "voice", "Listen for speech input and convert to text",
+               {"timeout": 5},
+               ["hear", "microphone", "dictate", "transcribe"],
+               "I heard: {text}"),
+    ActionSpec("get_voice_info", "voice", "Get information about available voices and audio devices",
+               {},
+               ["voices", "audio", "speakers", "microphone", "devices"],
+               "Here are your voices and audio devices.", speculative=True, llm_selectable=True),
+]
+
+ACTIONS_BY_NAME: Dict[str, ActionSpec] = {spec.name: spec for spec in ACTIONS}
+
+# Shell commands, deletions, cancelling alarms and the microphone stay user-initiated
+LLM_ACTIONS: List[ActionSpec] = [spec for spec in ACTIONS if spec.llm_selectable]
+LLM_ACTIONS_BY_NAME: Dict[str, ActionSpec] = {spec.name: spec for spec in LLM_ACTIONS}
+
+EXAMPLES: List[PromptExample] = [
+    PromptExample("Create a file called hello.txt", {
+        "response": "I'll create a file called hello.txt for you.",
+        "action": "create_document", "params": {"name": "hello.txt", "content": "Hello World!"}}),
+    PromptExample("Remind me to stretch in 20 minutes", {
+        "response": "I'll remind you to stretch in 20 minutes.",
+        "action": "set_alarm", "params": {"minutes": 20, "message": "Stretch"}}),
+    PromptExample("Find my pdf files in Documents", {
+        "response": "Searching Documents for PDF files.",
+        "action": "find_files", "params": {"extension": "pdf", "folder": "Documents"}}),
+    PromptExample("Open the calculator", {
+        "response": "Opening the calculator.",
+        "action": "open_app", "params": {"app_name": "calculator"}}),
+    PromptExample("How much memory is my computer using?", {
+        "response": "Here's your system information.",
+        "action": "get_system_info", "params": {}}),
+    PromptExample("What can you do?", {
+        "response": "I can help you create files, set reminders, open apps, and get system information. What would you like me to do?",
+        "action": None, "params": {}}),
+]
+
+
+STOP_WORDS = {
+    "a", "an", "and", "all", "by", "for", "in", "is", "it", "me", "my", "of", "on", "or", "the",
+    "to", "with", "what", "x", "i", "do", "you", "can", "please", "specified", "specific"
+}
+
+
+def _tokens(text: str) -> List[str]:
+    """Lowercase words without stop words, with a plural 's' stripped"""
+    words = [word for word in re.findall(r"[a-z]+", text.lower()) if word not in STOP_WORDS]
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in words]
+
+
+def model_params(params: Any) -> Dict[str, Any]:
+    """Params taken from model output, without the safety switches only the user may set"""
+    if not isinstance(params, dict):
+        return {}
+    return {key: value for key, value in params.items() if key not in PROTECTED_PARAMS}
+
+
+def render_reply(action: str, params: Dict[str, Any], result: Optional[Dict[str, Any]]) -> str:
+    """User-facing reply for an action whose response was not written by the model
+
+    The action's template is filled from the result's ``data``, the result
+    itself and the params, later ones winning; a failed action reports its
+    error and a template that doesn't fit the result falls back to the
+    result message.
+    """
+    result = result or {}
+    if not result.get("success"):
+        return f"Sorry, I couldn't do that: {result.get('message', 'unknown error')}"
+    data = result.get("data")
+    fields = {**(data if isinstance(data, dict) else {}), **result, **params}
+    try:
+        return ACTIONS_BY_NAME[action].reply.format(**fields)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return result.get("message", "Done.")
+
+
+def render_catalogue(actions: List[ActionSpec], examples: List[PromptExample]) -> str:
+    """Prompt section listing the given actions the LLM may choose, and examples"""
+    lines = ["Available actions:"] + [spec.prompt_line() for spec in actions if spec.llm_selectable]
+    if examples:
+        lines += ["", "Examples:"]
+        lines += [f"{example.prompt_text()}\n" for example in examples]
+    return "\n".join(lines).rstrip()
+
+
+class ActionPrefilter:
+    """Picks the actions and examples most relevant to an utterance by word overlap.
+
+    Each action's vocabulary is its name, description and keywords; an
+    utterance scores the IDF of every vocabulary word it contains, so words
+    shared by many actions ("file", "show") count less than specific ones
+    ("remind", "cpu"), and words of the action's name count double. Ties
+    keep catalogue order, which makes the selection deterministic for a
+    given utterance.
+    """
+
+    def __init__(self, actions: List[ActionSpec] = None, examples: List[PromptExample] = None):
+        self.actions = actions if actions is not None else LLM_ACTIONS
+        self.examples = examples if examples is not None else EXAMPLES
+        self.name_words = {spec.name: set(_tokens(spec.name.replace("_", " "))) for spec in self.actions}
+        self.vocabulary = {
+            spec.name: set(_tokens(" ".join([spec.name.replace("_", " "), spec.description] + spec.keywords)))
+            for spec in self.actions
+        }
+        document_frequency: Dict[str, int] = {}
+        for words in self.vocabulary.values():
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.idf = {word: math.log(1 + len(self.actions) / df) for word, df in document_frequency.items()}
+
+    def rank(self, text: str) -> List[Tuple[ActionSpec, float]]:
+        """All actions with their scores, best first"""
+        words = set(_tokens(text))
+        scored = [
+            (spec, sum(self.idf[word] * (2 if word in self.name_words[spec.name] else 1)
+                       for word in words & self.vocabulary[spec.name]))
+            for spec in self.actions
+        ]
+        return sorted(scored, key=lambda item: -item[1])
+
+    def select(self, text: str, top_k: int, max_examples: int = 2) -> Tuple[List[ActionSpec], List[PromptExample]]:
+        """The ``top_k`` best actions and up to ``max_examples`` examples for them.
+
+        Examples are those of the best-ranked selected actions, plus the
+        no-action example so the model still learns to answer chit-chat with
+        a null action.
+        """
+        actions = [spec for spec, _ in self.rank(text)[:top_k]]
+        chit_chat = [example for example in self.examples if example.action is None][:1]
+
+        examples = []
+        for spec in actions:
+            if len(examples) >= max_examples - len(chit_chat):
+                break
+            examples += [example for example in self.examples if example.action == spec.name][:1]
+        return actions, (examples + chit_chat)[:max_examples]
@@ -0,0 +1,71 @@
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class GenerationCancelled(Exception):
+    """Raised when a generation stops because its cancellation token fired"""
+
+
+class CancellationToken:
+    """Flag a caller sets when it no longer wants a generation's result.
+
+    The inference thread polls ``cancelled`` from the token callback, so
+    setting it stops generation at the next token. Callbacks registered with
+    ``add_callback`` run in the thread that calls ``cancel``.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[["CancellationToken"], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Fire the token; later calls are ignored"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_callback(self, callback: Callable[["CancellationToken"], None]):
+        """Run ``callback(token)`` on cancellation, immediately if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+
+class LatestGenerations:
+    """The generation still running in each scope, so a newer message cancels an older one.
+
+    A scope is whatever identifies one client's conversation, e.g. a session
+    id the client chose. Generations without a scope are never superseded
+    and never supersede anything; an identical message (same key) joins the
+    running one instead of cancelling it.
+    """
+
+    def __init__(self):
+        self.latest: Dict[Hashable, Tuple[str, CancellationToken]] = {}
+
+    def begin(self, scope: Optional[Hashable], key: str, token: CancellationToken):
+        """Record ``token`` as the scope's generation, cancelling a different one still running"""
+        if scope is None:
+            return
+        previous = self.latest.get(scope)
+        if previous and previous[0] != key:
+            previous[1].cancel("superseded")
+        self.latest[scope] = (key, token)
+
+    def end(self, scope: Optional[Hashable], token: CancellationToken):
+        """Forget ``token`` unless a newer generation already replaced it"""
+        if scope is not None and self.latest.get(scope, (None, None))[1] is token:
+            del self.latest[scope]
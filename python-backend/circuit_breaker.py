@@ -0,0 +1,72 @@
+import time
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker around an operation that keeps failing.
+
+    Closed: attempts are allowed. After ``failure_threshold`` consecutive
+    failures it opens and refuses attempts for a backoff that doubles with
+    every failure, from ``base_delay`` up to ``max_delay`` seconds. Once the
+    backoff has passed one trial attempt is allowed (half-open); its success
+    closes the breaker and its failure opens it again with a longer backoff.
+    """
+
+    def __init__(self, failure_threshold: int = 1, base_delay: float = 5.0, max_delay: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self.last_error: Optional[str] = None
+        self._retry_at = 0.0
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until the next attempt is allowed (0 unless open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(self._retry_at - time.monotonic(), 0.0)
+
+    def allow_attempt(self) -> bool:
+        """Check if an attempt may run now; an expired backoff lets one trial through"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_in == 0.0:
+            self.state = HALF_OPEN
+            return True
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = None
+
+    def record_failure(self, error: str):
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            delay = min(self.base_delay * 2 ** max(self.failures - self.failure_threshold, 0), self.max_delay)
+            self.state = OPEN
+            self.opened_count += 1
+            self._retry_at = time.monotonic() + delay
+
+    def reset(self):
+        """Close the breaker, e.g. after the configuration changed"""
+        self.record_success()
+        self._retry_at = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the state, consecutive failures and time to the next attempt"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.opened_count,
+            "retry_in_seconds": round(self.retry_in, 1),
+            "last_error": self.last_error
+        }
@@ -0,0 +1,91 @@
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# Histogram bucket upper bounds per recorded metric
+METRIC_BUCKETS = {
+    "prompt_tokens": [128, 256, 512, 1024, 2048],
+    "generated_tokens": [16, 32, 64, 128, 256],
+    "queue_wait_ms": [10, 50, 100, 500, 1000, 5000],
+    "prompt_eval_ms": [50, 100, 250, 500, 1000, 2500, 5000],
+    "time_to_first_token_ms": [100, 250, 500, 1000, 2500, 5000, 10000],
+    "tokens_per_second": [1, 2, 5, 10, 20, 50],
+    "total_ms": [250, 500, 1000, 2500, 5000, 10000, 30000]
+}
+
+
+class RollingHistogram:
+    """Distribution of the most recent ``window`` samples of one metric"""
+
+    def __init__(self, buckets: List[float], window: int = 500):
+        self.buckets = buckets
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None if empty"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get percentiles and bucket counts of the window"""
+        if not self.samples:
+            return {"count": self.count, "window": 0}
+
+        counts = {f"<={bound}": 0 for bound in self.buckets}
+        counts["+Inf"] = 0
+        for value in self.samples:
+            for bound in self.buckets:
+                if value <= bound:
+                    counts[f"<={bound}"] += 1
+                    break
+            else:
+                counts["+Inf"] += 1
+
+        return {
+            "count": self.count,
+            "window": len(self.samples),
+            "mean": round(sum(self.samples) / len(self.samples), 2),
+            "p50": round(self.percentile(50), 2),
+            "p90": round(self.percentile(90), 2),
+            "p99": round(self.percentile(99), 2),
+            "max": round(max(self.samples), 2),
+            "buckets": counts
+        }
+
+
+class InferenceMetrics:
+    """Per-request inference timings with rolling histograms of each.
+
+    A request records its prompt and generated token counts, queue wait,
+    prompt-eval time (from leaving the queue to the first token), time to
+    first token (from submission), decode speed and total time. Missing
+    values (e.g. no tokens were generated) are left out of the histograms.
+    """
+
+    def __init__(self, window: int = 500):
+        self.histograms = {name: RollingHistogram(buckets, window) for name, buckets in METRIC_BUCKETS.items()}
+        self.requests = 0
+        self.last: Optional[Dict[str, Any]] = None
+
+    def record(self, metrics: Dict[str, Any]):
+        self.requests += 1
+        self.last = dict(metrics)
+        for name, histogram in self.histograms.items():
+            value = metrics.get(name)
+            if value is not None:
+                histogram.add(value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get every histogram and the most recent request's metrics"""
+        return {
+            "requests": self.requests,
+            "last": self.last,
+            **{name: histogram.get_stats() for name, histogram in self.histograms.items()}
+        }
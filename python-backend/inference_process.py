@@ -0,0 +1,264 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Any, Callable, Optional
+
+# Results larger than this are handed back through shared memory instead of the pipe
+SHM_THRESHOLD = 16 * 1024
+
+
+class InferenceProcessDied(Exception):
+    """Raised when the inference process is not running or exits mid-request"""
+
+
+def _load_model(model_name: str, options: Dict[str, Any]):
+    """Create the model inside the inference process"""
+    factory = options.get("factory")
+    if factory:
+        # "module:callable", used to host something other than GPT4All (e.g. in tests)
+        module_name, attr = factory.split(":")
+        return getattr(importlib.import_module(module_name), attr)(model_name, n_threads=options.get("n_threads"))
+
+    from gpt4all import GPT4All
+    return GPT4All(model_name, allow_download=False, n_threads=options.get("n_threads"))
+
+
+def _send_result(conn, req_id: int, text: str):
+    """Send a finished generation, via shared memory if it is large"""
+    data = text.encode('utf-8')
+    if len(data) < SHM_THRESHOLD:
+        conn.send(("result", req_id, text, None))
+        return
+
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    shm.buf[:len(data)] = data
+    try:
+        # The parent unlinks the block once it has read it
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    shm.close()
+    conn.send(("result", req_id, None, {"shm": shm.name, "size": len(data)}))
+
+
+def _serve(conn, model_name: str, options: Dict[str, Any]):
+    """Entry point of the inference process: load the model, then answer requests until closed"""
+    try:
+        from prompt_cache import PromptPrefixCache
+        model = _load_model(model_name, options)
+    except Exception as e:
+        conn.send(("error", str(e)))
+        return
+
+    conn.send(("ready", {"pid": os.getpid()}))
+    prefix_cache = None
+    closing = False
+
+    while not closing:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+
+        if message[0] == "close":
+            break
+        if message[0] != "generate":
+            continue
+
+        _, req_id, prefix, suffix, params = message
+        cancelled = False
+
+        def callback(token_id: int, text: str) -> bool:
+            nonlocal cancelled, closing
+            conn.send(("token", req_id, text))
+            while conn.poll():
+                control = conn.recv()
+                if control[0] == "cancel" and control[1] == req_id:
+                    cancelled = True
+                elif control[0] == "close":
+                    cancelled = closing = True
+            return not cancelled
+
+        try:
+            if prefix:
+                if prefix_cache is None or prefix_cache.prefix != prefix:
+                    prefix_cache = PromptPrefixCache(prefix)
+                text = prefix_cache.generate(model, suffix, callback, **params)
+            else:
+                text = model.generate(suffix, callback=callback, **params)
+            _send_result(conn, req_id, text)
+        except Exception as e:
+            conn.send(("failed", req_id, str(e)))
+
+    close = getattr(model, "close", None)
+    if close:
+        close()
+
+
+class InferenceProcess:
+    """Hosts the model in a separate long-lived process and proxies generation to it.
+
+    Exposes ``generate`` like a GPT4All model, so it can be used wherever the
+    in-process model is. A crash in the native library only takes down the
+    child; a watchdog thread restarts it with exponential backoff. Tokens
+    stream back over a pipe and large results come back through shared
+    memory. ``generate`` blocks, so call it from the inference worker thread.
+    """
+
+    def __init__(self, model_name: str, n_threads: Optional[int] = None, factory: Optional[str] = None,
+                 start_timeout: float = 60.0, max_backoff: float = 30.0, watchdog_interval: float = 1.0):
+        self.model_name = model_name
+        self.options = {"n_threads": n_threads, "factory": factory}
+        self.start_timeout = start_timeout
+        self.max_backoff = max_backoff
+        self.watchdog_interval = watchdog_interval
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._conn = None
+        self._process = None
+        self._started_at = 0.0
+        self._next_request_id = 0
+        self._closed = False
+
+        self.restarts = 0
+        self._backoff = 1.0
+        self._next_restart = 0.0
+
+        self._conn, self._process = self._spawn()
+        self._watchdog = threading.Thread(target=self._watch, name="inference-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _spawn(self):
+        """Start the inference process and wait until its model is loaded"""
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_serve, args=(child_conn, self.model_name, self.options),
+            name="jarvis-inference", daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(self.start_timeout):
+            process.terminate()
+            raise TimeoutError(f"Inference process did not load {self.model_name} in {self.start_timeout}s")
+
+        try:
+            message = parent_conn.recv()
+        except EOFError:
+            process.join(1.0)
+            raise InferenceProcessDied(f"Inference process exited while loading {self.model_name}")
+
+        if message[0] == "error":
+            process.join(1.0)
+            raise RuntimeError(message[1])
+
+        self._started_at = time.monotonic()
+        logging.info(f"Inference process {message[1]['pid']} serving {self.model_name}")
+        return parent_conn, process
+
+    def _watch(self):
+        """Restart the inference process with backoff whenever it dies"""
+        while not self._closed:
+            time.sleep(self.watchdog_interval)
+            if self._closed or self._process.is_alive():
+                continue
+
+            now = time.monotonic()
+            if now < self._next_restart:
+                continue
+
+            # A process that stayed up for a while earns a fresh backoff
+            if now - self._started_at > 60:
+                self._backoff = 1.0
+
+            logging.warning(f"Inference process exited (code {self._process.exitcode}), restarting")
+            try:
+                conn, process = self._spawn()
+            except Exception as e:
+                logging.error(f"Inference process restart failed, retrying in {self._backoff:.0f}s: {e}")
+                self._next_restart = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                continue
+
+            with self._lock:
+                self._conn, self._process = conn, process
+            self.restarts += 1
+            self._next_restart = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+
+    @property
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def generate(self, prompt: str, callback: Optional[Callable[[int, str], bool]] = None, **params) -> str:
+        """Generate from a full prompt"""
+        return self.generate_with_prefix("", prompt, callback, **params)
+
+    def generate_with_prefix(self, prefix: str, suffix: str,
+                             callback: Optional[Callable[[int, str], bool]] = None, **params) -> str:
+        """Generate in the inference process, which keeps its own cached state for ``prefix``"""
+        if self._closed or not self.is_alive:
+            raise InferenceProcessDied("Inference process is not running")
+
+        with self._lock:
+            conn = self._conn
+            self._next_request_id += 1
+            req_id = self._next_request_id
+            cancel_sent = False
+
+            try:
+                conn.send(("generate", req_id, prefix, suffix, params))
+                while True:
+                    message = conn.recv()
+                    kind = message[0]
+                    if message[1] != req_id:
+                        continue
+
+                    if kind == "token":
+                        if callback and callback(0, message[2]) is False and not cancel_sent:
+                            conn.send(("cancel", req_id))
+                            cancel_sent = True
+                    elif kind == "result":
+                        return message[2] if message[3] is None else self._read_shared(message[3])
+                    elif kind == "failed":
+                        raise RuntimeError(message[2])
+            except (EOFError, BrokenPipeError, ConnectionResetError, OSError) as e:
+                raise InferenceProcessDied(f"Inference process exited mid-request: {e}")
+
+    @staticmethod
+    def _read_shared(info: Dict[str, Any]) -> str:
+        """Read and release a result handed back through shared memory"""
+        shm = shared_memory.SharedMemory(name=info["shm"])
+        try:
+            return bytes(shm.buf[:info["size"]]).decode('utf-8')
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the state of the inference process"""
+        return {
+            "alive": self.is_alive,
+            "pid": self._process.pid if self._process else None,
+            "restarts": self.restarts,
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if self.is_alive else 0.0
+        }
+
+    def close(self):
+        """Stop the inference process"""
+        self._closed = True
+        with self._lock:
+            try:
+                self._conn.send(("close",))
+            except Exception:
+                pass
+            self._process.join(5.0)
+            if self._process.is_alive():
+                self._process.terminate()
+        logging.info("Inference process stopped")
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional
+
+# Priority classes, most urgent first
+PRIORITY_CLASSES = ("interactive", "background")
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue has no room for another request"""
+
+
+@dataclass
+class InferenceJob:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    priority: str = "interactive"
+    ticket: Optional[Dict[str, Any]] = None
+    barrier: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class InferenceWorker:
+    """Owns the model on a single thread and feeds it from bounded priority queues.
+
+    Every call that touches the model goes through ``submit``; the consumer task
+    runs jobs one at a time on the owner thread, so ``generate`` is never
+    entered concurrently and the event loop stays free while it runs.
+
+    Jobs are queued per priority class, each with its own limit. The next job
+    is the one with the best class rank after aging: every ``aging_seconds``
+    a job has waited counts as one class more urgent, so background work
+    still runs while interactive requests keep arriving. A ``barrier`` job
+    waits for every job queued before it whatever their class, e.g. closing
+    a model only after the generations still using it.
+    """
+
+    def __init__(self, max_queue_size: int = 16, name: str = "inference",
+                 class_limits: Optional[Dict[str, int]] = None, aging_seconds: float = 10.0):
+        self.name = name
+        self.max_queue_size = max_queue_size
+        self.class_limits = {priority: max_queue_size for priority in PRIORITY_CLASSES}
+        self.class_limits.update(class_limits or {})
+        self.aging_seconds = aging_seconds
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._pending: List[InferenceJob] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._busy = False
+
+        # Saturation statistics
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+        self.class_stats = {priority: {"processed": 0, "rejected": 0, "total_wait": 0.0, "max_wait": 0.0}
+                            for priority in PRIORITY_CLASSES}
+        # Times a job ran ahead of a more urgent class thanks to aging
+        self.promotions = 0
+
+    def _ensure_started(self):
+        """Start the consumer task on the running loop (restarting it if the loop changed)"""
+        loop = asyncio.get_running_loop()
+        if self._consumer is None or self._consumer.done() or self._loop is not loop:
+            self._loop = loop
+            self._pending = []
+            self._wakeup = asyncio.Event()
+            self._consumer = loop.create_task(self._consume())
+
+    async def submit(self, fn: Callable[..., Any], *args, priority: str = "interactive",
+                     ticket: Optional[Dict[str, Any]] = None, barrier: bool = False, **kwargs) -> Any:
+        """Queue a call for the owner thread and wait for its result
+
+        ``ticket``, if given, is filled with the job's priority, its queue
+        position when enqueued and, once it starts, how long it waited. A
+        ``barrier`` job only runs once every job queued before it has run.
+        """
+        if priority not in self.class_limits:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        self._ensure_started()
+        if self._class_depth(priority) >= self.class_limits[priority]:
+            self.rejected += 1
+            self.class_stats[priority]["rejected"] += 1
+            raise InferenceQueueFull(
+                f"Inference queue for {priority} work is full ({self.class_limits[priority]} pending requests)"
+            )
+
+        job = InferenceJob(fn, args, kwargs, self._loop.create_future(), priority, ticket, barrier)
+        if ticket is not None:
+            ticket.update(priority=priority, queue_position=self._position_of(job), queue_wait_ms=None)
+        self._pending.append(job)
+        # A cancelled job gives its slot back right away, not when the consumer reaches it
+        job.future.add_done_callback(lambda future: self._discard(job) if future.cancelled() else None)
+        self._wakeup.set()
+
+        return await job.future
+
+    def _discard(self, job: InferenceJob):
+        if job in self._pending:
+            self._pending.remove(job)
+
+    def _class_depth(self, priority: str) -> int:
+        return sum(1 for job in self._pending if job.priority == priority)
+
+    def _score(self, job: InferenceJob, now: float) -> float:
+        """Lower runs first: class rank minus one per aging period waited"""
+        return PRIORITY_CLASSES.index(job.priority) - (now - job.enqueued_at) / self.aging_seconds
+
+    def _position_of(self, job: InferenceJob) -> int:
+        """Jobs that would run before this one right now, including the running one"""
+        now = time.monotonic()
+        score = self._score(job, now)
+        ahead = sum(1 for other in self._pending if self._score(other, now) <= score)
+        return ahead + (1 if self._busy else 0)
+
+    def _next_job(self) -> InferenceJob:
+        """Take the most urgent pending job after aging"""
+        now = time.monotonic()
+        # Pending jobs are in submission order, so a barrier is ready once it is first
+        ready = [j for i, j in enumerate(self._pending) if i == 0 or not j.barrier]
+        job = min(ready, key=lambda j: (self._score(j, now), j.enqueued_at))
+        self._pending.remove(job)
+
+        rank = PRIORITY_CLASSES.index(job.priority)
+        if any(PRIORITY_CLASSES.index(other.priority) < rank for other in self._pending):
+            self.promotions += 1
+        return job
+
+    async def _consume(self):
+        """Run queued jobs sequentially on the owner thread"""
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            job = self._next_job()
+            if job.future.cancelled():
+                continue
+
+            wait = time.monotonic() - job.enqueued_at
+            self.last_wait = wait
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            class_stats = self.class_stats[job.priority]
+            class_stats["processed"] += 1
+            class_stats["total_wait"] += wait
+            class_stats["max_wait"] = max(class_stats["max_wait"], wait)
+            if job.ticket is not None:
+                job.ticket["queue_wait_ms"] = round(wait * 1000, 2)
+
+            self._busy = True
+            try:
+                result = await self._loop.run_in_executor(
+                    self._executor, lambda: job.fn(*job.args, **job.kwargs)
+                )
+            except Exception as e:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._busy = False
+                self.processed += 1
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for the owner thread"""
+        return len(self._pending)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and wait times, for spotting saturation"""
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "busy": self._busy,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "last_wait_ms": round(self.last_wait * 1000, 2),
+            "avg_wait_ms": round(self.total_wait / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "promotions": self.promotions,
+            "classes": {
+                priority: {
+                    "queue_depth": self._class_depth(priority),
+                    "limit": self.class_limits[priority],
+                    "processed": stats["processed"],
+                    "rejected": stats["rejected"],
+                    "avg_wait_ms": round(stats["total_wait"] / stats["processed"] * 1000, 2) if stats["processed"] else 0.0,
+                    "max_wait_ms": round(stats["max_wait"] * 1000, 2)
+                }
+                for priority, stats in self.class_stats.items()
+            }
+        }
+
+    def shutdown(self):
+        """Stop the consumer and release the owner thread"""
+        if self._consumer and not self._consumer.done():
+            self._consumer.cancel()
+        self._executor.shutdown(wait=False)
+        logging.info(f"Inference worker '{self.name}' stopped")
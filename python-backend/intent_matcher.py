@@ -0,0 +1,168 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re._constants import BRANCH, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
+except ImportError:
+    import sre_parse
+    from sre_constants import BRANCH, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, SUBPATTERN
+
+
+def required_literals(pattern: str) -> Optional[Set[str]]:
+    """Strings at least one of which occurs in every match of ``pattern``, or None if there are none
+
+    E.g. ``remind.*me|set.*(?:alarm|timer)`` gives {"remind", "alarm", "timer"}.
+    Of several required parts of a sequence the one with the longest
+    shortest literal is kept, since it rules out the most text.
+    """
+    try:
+        return _required(sre_parse.parse(pattern))
+    except (re.error, TypeError, ValueError):
+        return None
+
+
+def _required(items) -> Optional[Set[str]]:
+    best: Optional[Set[str]] = None
+    run: List[str] = []
+
+    def consider(candidate: Optional[Set[str]]):
+        nonlocal best
+        if candidate and (best is None or min(map(len, candidate)) > min(map(len, best))):
+            best = candidate
+
+    for op, av in items:
+        if op is LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            consider({''.join(run)})
+            run = []
+        if op is SUBPATTERN:
+            consider(_required(av[-1]))
+        elif op is BRANCH:
+            # Every alternative must contribute, or the branch can match without any literal
+            alternatives = [_required(branch) for branch in av[1]]
+            if all(alternatives):
+                consider(set().union(*alternatives))
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            low, _high, sub = av
+            if low >= 1:
+                consider(_required(sub))
+        elif op is IN:
+            if all(item_op is LITERAL for item_op, _ in av):
+                consider({chr(code) for _, code in av})
+        # Anchors, lookarounds, classes and wildcards require no literal
+    if run:
+        consider({''.join(run)})
+    return best
+
+
+class LiteralAutomaton:
+    """Aho-Corasick automaton finding which of a fixed set of strings occur in a text.
+
+    One pass over the text, whatever the number of strings.
+    """
+
+    def __init__(self, literals: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Set[str]] = [set()]
+        for literal in literals:
+            self._add(literal)
+        self._link()
+
+    def _add(self, literal: str):
+        state = 0
+        for ch in literal:
+            following = self.goto[state].get(ch)
+            if following is None:
+                following = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+                self.goto[state][ch] = following
+            state = following
+        self.out[state].add(literal)
+
+    def _link(self):
+        """Point every state at the longest proper suffix that is also in the trie"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[following] = target if target != following else 0
+                self.out[following] |= self.out[self.fail[following]]
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            if self.out[state]:
+                found |= self.out[state]
+        return found
+
+
+class IntentMatcher:
+    """Weighted regexes per action, compiled once and prefiltered by their literals.
+
+    Each pattern's required literals (see ``required_literals``) go into one
+    Aho-Corasick automaton; a text only runs the patterns whose literals it
+    contains, plus the few with no extractable literal. Every candidate is
+    run and scored, so the result does not depend on pattern order: the
+    higher weight wins, then the action with more matching patterns, then
+    the match starting earliest (commands lead with their verb).
+    """
+
+    def __init__(self, patterns: Dict[str, List[Tuple[str, float]]]):
+        self.rules: List[Tuple[str, "re.Pattern", float]] = []
+        self.by_literal: Dict[str, List[int]] = {}
+        self.always: List[int] = []
+        for action, entries in patterns.items():
+            for pattern, weight in entries:
+                index = len(self.rules)
+                self.rules.append((action, re.compile(pattern), weight))
+                literals = required_literals(pattern)
+                if literals:
+                    for literal in literals:
+                        self.by_literal.setdefault(literal, []).append(index)
+                else:
+                    self.always.append(index)
+        self.automaton = LiteralAutomaton(self.by_literal)
+        self.stats = {"texts": 0, "patterns_run": 0}
+
+    def candidates(self, text: str) -> List[int]:
+        """Indexes of the rules that can match ``text``, in declaration order"""
+        indexes = set(self.always)
+        for literal in self.automaton.find(text):
+            indexes.update(self.by_literal[literal])
+        return sorted(indexes)
+
+    def match(self, text: str) -> List[Tuple[str, float]]:
+        """Every matching action with its best weight, best first"""
+        # action -> [best weight, matching patterns, -earliest start]
+        best: Dict[str, List[float]] = {}
+        candidates = self.candidates(text)
+        for index in candidates:
+            action, regex, weight = self.rules[index]
+            found = regex.search(text)
+            if found is None:
+                continue
+            score = best.setdefault(action, [weight, 0, -found.start()])
+            score[0] = max(score[0], weight)
+            score[1] += 1
+            score[2] = max(score[2], -found.start())
+        self.stats["texts"] += 1
+        self.stats["patterns_run"] += len(candidates)
+        # sorted() is stable, so equal scores keep declaration order
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        return [(action, score[0]) for action, score in ranked]
@@ -4,6 +4,9 @@ import logging
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from action_catalog import LLM_ACTIONS_BY_NAME, model_params
+from intent_matcher import IntentMatcher
+
 class IntentParser:
     def __init__(self):
         self.keyword_patterns = {
@@ -49,15 +52,71 @@ class IntentParser:
             ]
         }
 
+        # Narrow patterns for unambiguous commands that can skip the LLM, with a confidence each
+        self.fast_path_patterns = {
+            'set_alarm': [
+                (r'^(?:please\s+)?(?:set|create)\s+(?:a\s+|an\s+)?(?:reminder|alarm|timer)\s+(?:for\s+|in\s+)\d+\s*(?:minutes?|mins?)\b', 0.95),
+                (r'^(?:please\s+)?remind\s+me\s+in\s+\d+\s*(?:minutes?|mins?)\b', 0.95),
+                (r'\bremind\s+me\b', 0.6)
+            ],
+            'list_alarms': [
+                (r'^(?:list|show)\s+(?:me\s+)?(?:my\s+|all\s+)?(?:active\s+)?(?:alarms|reminders)\s*$', 0.95),
+                (r'^what\s+(?:alarms|reminders)\s+do\s+i\s+have\b', 0.9)
+            ],
+            'get_system_info': [
+                (r'^(?:get|show|display|check)\s+(?:me\s+)?(?:my\s+|the\s+)?system\s+(?:info|information|status)\s*$', 0.95),
+                (r"^what(?:'s|\s+is)\s+my\s+system\s+status\s*$", 0.95),
+                (r'\b(?:cpu|memory|disk)\s+usage\b', 0.8)
+            ],
+            'open_app': [
+                (r'^(?:open|launch|start)\s+(?:the\s+)?(?:calculator|notepad|browser|chrome|firefox|terminal|finder|files|explorer|cmd)\s*$', 0.95)
+            ],
+            'create_document': [
+                (r'^(?:create|make)\s+(?:a\s+)?(?:new\s+)?(?:file|document)\s+(?:called|named)\s+\S+', 0.9)
+            ],
+            'read_document': [
+                (r'^(?:read|show)\s+(?:me\s+)?(?:the\s+)?(?:file|document)\s+\S+\.\w+\s*$', 0.9)
+            ],
+            'find_files': [
+                (r'^(?:find|search\s+for|list)\s+(?:all\s+)?(?:my\s+)?\.?(?!all\b|my\b|the\b)\w+\s+files\b', 0.85)
+            ]
+        }
+
+        # Replies used when a command is answered without the LLM
+        self.response_templates = {
+            'set_alarm': "Setting a reminder in {minutes} minutes: {message}",
+            'list_alarms': "Here are your active reminders.",
+            'get_system_info': "Here's your system information.",
+            'open_app': "Opening {app_name}.",
+            'create_document': "Creating {name} for you.",
+            'read_document': "Here's the content of {name}.",
+            'find_files': "Searching for {extension} files."
+        }
+
+        self.fast_path_stats = {
+            "checked": 0,
+            "short_circuited": 0,
+            "time_saved_ms": 0.0
+        }
+
+        # Compiled once; a literal prefilter decides which patterns run, and all of those are scored
+        self.keyword_matcher = IntentMatcher({
+            action: [(pattern, 1.0) for pattern in patterns]
+            for action, patterns in self.keyword_patterns.items()
+        })
+        self.fast_path_matcher = IntentMatcher(self.fast_path_patterns)
+
     def parse_intent(self, llm_response: Dict[str, Any]) -> Dict[str, Any]:
         """Parse intent from LLM response or fallback to keyword matching"""
         
         # First try to use the structured response from LLM
         if isinstance(llm_response, dict) and 'action' in llm_response:
-            if llm_response['action'] and llm_response['action'] in self.keyword_patterns:
+            # Model output is shaped by user text, history and documents: only allowlisted
+            # actions run, and never with the safety switches the model might set
+            if llm_response['action'] and llm_response['action'] in LLM_ACTIONS_BY_NAME:
                 return {
                     'action': llm_response['action'],
-                    'params': llm_response.get('params', {}),
+                    'params': model_params(llm_response.get('params', {})),
                     'response': llm_response.get('response', '')
                 }
         
@@ -65,18 +124,62 @@ class IntentParser:
         response_text = llm_response.get('response', '') if isinstance(llm_response, dict) else str(llm_response)
         return self._keyword_match(response_text)
 
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Score a user message against the fast-path patterns before any LLM call"""
+        text_lower = text.lower().strip()
+        matches = self.fast_path_matcher.match(text_lower)
+        best_action, best_confidence = matches[0] if matches else (None, 0.0)
+        
+        return {
+            'action': best_action,
+            'params': self._extract_params(text_lower, best_action) if best_action else {},
+            'confidence': best_confidence
+        }
+
+    def fast_path(self, text: str, threshold: float = 0.9) -> Optional[Dict[str, Any]]:
+        """Return a parsed intent with a templated reply if the message is a confident rule match"""
+        self.fast_path_stats["checked"] += 1
+        match = self.classify(text)
+        
+        if not match['action'] or match['confidence'] < threshold:
+            return None
+        
+        try:
+            response = self.response_templates[match['action']].format(**match['params'])
+        except (KeyError, IndexError):
+            response = "On it."
+        
+        return {
+            'action': match['action'],
+            'params': match['params'],
+            'response': response,
+            'confidence': match['confidence']
+        }
+
+    def record_fast_path(self, elapsed: float, llm_latency: float):
+        """Count a short-circuited request and the LLM time it avoided"""
+        self.fast_path_stats["short_circuited"] += 1
+        self.fast_path_stats["time_saved_ms"] += max(llm_latency - elapsed, 0.0) * 1000
+
+    def get_fast_path_stats(self) -> Dict[str, Any]:
+        """Get how many requests skipped the LLM and the latency saved"""
+        stats = dict(self.fast_path_stats)
+        stats["time_saved_ms"] = round(stats["time_saved_ms"], 1)
+        return stats
+
     def _keyword_match(self, text: str) -> Dict[str, Any]:
         """Fallback keyword matching for intent detection"""
         text_lower = text.lower()
         
-        for action, patterns in self.keyword_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    return {
-                        'action': action,
-                        'params': self._extract_params(text_lower, action),
-                        'response': text
-                    }
+        # Best-scoring action rather than the first one with a matching pattern
+        matches = self.keyword_matcher.match(text_lower)
+        if matches:
+            action = matches[0][0]
+            return {
+                'action': action,
+                'params': self._extract_params(text_lower, action),
+                'response': text
+            }
         
         return {
             'action': None,
@@ -84,6 +187,10 @@ class IntentParser:
             'response': text
         }
 
+    def extract_params(self, text: str, action: str) -> Dict[str, Any]:
+        """Guess an action's parameters from the user's own words"""
+        return self._extract_params(text.lower().strip(), action)
+
     def _extract_params(self, text: str, action: str) -> Dict[str, Any]:
         """Extract parameters from text based on action type"""
         params = {}
@@ -91,7 +198,8 @@ class IntentParser:
         if action == 'create_document':
             # Extract filename with multiple patterns
             filename_patterns = [
-                r'(?:called|named|file|document)\s+["\']?([^"\'.\s]+(?:\.[a-zA-Z0-9]+)?)["\']?',
+                r'(?:called|named)\s+["\']?([^"\'.\s]+(?:\.[a-zA-Z0-9]+)?)["\']?',
+                r'(?:file|document)\s+["\']?([^"\'.\s]+(?:\.[a-zA-Z0-9]+)?)["\']?',
                 r'["\']([^"\']+\.[a-zA-Z0-9]+)["\']',  # Quoted filename with extension
                 r'(\w+\.[a-zA-Z0-9]+)',  # Simple filename.ext pattern
                 r'(?:create|make|write)\s+(?:a\s+)?(?:file\s+)?["\']?([^"\'.\s]+)["\']?'  # Action + filename
@@ -160,6 +268,11 @@ class IntentParser:
             else:
                 params['app_name'] = 'calculator'
         
+        elif action == 'read_document':
+            # Extract filename
+            name_match = re.search(r'([\w\-]+\.[a-zA-Z0-9]+)', text)
+            params['name'] = name_match.group(1) if name_match else 'document.txt'
+        
         elif action == 'speak':
             # Extract text to speak
             speak_match = re.search(r'(?:say|speak)\s+["\']?([^"\']+)["\']?', text)
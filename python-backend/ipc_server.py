@@ -3,10 +3,13 @@ import json
 import logging
 import sys
 import os
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Literal, Optional
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -14,6 +17,12 @@ from llm_interface import LLMInterface
 from intent_parser import IntentParser
 from task_router import TaskRouter
 from settings_manager import settings
+from session_store import SessionStore
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from cancellation import CancellationToken, LatestGenerations
+from action_catalog import render_reply
+from speculation import ActionSpeculator
 
 # Create logs directory if it doesn't exist
 os.makedirs('logs', exist_ok=True)
@@ -43,6 +52,17 @@ app.add_middleware(
 llm = LLMInterface()
 parser = IntentParser()
 router = TaskRouter()
+sessions = SessionStore(
+    persist_path="logs/sessions.json",
+    max_turns=settings.get('session_max_turns', 20)
+)
+# Every client without a session id used to share this one; don't keep its mixed history
+sessions.clear_session("default")
+chat_flights = SingleFlight()
+# Side-effect-free actions start as soon as the streamed reply names them
+speculator = ActionSpeculator(router, parser.extract_params)
+# Latest generation per client-chosen session, so a newer message can cancel an older one
+session_generations = LatestGenerations()
 
 # Connection manager for WebSocket
 class ConnectionManager:
@@ -73,19 +93,179 @@ manager = ConnectionManager()
 class ChatRequest(BaseModel):
     message: str
     context: str = ""
+    session_id: Optional[str] = None
+    force_llm: bool = False
+    priority: Literal["interactive", "background"] = "interactive"
+    include_metrics: bool = False
+    # Answer with another model than the configured one (loaded on demand, kept resident)
+    model: Optional[str] = None
 
 class ActionRequest(BaseModel):
     action: str
     params: Dict[str, Any] = {}
 
+async def process_chat(message: str, context: str = "", force_llm: bool = False,
+                       on_token=None, session_id: Optional[str] = None,
+                       cancel_token: Optional[CancellationToken] = None,
+                       priority: str = "interactive", include_metrics: bool = False,
+                       model: Optional[str] = None, supersede_scope: Optional[str] = None) -> Dict[str, Any]:
+    """Answer a chat message, sharing the work with an identical request already in flight
+
+    Token counts and timings of the generation are only included under
+    ``metrics`` if ``include_metrics`` is set. A different message with the
+    same ``supersede_scope`` and priority cancels this one; without a scope
+    it always runs to the end.
+    """
+    # Double submits and reconnect replays get the same answer and run the action once; case is kept,
+    # since params taken from the message may depend on it ("Report.txt" vs "report.txt")
+    key = json.dumps([ResponseCache.normalize(message, fold_case=False), context, session_id, model or llm.model_name, force_llm])
+    cancel_token = cancel_token or CancellationToken()
+    
+    # A different message in the same scope supersedes the one still generating; background
+    # work never cancels, nor is cancelled by, interactive messages
+    scope = (supersede_scope, priority) if supersede_scope else None
+    session_generations.begin(scope, key, cancel_token)
+    
+    try:
+        result, shared = await chat_flights.run(
+            key,
+            lambda publish, flight_token: answer_chat(
+                message, context, force_llm, publish, session_id, flight_token, priority, model
+            ),
+            on_token, cancel_token
+        )
+    finally:
+        session_generations.end(scope, cancel_token)
+    
+    # A new dict: the originator's result may still be copied for coalesced callers
+    return {
+        **{k: v for k, v in result.items() if include_metrics or k != "metrics"},
+        "coalesced": shared
+    }
+
+async def answer_chat(message: str, context: str = "", force_llm: bool = False,
+                      on_token=None, session_id: Optional[str] = None,
+                      cancel_token: Optional[CancellationToken] = None,
+                      priority: str = "interactive", model: Optional[str] = None) -> Dict[str, Any]:
+    """Answer a chat message via the rule-based fast path or the LLM and run its action
+
+    Without a ``session_id`` the message is answered on its own and not remembered.
+    """
+    started = time.monotonic()
+    parsed_intent: Optional[Dict[str, Any]] = None
+    queue_info = None
+    metrics = None
+    record_turn = True
+    action_only = False
+    speculation = None
+    
+    # Confident rule matches skip the model entirely
+    if not force_llm and settings.is_fast_path_enabled():
+        parsed_intent = parser.fast_path(message, settings.get_fast_path_threshold())
+    
+    # While the model is down, any rule match for a read-only action beats an error; actions with
+    # side effects still need a confident match (a weak one would e.g. set an alarm with made-up params)
+    if parsed_intent is None and llm.model_unavailable:
+        candidate = parser.fast_path(message, 0.0)
+        if candidate and (router.can_speculate(candidate['action'])
+                          or candidate['confidence'] >= settings.get_fast_path_threshold()):
+            parsed_intent = candidate
+    
+    fast_path = parsed_intent is not None
+    if fast_path:
+        parser.record_fast_path(time.monotonic() - started, llm.avg_generation_seconds)
+        if on_token:
+            await on_token(parsed_intent['response'])
+    else:
+        # Recent conversation, trimmed to the token budget
+        history = sessions.build_context(session_id, settings.get_context_token_budget()) if session_id else ""
+        
+        # Get LLM response
+        speculation = speculator.begin(message)
+        llm_response = await llm.generate_response(
+            message, f"Context: {context}" if context else "", on_token=on_token, cancel_token=cancel_token,
+            priority=priority, model_name=model, history=history,
+            on_action=speculation.start if settings.is_speculation_enabled() else None
+        )
+        queue_info = llm_response.get("queue")
+        metrics = llm_response.get("metrics")
+        if llm_response.get("cancelled"):
+            # Nobody is waiting for this answer; don't act on it or remember it
+            speculation.discard()
+            return {
+                "response": "",
+                "session_id": session_id,
+                "action_executed": None,
+                "params": {},
+                "action_result": None,
+                "fast_path": False,
+                "cancelled": True,
+                "cancel_reason": llm_response.get("cancel_reason")
+            }
+        record_turn = not llm_response.get("warming_up")
+        action_only = llm_response.get("action_only", False)
+        
+        # Parse intent
+        parsed_intent = parser.parse_intent(llm_response)
+    
+    # Execute action if one was identified, unless it already ran speculatively with the same params
+    action_result = None
+    if speculation is not None:
+        action_result = await speculation.result(parsed_intent.get('action'), parsed_intent.get('params', {}))
+    if parsed_intent.get('action') and action_result is None:
+        action_result = await router.execute_action(
+            parsed_intent['action'],
+            parsed_intent['params']
+        )
+    
+    if action_only and parsed_intent.get('action'):
+        # The model only chose the action; the reply is written from its result
+        parsed_intent['response'] = render_reply(parsed_intent['action'], parsed_intent['params'], action_result)
+        if on_token:
+            await on_token(parsed_intent['response'])
+    
+    if record_turn and session_id:
+        sessions.add_exchange(session_id, message, parsed_intent.get('response', ''), parsed_intent.get('action'))
+    
+    return {
+        "response": parsed_intent.get('response', 'I processed your request.'),
+        "session_id": session_id,
+        "action_executed": parsed_intent.get('action'),
+        "params": parsed_intent.get('params', {}),
+        "action_result": action_result,
+        "fast_path": fast_path,
+        "queue": queue_info,
+        "metrics": metrics
+    }
+
 # API Endpoints
 @app.on_event("startup")
 async def startup_event():
     """Initialize the LLM on startup"""
     logging.info("Starting JARVIS AI Assistant...")
-    await llm.initialize()
+    # Load the model in the background so the server accepts requests immediately
+    llm.add_status_listener(broadcast_model_status)
+    llm.add_swap_listener(broadcast_model_swap)
+    llm.start_background_load()
+    # Unload the model when idle or short of memory
+    llm.residency.start()
     logging.info("JARVIS AI Assistant started successfully")
 
+async def broadcast_model_status(status: Dict[str, Any]):
+    """Tell WebSocket clients about model loading progress"""
+    await manager.broadcast({"type": "model_status", "data": status})
+    if status.get("ready"):
+        await manager.broadcast({"type": "model_ready", "data": status})
+
+async def broadcast_model_swap(status: Dict[str, Any]):
+    """Tell WebSocket clients about a model hot swap in progress"""
+    await manager.broadcast({"type": "model_swap", "data": status})
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the inference worker on shutdown"""
+    llm.shutdown()
+
 @app.get("/")
 async def root():
     return {
@@ -100,6 +280,44 @@ async def health_check():
     return {
         "status": "healthy",
         "llm_available": llm.model is not None,
+        "model_status": llm.get_load_status(),
+        "inference_queue": llm.get_queue_stats(),
+        "model_pool": llm.get_pool_stats(),
+        "prompt_cache": llm.get_prompt_cache_stats(),
+        "response_cache": llm.get_response_cache_stats(),
+        "semantic_cache": llm.get_semantic_cache_stats(),
+        "fast_path": parser.get_fast_path_stats(),
+        "action_only": llm.get_action_only_stats(),
+        "speculation": speculator.get_stats(),
+        "early_stop": llm.get_early_stop_stats(),
+        "coalescing": chat_flights.get_stats(),
+        "cancellation": llm.get_cancel_stats(),
+        "inference_process": llm.get_inference_process_stats(),
+        "model_breaker": llm.get_breaker_stats(),
+        "residency": llm.get_residency_stats(),
+        "resident_models": llm.get_resident_model_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Report whether the model is loaded, with its loading stage and progress"""
+    status = llm.get_load_status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={**status, "timestamp": datetime.now().isoformat()}
+    )
+
+@app.post("/prewarm")
+async def prewarm():
+    """Reload an unloaded model ahead of use, e.g. when the window gains focus"""
+    return {**llm.prewarm(), "timestamp": datetime.now().isoformat()}
+
+@app.get("/stats/inference")
+async def inference_stats():
+    """Get rolling histograms of prompt/generated tokens, queue wait, prompt-eval time, TTFT and tokens/sec"""
+    return {
+        **llm.get_inference_metrics(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -109,25 +327,17 @@ async def chat_endpoint(request: ChatRequest):
     try:
         logging.info(f"Received message: {request.message[:100]}...")
         
-        # Get LLM response
-        llm_response = await llm.generate_response(request.message, request.context)
-        
-        # Parse intent
-        parsed_intent = parser.parse_intent(llm_response)
-        
-        # Execute action if one was identified
-        action_result = None
-        if parsed_intent.get('action'):
-            action_result = await router.execute_action(
-                parsed_intent['action'],
-                parsed_intent['params']
-            )
+        # Without a session id the message is answered statelessly; only a session id the client
+        # chose ties its requests together closely enough to supersede
+        result = await process_chat(
+            request.message, request.context, request.force_llm, session_id=request.session_id,
+            priority=request.priority, include_metrics=request.include_metrics, model=request.model,
+            supersede_scope=f"http:{request.session_id}" if request.session_id else None
+        )
         
         response = {
             "success": True,
-            "response": parsed_intent.get('response', 'I processed your request.'),
-            "action_executed": parsed_intent.get('action'),
-            "action_result": action_result,
+            **result,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -183,6 +393,19 @@ async def get_actions():
     """Get list of available actions"""
     return router.get_available_actions()
 
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Get the stored conversation of a session"""
+    session = sessions.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return {"success": True, "session_id": session_id, **session}
+
+@app.delete("/sessions/{session_id}")
+async def clear_session(session_id: str):
+    """Forget a session's conversation history"""
+    return {"success": sessions.clear_session(session_id), "session_id": session_id}
+
 @app.get("/settings")
 async def get_settings():
     """Get current settings"""
@@ -215,6 +438,7 @@ async def update_settings(request: dict):
                 "success": True,
                 "message": "Settings updated successfully",
                 "settings": settings.settings,
+                "model_swap": llm.get_swap_status(),
                 "timestamp": datetime.now().isoformat()
             }
         else:
@@ -246,6 +470,7 @@ async def reload_settings():
             "success": True,
             "message": "Settings reloaded successfully",
             "settings": settings.settings,
+            "model_swap": llm.get_swap_status(),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -262,6 +487,57 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication"""
     await manager.connect(websocket)
     logging.info("WebSocket connection established")
+    await manager.send_personal_message({"type": "model_status", "data": llm.get_load_status()}, websocket)
+    
+    # Chats run as tasks so cancel frames and disconnects are seen while they generate
+    generations: Dict[Any, CancellationToken] = {}
+    connection_id = uuid.uuid4().hex
+    # Chats that name no session share this connection's own history, never another client's
+    connection_session = f"ws-{connection_id}"
+    
+    async def handle_chat(message_data: Dict[str, Any], cancel_token: CancellationToken):
+        message_id = message_data.get("id")
+        
+        async def send_delta(delta: str):
+            await manager.send_personal_message({
+                "type": "chat_response_delta",
+                "id": message_id,
+                "data": {"delta": delta}
+            }, websocket)
+        
+        # Only clients that ask for it get the reply text as delta frames before the final response
+        stream = bool(message_data.get("stream", False))
+        # Messages supersede each other only within one connection's explicit session
+        session_id = message_data.get("session_id")
+        
+        try:
+            result = await process_chat(
+                message_data.get("message", ""), message_data.get("context", ""),
+                message_data.get("force_llm", False), on_token=send_delta if stream else None,
+                session_id=session_id or connection_session, cancel_token=cancel_token,
+                priority=message_data.get("priority", "interactive"),
+                include_metrics=message_data.get("include_metrics", False),
+                model=message_data.get("model"),
+                supersede_scope=f"ws:{connection_id}:{session_id}" if session_id else None
+            )
+            
+            response = {
+                "type": "chat_response",
+                "id": message_id,
+                "data": {
+                    **result,
+                    "streamed": stream,
+                    "timestamp": datetime.now().isoformat()
+                }
+            }
+            
+            if websocket in manager.active_connections:
+                await manager.send_personal_message(response, websocket)
+        except Exception as e:
+            logging.error(f"Chat over WebSocket failed: {e}")
+        finally:
+            if generations.get(message_id) is cancel_token:
+                del generations[message_id]
     
     try:
         while True:
@@ -269,35 +545,18 @@ async def websocket_endpoint(websocket: WebSocket):
             message_data = json.loads(data)
             
             if message_data.get("type") == "chat":
-                # Process chat message
-                user_message = message_data.get("message", "")
-                context = message_data.get("context", "")
-                
-                # Get LLM response
-                llm_response = await llm.generate_response(user_message, context)
-                
-                # Parse intent
-                parsed_intent = parser.parse_intent(llm_response)
-                
-                # Execute action if one was identified
-                action_result = None
-                if parsed_intent.get('action'):
-                    action_result = await router.execute_action(
-                        parsed_intent['action'],
-                        parsed_intent['params']
-                    )
-                
-                response = {
-                    "type": "chat_response",
-                    "data": {
-                        "response": parsed_intent.get('response', 'I processed your request.'),
-                        "action_executed": parsed_intent.get('action'),
-                        "action_result": action_result,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                }
-                
-                await manager.send_personal_message(response, websocket)
+                cancel_token = CancellationToken()
+                generations[message_data.get("id")] = cancel_token
+                asyncio.ensure_future(handle_chat(message_data, cancel_token))
+            
+            elif message_data.get("type") == "prewarm":
+                # Sent on window focus or the first keystroke, so the model is back before the message
+                llm.prewarm()
+            
+            elif message_data.get("type") == "cancel":
+                cancel_token = generations.get(message_data.get("id"))
+                if cancel_token:
+                    cancel_token.cancel("client")
             
             elif message_data.get("type") == "action":
                 # Direct action execution
@@ -323,6 +582,15 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logging.error(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+    finally:
+        # Nobody is left to read these answers; until the grace period ends, a client that reconnects
+        # and replays its message (same session, so the same flight key) rejoins the generation instead
+        def release():
+            for cancel_token in list(generations.values()):
+                cancel_token.cancel("disconnected")
+            # Nor to continue the connection's own conversation
+            sessions.clear_session(connection_session)
+        asyncio.get_running_loop().call_later(settings.get_reconnect_grace_seconds(), release)
 
 if __name__ == "__main__":
     import argparse
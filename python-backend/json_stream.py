@@ -0,0 +1,140 @@
+from typing import Dict, Optional
+
+_ESCAPES = {
+    '"': '"', '\\': '\\', '/': '/',
+    'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'
+}
+
+
+class IncrementalJsonScanner:
+    """Brace- and string-aware scanner for JSON that arrives a few characters at a time.
+
+    The model answers with a single JSON object; the scanner tracks nesting and
+    string state across chunk boundaries and pulls the decoded text of one
+    top-level string field (``"response"`` by default) out as it is generated,
+    so it can be shown to the user before the object is finished. Once the
+    top-level object is balanced ``complete`` is set and ``object_text``
+    holds exactly that object, so generation can stop there.
+
+    With ``stop_after`` set, the object is also considered complete as soon
+    as that top-level field's object or array value closes; ``object_text``
+    then ends with that value and a closing brace.
+
+    Top-level string values are collected in ``strings`` as soon as each
+    one closes, e.g. to act on ``"action"`` before the object is finished.
+    """
+
+    def __init__(self, stream_field: str = "response", stop_after: Optional[str] = None):
+        self.stream_field = stream_field
+        self.stop_after = stop_after
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.unicode_buf: Optional[str] = None
+        self.expect_key = False
+        self.string_is_key = False
+        self.current_key: Optional[str] = None
+        self.key_buf = []
+        self.value_buf = []
+        self.strings: Dict[str, str] = {}
+        self.capturing = False
+        self.complete = False
+        self.object_chars = []
+
+    @property
+    def object_text(self) -> str:
+        """Text of the top-level object seen so far"""
+        return ''.join(self.object_chars)
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk of model output and return newly decoded text of the streamed field"""
+        out = []
+
+        for ch in chunk:
+            if self.complete:
+                break
+
+            if not self.started:
+                # Ignore anything the model prints before the object opens
+                if ch == '{':
+                    self.started = True
+                    self.depth = 1
+                    self.expect_key = True
+                    self.object_chars.append(ch)
+                continue
+
+            self.object_chars.append(ch)
+
+            if self.in_string:
+                self._string_char(ch, out)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_is_key = self.depth == 1 and self.expect_key
+                self.capturing = (
+                    self.depth == 1 and not self.expect_key
+                    and self.current_key == self.stream_field
+                )
+                self.key_buf = []
+                self.value_buf = []
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                elif self.depth == 1 and self.stop_after is not None and self.current_key == self.stop_after:
+                    # The last field we need is done; close the object ourselves
+                    self.object_chars.append('}')
+                    self.complete = True
+            elif ch == ':' and self.depth == 1:
+                self.expect_key = False
+            elif ch == ',' and self.depth == 1:
+                self.expect_key = True
+
+        return ''.join(out)
+
+    def _string_char(self, ch: str, out: list):
+        """Handle one character inside a JSON string"""
+        if self.unicode_buf is not None:
+            self.unicode_buf += ch
+            if len(self.unicode_buf) == 4:
+                try:
+                    decoded = chr(int(self.unicode_buf, 16))
+                except ValueError:
+                    decoded = ''
+                self.unicode_buf = None
+                self._emit(decoded, out)
+            return
+
+        if self.escape:
+            self.escape = False
+            if ch == 'u':
+                self.unicode_buf = ''
+            else:
+                self._emit(_ESCAPES.get(ch, ch), out)
+            return
+
+        if ch == '\\':
+            self.escape = True
+        elif ch == '"':
+            self.in_string = False
+            if self.string_is_key:
+                self.current_key = ''.join(self.key_buf)
+            elif self.depth == 1:
+                self.strings[self.current_key] = ''.join(self.value_buf)
+            self.capturing = False
+            self.string_is_key = False
+        else:
+            self._emit(ch, out)
+
+    def _emit(self, text: str, out: list):
+        if self.string_is_key:
+            self.key_buf.append(text)
+            return
+        if self.depth == 1:
+            self.value_buf.append(text)
+        if self.capturing:
+            out.append(text)
@@ -0,0 +1,338 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+import urllib3
+from gpt4all import GPT4All
+
+from inference_process import InferenceProcess
+
+ResponseCallback = Callable[[int, str], bool]
+
+
+class LLMBackend:
+    """Where LLMInterface gets its model from.
+
+    ``load`` returns a model object with GPT4All's generation interface:
+    ``generate(prompt, callback=None, max_tokens=..., temp=..., top_p=...,
+    repeat_penalty=...)`` returning the text, with ``callback(token_id, text)``
+    called per token and generation stopping when it returns False. Models
+    may also have ``close()``.
+    """
+
+    name = "base"
+
+    def locate(self, model_name: str):
+        """Check the model is available before loading it (blocking; raises if not)"""
+
+    def load(self, model_name: str, n_threads: Optional[int] = None):
+        """Load a model (blocking)"""
+        raise NotImplementedError
+
+    def model_size_mb(self, model_name: str) -> float:
+        """Memory a loaded model needs in this machine's RAM, if known before loading"""
+        return 0.0
+
+
+class GPT4AllBackend(LLMBackend):
+    """GPT4All model files, in this process or in a separate inference process"""
+
+    name = "gpt4all"
+
+    def __init__(self, process_isolation: bool = False):
+        self.process_isolation = process_isolation
+
+    def locate(self, model_name: str):
+        GPT4All.retrieve_model(model_name, allow_download=False)
+
+    def model_size_mb(self, model_name: str) -> float:
+        # The weights are memory-mapped, so the file size is what residency costs
+        try:
+            path = GPT4All.retrieve_model(model_name, allow_download=False)["path"]
+            return os.path.getsize(path) / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    def load(self, model_name: str, n_threads: Optional[int] = None):
+        if self.process_isolation:
+            return InferenceProcess(model_name, n_threads=n_threads)
+        return GPT4All(model_name, allow_download=False, n_threads=n_threads)
+
+
+def mock_response(user_input: str) -> Dict[str, Any]:
+    """Keyword-based canned answer, for testing without a model download"""
+    user_lower = user_input.lower()
+
+    if any(word in user_lower for word in ["create", "make", "write", "file", "document"]):
+        return {
+            "response": "I'll create a document for you using mock mode.",
+            "action": "create_document",
+            "params": {"name": "test_document.txt", "content": "This is a test document created in mock mode."}
+        }
+    elif any(word in user_lower for word in ["find", "search", "look"]):
+        return {
+            "response": "I'll search for files using mock mode.",
+            "action": "find_files",
+            "params": {"extension": "txt", "folder": "."}
+        }
+    elif any(word in user_lower for word in ["alarm", "reminder", "remind"]):
+        return {
+            "response": "I'll set a reminder for you using mock mode.",
+            "action": "set_alarm",
+            "params": {"minutes": 5, "message": "Test reminder"}
+        }
+    elif any(word in user_lower for word in ["system", "info", "status"]):
+        return {
+            "response": "Here's your system information in mock mode.",
+            "action": "get_system_info",
+            "params": {}
+        }
+    elif any(word in user_lower for word in ["open", "launch", "start"]):
+        return {
+            "response": "I'll open an application for you using mock mode.",
+            "action": "open_app",
+            "params": {"app_name": "calculator"}
+        }
+    else:
+        return {
+            "response": f"I understand you said: '{user_input}'. I'm running in mock mode for testing. Try asking me to create a file, set a reminder, or get system info!",
+            "action": None,
+            "params": {}
+        }
+
+
+class MockModel:
+    """Answers the last user turn of the prompt with ``mock_response`` as JSON.
+
+    Optionally behaves like CPU inference for load testing: evaluating the
+    prompt costs ``prompt_eval_ms`` per token (a prefix seen before is free,
+    as with KV-cache reuse), tokens are produced at ``tokens_per_second``
+    with +/- ``jitter`` relative variation, and ``failure_rate`` of the
+    generations fail part-way through. Delays block the calling thread, so
+    they occupy the inference worker the way a real model does. Tokens are
+    approximated as words; with the defaults everything is instant.
+    """
+
+    def __init__(self, prompt_eval_ms: float = 0.0, tokens_per_second: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.prompt_eval_ms = prompt_eval_ms
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._evaluated_prefix: Optional[str] = None
+        self.stats = {"requests": 0, "failures": 0, "prompt_tokens": 0, "generated_tokens": 0}
+
+    @staticmethod
+    def _count_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def generate_with_prefix(self, prefix: str, suffix: str,
+                             callback: Optional[ResponseCallback] = None, **params) -> str:
+        """Generate for prefix + suffix, charging prompt evaluation for the prefix only once"""
+        evaluate = suffix if prefix == self._evaluated_prefix else prefix + suffix
+        self._evaluated_prefix = prefix
+        return self._generate(prefix + suffix, evaluate, callback, params.get("max_tokens"))
+
+    def generate(self, prompt: str, callback: Optional[ResponseCallback] = None, **params) -> str:
+        return self._generate(prompt, prompt, callback, params.get("max_tokens"))
+
+    def _generate(self, prompt: str, evaluated: str, callback: Optional[ResponseCallback],
+                  max_tokens: Optional[int]) -> str:
+        user_input = prompt.rsplit("User: ", 1)[-1].rsplit("\nJARVIS:", 1)[0].strip()
+        text = json.dumps(mock_response(user_input))
+
+        prompt_tokens = self._count_tokens(evaluated)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            fail_at = None
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                fail_at = self._random.randint(0, max(len(text.split(" ")) - 1, 0))
+
+        if self.prompt_eval_ms:
+            time.sleep(prompt_tokens * self.prompt_eval_ms / 1000)
+
+        # Stream word by word like a tokenizer would
+        generated = []
+        for word in text.split(" "):
+            if fail_at is not None and len(generated) == fail_at:
+                with self._lock:
+                    self.stats["failures"] += 1
+                raise RuntimeError("Simulated inference failure")
+            if max_tokens is not None and len(generated) >= max_tokens:
+                break
+            if self.tokens_per_second:
+                with self._lock:
+                    variation = self._random.uniform(-self.jitter, self.jitter)
+                time.sleep(max(0.0, (1 + variation) / self.tokens_per_second))
+
+            token = word if not generated else " " + word
+            generated.append(token)
+            if callback and callback(0, token) is False:
+                break
+
+        with self._lock:
+            self.stats["generated_tokens"] += len(generated)
+        return "".join(generated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get simulated request, failure and token counts"""
+        with self._lock:
+            return dict(self.stats)
+
+
+class MockBackend(LLMBackend):
+    """Canned keyword-based answers, no model needed, with optional simulated latency"""
+
+    name = "mock"
+
+    def __init__(self, prompt_eval_ms: float = 0.0, tokens_per_second: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.options = {
+            "prompt_eval_ms": prompt_eval_ms,
+            "tokens_per_second": tokens_per_second,
+            "jitter": jitter,
+            "failure_rate": failure_rate,
+            "seed": seed
+        }
+
+    def load(self, model_name: str, n_threads: Optional[int] = None):
+        return MockModel(**self.options)
+
+
+class OpenAICompatibleModel:
+    """Client for the /completions endpoint of a local OpenAI-compatible server.
+
+    Requests share a keep-alive connection pool and stream the completion as
+    server-sent events, so tokens reach the callback as they are generated.
+    Stopping early closes that response's connection, which tells the server
+    to stop generating.
+    """
+
+    def __init__(self, base_url: str, model_name: str, api_key: Optional[str] = None,
+                 max_connections: int = 4, timeout: float = 120.0):
+        self.model_name = model_name
+        self.base_path = urllib3.util.parse_url(base_url).path or ""
+        self.base_path = self.base_path.rstrip("/")
+        self.headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self.pool = urllib3.connectionpool.connection_from_url(
+            base_url, maxsize=max_connections, block=False, retries=False,
+            timeout=urllib3.Timeout(connect=5.0, read=timeout)
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def generate(self, prompt: str, callback: Optional[ResponseCallback] = None,
+                 max_tokens: int = 256, temp: float = 0.7, top_p: float = 0.4,
+                 top_k: Optional[int] = None, repeat_penalty: Optional[float] = None, **params) -> str:
+        body = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "max_tokens": max_tokens,
+            "temperature": temp,
+            "top_p": top_p,
+            "stream": True
+        }
+        # Sampling extensions understood by llama.cpp-style servers
+        if top_k is not None:
+            body["top_k"] = top_k
+        if repeat_penalty is not None:
+            body["repeat_penalty"] = repeat_penalty
+
+        with self._lock:
+            self.requests += 1
+        response = self.pool.urlopen(
+            "POST", f"{self.base_path}/completions", body=json.dumps(body).encode("utf-8"),
+            headers=self.headers, preload_content=False
+        )
+        if response.status != 200:
+            detail = response.read().decode("utf-8", "replace")[:200]
+            response.release_conn()
+            raise RuntimeError(f"Completion request failed with HTTP {response.status}: {detail}")
+
+        generated = []
+        cancelled = False
+        buffer = b""
+        try:
+            for chunk in response.stream(decode_content=True):
+                buffer += chunk
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    line = line.strip()
+                    if not line.startswith(b"data:") or line[5:].strip() == b"[DONE]":
+                        continue
+                    choices = json.loads(line[5:]).get("choices") or [{}]
+                    text = choices[0].get("text", "")
+                    if not text:
+                        continue
+                    generated.append(text)
+                    if callback and callback(0, text) is False:
+                        cancelled = True
+                        break
+                if cancelled:
+                    break
+        finally:
+            if cancelled:
+                # Dropping the connection stops generation on the server
+                response.close()
+            else:
+                response.drain_conn()
+            response.release_conn()
+
+        return "".join(generated)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get request and connection counts of the pool"""
+        return {"requests": self.requests, "connections_opened": self.pool.num_connections}
+
+    def close(self):
+        self.pool.close()
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """A local OpenAI-compatible HTTP server, e.g. the llama.cpp server"""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8080/v1", api_key: Optional[str] = None,
+                 max_connections: int = 4, timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+    def locate(self, model_name: str):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        response = urllib3.request("GET", f"{self.base_url}/models", headers=headers,
+                                   timeout=5.0, retries=False)
+        if response.status != 200:
+            raise RuntimeError(f"LLM server at {self.base_url} answered HTTP {response.status}")
+
+    def load(self, model_name: str, n_threads: Optional[int] = None):
+        return OpenAICompatibleModel(self.base_url, model_name, self.api_key,
+                                     self.max_connections, self.timeout)
+
+
+BACKENDS = {
+    "gpt4all": GPT4AllBackend,
+    "mock": MockBackend,
+    "openai": OpenAICompatibleBackend
+}
+
+
+def create_backend(config: Dict[str, Any]) -> LLMBackend:
+    """Create the backend named by ``config["backend"]``, passing the remaining options"""
+    options = dict(config)
+    name = options.pop("backend", "gpt4all")
+    if name not in BACKENDS:
+        logging.error(f"Unknown LLM backend '{name}', using gpt4all")
+        name = "gpt4all"
+    return BACKENDS[name](**options)
@@ -2,163 +2,687 @@ import json
 import logging
 import os
 import asyncio
+import re
 import signal
-from typing import Dict, Any
-from gpt4all import GPT4All
+import time
+from typing import Dict, Any, Callable, Awaitable, List, Optional, Tuple
+from gpt4all import Embed4All
 from settings_manager import settings
+from inference_worker import InferenceWorker, InferenceQueueFull
+from inference_process import InferenceProcess, InferenceProcessDied
+from llm_backends import create_backend
+from model_pool import ModelPool
+from model_registry import ModelRegistry, ResidentModel, process_rss_mb
+from model_residency import ResidencyMonitor
+from cancellation import CancellationToken, GenerationCancelled
+from circuit_breaker import CircuitBreaker, OPEN
+from action_catalog import (EXAMPLES, LLM_ACTIONS, LLM_ACTIONS_BY_NAME, PROMPT_PREAMBLE, ActionPrefilter,
+                            model_params, render_catalogue)
+from inference_metrics import InferenceMetrics
+from json_stream import IncrementalJsonScanner
+from prompt_cache import PromptPrefixCache
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from session_store import estimate_tokens
+
+TokenCallback = Callable[[str], Awaitable[None]]
+ActionCallback = Callable[[str], None]
+
+# Start of an action-only answer; the model continues from the action name
+ACTION_ONLY_PRIMER = '{"action": "'
 
 class LLMInterface:
     def __init__(self, model_name: str = None):
         # Get model from settings, fallback to parameter or default
         self.model_name = model_name or settings.get_ai_model()
         self.model = None
+        # Set instead of a single worker/model when model_pool_size > 1
+        self.pool: Optional[ModelPool] = None
         self.model_initialized = False
-        self.use_mock_responses = settings.is_mock_mode()
-        self.system_prompt = """You are JARVIS, a helpful AI assistant. You help users with various tasks.
-
-IMPORTANT: You must respond with ONLY a JSON object in this exact format:
-{
-    "response": "Your helpful response to the user",
-    "action": "action_name or null",
-    "params": {"param": "value"}
-}
-
-Available actions:
-- create_document: Create files. Params: {"name": "filename.txt", "content": "file content"}
-- find_files: Search files. Params: {"extension": "txt", "folder": "."}
-- set_alarm: Set reminders. Params: {"minutes": 5, "message": "reminder text"}
-- open_app: Open applications. Params: {"app_name": "calculator"}
-- get_system_info: Get system info. Params: {}
-- read_document: Read files. Params: {"name": "filename.txt"}
-
-Examples:
-User: "Create a file called hello.txt"
-Response: {"response": "I'll create a file called hello.txt for you.", "action": "create_document", "params": {"name": "hello.txt", "content": "Hello World!"}}
-
-User: "What can you do?"
-Response: {"response": "I can help you create files, set reminders, open apps, and get system information. What would you like me to do?", "action": null, "params": {}}
-
-RESPOND ONLY WITH THE JSON OBJECT - NO OTHER TEXT."""
+        # Where models come from: GPT4All files, canned mock answers or a local HTTP server
+        self.backend_config = settings.get_llm_backend_settings()
+        self.backend = create_backend(self.backend_config)
+        # Single owner thread for the model so generation never blocks the event loop
+        self.worker = InferenceWorker(max_queue_size=16, name="llm-inference", **settings.get_scheduler_settings())
+        # With top_k set, only the actions and examples relevant to each request go into its prompt
+        selection = settings.get_prompt_selection_settings()
+        self.prompt_top_k = selection["top_k"]
+        self.prompt_examples = selection["examples"]
+        self.action_prefilter = ActionPrefilter()
+        # Static preamble shared by every request; its model state is evaluated once and reused
+        self.system_prompt = PROMPT_PREAMBLE
+        if not self.prompt_top_k:
+            # Selection disabled: the whole catalogue is part of the cached preamble
+            self.system_prompt += "\n\n" + render_catalogue(LLM_ACTIONS, EXAMPLES)
+        self.prefix_cache = PromptPrefixCache(self.system_prompt)
+        # Sampling parameters tuned for JSON output
+        self.generation_params = {
+            "max_tokens": 256,
+            "temp": 0.3,
+            "top_p": 0.8,
+            "repeat_penalty": 1.1
+        }
+        cache_settings = settings.get_response_cache_settings()
+        self.response_cache = ResponseCache(
+            max_entries=cache_settings["max_entries"],
+            ttl_seconds=cache_settings["ttl_seconds"],
+            persist_path="logs/response_cache.json" if cache_settings["persist"] else None
+        )
+        # Semantic cache is created on first use, once the embedding size is known
+        self.semantic_cache = None
+        self.embedder = None
+        self.embedder_failed = False
+        # Moving average of model generation time, used to estimate time saved by skipping it
+        self.avg_generation_seconds = 0.0
+        # Background loading progress: idle -> opening -> loading -> warming_up -> ready (or failed)
+        self.load_status = {"stage": "idle", "progress": 0.0, "error": None, "elapsed_seconds": 0.0}
+        self.status_listeners = []
+        self._load_task: Optional[asyncio.Task] = None
+        self._load_started: Optional[float] = None
+        # Failed loads are retried in the background with backoff; requests fail fast meanwhile
+        self.breaker = CircuitBreaker(**settings.get_model_retry_settings())
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        # Hot model swap triggered by reload_settings
+        self.swap_status = {"state": "idle", "target_model": None, "serving_model": None, "error": None}
+        self.swap_listeners = []
+        self._swap_target: Optional[Tuple[str, str]] = None
+        self._swap_task: Optional[asyncio.Task] = None
+        # Tokens saved by stopping once the JSON object closes
+        self.last_tokens_saved = 0
+        self.early_stop_stats = {
+            "requests": 0,
+            "stopped_early": 0,
+            "tokens_generated": 0,
+            "tokens_saved": 0
+        }
+        # Generations stopped because the caller went away or sent something newer
+        self.cancel_stats = {"cancelled": 0, "wasted_tokens": 0, "by_reason": {}}
+        # Token counts and timings of every generation, for tuning max_tokens, threads and prompt length
+        self.metrics = InferenceMetrics(window=settings.get_metrics_window())
+        # Idle/memory-pressure unloading; an unloaded model is reloaded by the next request or a prewarm
+        self.last_used = time.monotonic()
+        self.active_generations = 0
+        self.unloaded = False
+        self.residency = ResidencyMonitor(self, **settings.get_residency_settings())
+        # Recently used models stay loaded within a RAM budget so switching back is instant
+        self.registry = ModelRegistry(settings.get_model_memory_budget_mb())
+        self._model_loads: Dict[str, asyncio.Task] = {}
+        # Clear commands can be answered with only {"action", "params"}; the reply comes from a template
+        self.action_only = settings.get_action_only_settings()
+        self.action_only_failures: Dict[str, int] = {}
+        self.avg_action_reply_tokens = 0.0
+        self.action_only_stats = {
+            "attempts": 0,
+            "answered": 0,
+            "fallbacks": 0,
+            "tokens_generated": 0,
+            "tokens_saved": 0,
+            "time_saved_ms": 0.0
+        }
 
     async def reload_settings(self):
-        """Reload settings and reinitialize model if needed"""
-        old_model_name = self.model_name
-        old_mock_mode = self.use_mock_responses
-        
+        """Reload settings and hot-swap the model if it changed
+
+        The current model keeps serving while the new one loads and warms up
+        in the background; see ``_hot_swap``.
+        """
         # Reload settings
         settings.load_settings()
         new_model_name = settings.get_ai_model()
-        new_mock_mode = settings.is_mock_mode()
+        new_config = settings.get_llm_backend_settings()
+        self.residency.configure(**settings.get_residency_settings())
+        retry_settings = settings.get_model_retry_settings()
+        self.breaker.base_delay, self.breaker.max_delay = retry_settings["base_delay"], retry_settings["max_delay"]
+        self.registry.set_budget(settings.get_model_memory_budget_mb())
+        self._release(self.registry.make_room(0, keep=self.model_name))
+        self.action_only = settings.get_action_only_settings()
+        self.action_only_failures.clear()
         
-        # Check if model or mock mode changed
-        if (old_model_name != new_model_name or old_mock_mode != new_mock_mode):
-            logging.info(f"Settings changed: model {old_model_name} -> {new_model_name}, mock {old_mock_mode} -> {new_mock_mode}")
-            
+        if new_model_name == self.model_name and new_config == self.backend_config:
+            # Back to what is already serving; drop any swap still loading
+            self._swap_target = None
+            return
+        
+        logging.info(f"Settings changed: model {self.model_name} -> {new_model_name}, "
+                     f"backend {self.backend.name} -> {new_config['backend']}")
+        
+        self._swap_target = (new_model_name, json.dumps(new_config, sort_keys=True))
+        self._swap_task = asyncio.ensure_future(self._hot_swap(new_model_name, new_config))
+
+    async def _hot_swap(self, new_model_name: str, new_config: Dict[str, Any]):
+        """Load a model next to the serving one, then switch to it atomically"""
+        target = (new_model_name, json.dumps(new_config, sort_keys=True))
+        # Let an initial load that is already running finish first
+        if self.is_loading:
+            await self._load_task
+        if self._swap_target != target:
+            return
+        
+        new_backend = create_backend(new_config)
+        if not self.model_initialized:
+            # Nothing is serving, so a plain background load is all that is needed
+            self.model = None
             self.model_name = new_model_name
-            self.use_mock_responses = new_mock_mode
+            self.backend, self.backend_config = new_backend, new_config
+            self.prefix_cache.invalidate()
+            # A new configuration deserves an immediate attempt, whatever failed before
+            self.breaker.reset()
+            await self._set_swap_status("loading", new_model_name)
+            success = await self.start_background_load()
+            await self._set_swap_status("swapped" if success else "failed", new_model_name,
+                                        None if success else self.load_status["error"])
+            return
+        
+        loop = asyncio.get_event_loop()
+        pool_size = settings.get_model_pool_size()
+        backend_changed = new_config != self.backend_config
+        new_pool = None
+        # Switching back to a model that is still resident needs no loading
+        entry = None if pool_size > 1 or backend_changed else self.registry.get(new_model_name)
+        loaded = entry is None
+        try:
+            await self._set_swap_status("loading", new_model_name)
+            if pool_size > 1:
+                new_pool = await asyncio.wait_for(
+                    loop.run_in_executor(None, lambda: self._create_pool(new_model_name, pool_size, new_backend)),
+                    timeout=60.0 * pool_size
+                )
+            elif entry is None:
+                if not backend_changed:
+                    self._release(self.registry.make_room(new_backend.model_size_mb(new_model_name),
+                                                          keep=self.model_name))
+                entry = await asyncio.wait_for(
+                    loop.run_in_executor(None, lambda: self._load_resident(new_model_name, new_backend)),
+                    timeout=60.0
+                )
+            if self._swap_target != target:
+                logging.info(f"Swap to {new_model_name} superseded")
+                if new_pool:
+                    await loop.run_in_executor(None, new_pool.close)
+                elif loaded:
+                    self._release([entry])
+                return
             
-            # Reset model if we're switching to/from mock mode or different model
-            if old_mock_mode != new_mock_mode or old_model_name != new_model_name:
-                self.model = None
-                self.model_initialized = False
-                logging.info("Model will be reinitialized on next request")
+            # Warm the new model off the serving worker; it is not shared with it yet
+            if loaded:
+                await self._set_swap_status("warming_up", new_model_name)
+                try:
+                    if new_pool:
+                        await new_pool.start()
+                        await new_pool.warm_up("\n\nUser: hello\nJARVIS:")
+                    else:
+                        await loop.run_in_executor(
+                            None, lambda: entry.prefix_cache.generate(entry.model, "\n\nUser: hello\nJARVIS:", max_tokens=1)
+                        )
+                except Exception as e:
+                    logging.warning(f"Warm-up of {new_model_name} failed (continuing): {e}")
+        except Exception as e:
+            logging.error(f"Failed to load {new_model_name} for hot swap: {e}")
+            await self._set_swap_status("failed", new_model_name, str(e) or "Model loading timed out")
+            return
+        
+        # Swap the pointers together; requests submitted from here on use the new model
+        old_model, old_pool = self.model, self.pool
+        self.model = new_pool.members[0].model if new_pool else entry.model
+        self.pool = new_pool
+        if entry is not None:
+            self.prefix_cache = entry.prefix_cache
+        self.model_name = new_model_name
+        self.backend, self.backend_config = new_backend, new_config
+        self.model_initialized = True
+        if self.semantic_cache:
+            self.semantic_cache.clear()
+        self._swap_target = None
+        
+        # The previous model stays resident unless it came from another backend
+        self._retire_serving(old_model, old_pool)
+        if backend_changed:
+            self._release(self.registry.clear())
+        if entry is not None and loaded:
+            self._register(entry)
+        
+        logging.info(f"Hot-swapped model to {new_model_name}")
+        await self._set_swap_status("swapped", new_model_name)
+        await self._set_load_stage("ready", 1.0)
+
+    def _retire_serving(self, model, pool: Optional[ModelPool]):
+        """Release a replaced model or pool in the background, unless the model stays resident"""
+        if pool is not None:
+            asyncio.ensure_future(pool.retire())
+        elif model is not None and not self.registry.holds(model):
+            asyncio.ensure_future(self._retire_model(model))
+
+    def _release(self, entries: List[ResidentModel]):
+        """Release models dropped from the registry once their queued generations finish"""
+        for entry in entries:
+            asyncio.ensure_future(self._retire_model(entry.model))
+
+    def _register(self, entry: ResidentModel):
+        """Keep a loaded model resident, evicting least recently used ones over the budget"""
+        self._release(self.registry.add(entry, keep=self.model_name))
+
+    def _load_resident(self, model_name: str, backend=None) -> ResidentModel:
+        """Load a single model instance and measure the memory it takes (blocking)"""
+        backend = backend or self.backend
+        rss_before = process_rss_mb()
+        model = self._create_model(model_name, backend=backend)
+        if isinstance(model, InferenceProcess):
+            measured = process_rss_mb(model.get_stats()["pid"])
+        else:
+            measured = process_rss_mb() - rss_before
+        # Weight pages are mapped lazily, so count at least the file size
+        memory_mb = max(measured, backend.model_size_mb(model_name), 0.0)
+        logging.info(f"Loaded {model_name} ({memory_mb:.0f} MB)")
+        return ResidentModel(model_name, model, PromptPrefixCache(self.system_prompt), memory_mb)
+
+    async def _resident_model(self, model_name: str) -> ResidentModel:
+        """Get a model for a request that asked for it, loading it if it is not resident"""
+        entry = self.registry.get(model_name)
+        if entry is not None:
+            return entry
+        
+        # Concurrent requests for the same model share one load
+        load = self._model_loads.get(model_name)
+        if load is None:
+            load = asyncio.ensure_future(self._load_requested_model(model_name))
+            self._model_loads[model_name] = load
+            load.add_done_callback(lambda _: self._model_loads.pop(model_name, None))
+        return await asyncio.shield(load)
+
+    async def _load_requested_model(self, model_name: str) -> ResidentModel:
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, lambda: self.backend.locate(model_name))
+        self._release(self.registry.make_room(self.backend.model_size_mb(model_name), keep=self.model_name))
+        entry = await asyncio.wait_for(
+            loop.run_in_executor(None, lambda: self._load_resident(model_name)), timeout=60.0
+        )
+        try:
+            await self.worker.submit(
+                entry.prefix_cache.generate, entry.model, "\n\nUser: hello\nJARVIS:", max_tokens=1
+            )
+        except Exception as e:
+            logging.warning(f"Warm-up of {model_name} failed (continuing): {e}")
+        self._register(entry)
+        return entry
+
+    async def _retire_model(self, model):
+        """Release a model once the generations already queued for it have finished"""
+        close = getattr(model, "close", None)
+        if close is None:
+            return
+        
+        # As a barrier the close runs after every job queued before it, background ones included
+        while True:
+            try:
+                await self.worker.submit(close, barrier=True)
+                logging.info("Released previous model")
+                return
+            except InferenceQueueFull:
+                await asyncio.sleep(0.5)
+            except Exception as e:
+                logging.warning(f"Error releasing previous model: {e}")
+                return
+
+    @property
+    def is_resident(self) -> bool:
+        """Check if a model is loaded and serving"""
+        return self.model_initialized
+
+    @property
+    def is_busy(self) -> bool:
+        """Check if a model is generating, loading or being swapped"""
+        swapping = self._swap_task is not None and not self._swap_task.done()
+        return self.active_generations > 0 or self.is_loading or swapping or bool(self._model_loads)
+
+    @property
+    def idle_seconds(self) -> float:
+        """Seconds since the last request or prewarm"""
+        return time.monotonic() - self.last_used
+
+    async def unload(self, reason: str = "idle") -> bool:
+        """Release every resident model to free memory; the next request loads the model again
+
+        Returns False if there is nothing to unload or the model is busy.
+        """
+        if not self.model_initialized or self.is_busy:
+            return False
+        
+        old_model, old_pool = self.model, self.pool
+        self.model = None
+        self.pool = None
+        self.model_initialized = False
+        self.unloaded = True
+        self.prefix_cache.invalidate()
+        self._retire_serving(old_model, old_pool)
+        self._release(self.registry.clear())
+        
+        logging.info(f"Unloading model {self.model_name} ({reason})")
+        await self._set_load_stage("unloaded", 0.0)
+        return True
+
+    def prewarm(self) -> Dict[str, Any]:
+        """Start loading an unloaded model ahead of the request that will need it"""
+        self.last_used = time.monotonic()
+        if not self.model_initialized and not self.is_loading:
+            # While the breaker is open this waits for the scheduled retry
+            self.start_background_load()
+        return self.get_load_status()
+
+    async def _set_swap_status(self, state: str, target: str, error: str = None):
+        """Update the hot-swap state and notify listeners"""
+        self.swap_status = {
+            "state": state,
+            "target_model": target,
+            "serving_model": "mock" if self.backend.name == "mock" else self.model_name,
+            "error": error
+        }
+        for listener in list(self.swap_listeners):
+            try:
+                await listener(dict(self.swap_status))
+            except Exception as e:
+                logging.warning(f"Model swap listener failed: {e}")
+
+    def add_swap_listener(self, listener: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Register a coroutine called with the swap status on every change"""
+        self.swap_listeners.append(listener)
+
+    def get_swap_status(self) -> Dict[str, Any]:
+        """Get the state of the latest model hot swap"""
+        return dict(self.swap_status)
+
+    def start_background_load(self) -> Optional[asyncio.Task]:
+        """Load the model in the background; returns the running load task
+
+        While the circuit breaker is open after a failed load nothing is
+        started and the failed task is returned; the load is retried in the
+        background once the backoff has passed.
+        """
+        if self._load_task is None or self._load_task.done():
+            if not self.breaker.allow_attempt():
+                return self._load_task
+            self._load_task = asyncio.ensure_future(self.initialize())
+            self._load_task.add_done_callback(self._schedule_retry)
+        return self._load_task
+
+    def _schedule_retry(self, task: asyncio.Task):
+        """Retry a failed load once the breaker's backoff has passed"""
+        if task.cancelled() or self.breaker.state != OPEN:
+            return
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+        logging.info(f"Retrying model load in {self.breaker.retry_in:.0f}s")
+        self._retry_handle = asyncio.get_event_loop().call_later(self.breaker.retry_in, self._retry_load)
+
+    def _retry_load(self):
+        self._retry_handle = None
+        if not self.model_initialized and not self.is_loading:
+            self.start_background_load()
+
+    @property
+    def is_loading(self) -> bool:
+        """Check if a background model load is in progress"""
+        return self._load_task is not None and not self._load_task.done()
+
+    def add_status_listener(self, listener: Callable[[Dict[str, Any]], Awaitable[None]]):
+        """Register a coroutine called with the load status on every stage change"""
+        self.status_listeners.append(listener)
+
+    def get_load_status(self) -> Dict[str, Any]:
+        """Get the current model loading stage and progress"""
+        status = dict(self.load_status)
+        status["ready"] = self.model_initialized
+        status["model"] = self.model_name
+        status["backend"] = self.backend.name
+        return status
+
+    async def _set_load_stage(self, stage: str, progress: float, error: str = None):
+        """Update the load stage and notify listeners"""
+        self.load_status["stage"] = stage
+        self.load_status["progress"] = progress
+        self.load_status["error"] = error
+        if self._load_started is not None:
+            self.load_status["elapsed_seconds"] = round(time.monotonic() - self._load_started, 2)
+        
+        for listener in list(self.status_listeners):
+            try:
+                await listener(self.get_load_status())
+            except Exception as e:
+                logging.warning(f"Model status listener failed: {e}")
 
     async def initialize(self):
-        """Initialize the GPT4All model (assumes model is already downloaded)"""
+        """Load the model from the configured backend (assumes model is already downloaded)"""
         if self.model_initialized:
             return True
-            
-        # Check if we should use mock mode
-        if self.use_mock_responses:
-            logging.info("Using mock mode - no model initialization needed")
-            self.model_initialized = True
-            return True
-            
-        logging.info(f"Loading GPT4All model {self.model_name}...")
+        
+        self._load_started = time.monotonic()
+        logging.info(f"Loading model {self.model_name} with the {self.backend.name} backend...")
         
         try:
-            # Run the model initialization in a thread (should be fast now since model is pre-downloaded)
-            def init_model():
-                return GPT4All(self.model_name, allow_download=False)
-            
-            # Use asyncio to run in executor with shorter timeout since model should exist
             loop = asyncio.get_event_loop()
-            self.model = await asyncio.wait_for(
-                loop.run_in_executor(None, init_model),
-                timeout=60.0  # 1 minute timeout for loading existing model
-            )
+            
+            # Locate the model file (or check the server is up)
+            await self._set_load_stage("opening", 0.1)
+            await loop.run_in_executor(None, lambda: self.backend.locate(self.model_name))
+            
+            # Memory-map the weights; use a shorter timeout since the model should exist
+            await self._set_load_stage("loading", 0.3)
+            pool_size = settings.get_model_pool_size()
+            if pool_size > 1:
+                self.pool = await asyncio.wait_for(
+                    loop.run_in_executor(None, lambda: self._create_pool(self.model_name, pool_size)),
+                    timeout=60.0 * pool_size
+                )
+                await self.pool.start()
+                self.model = self.pool.members[0].model
+            else:
+                entry = self.registry.get(self.model_name)
+                if entry is None:
+                    self._release(self.registry.make_room(self.backend.model_size_mb(self.model_name),
+                                                          keep=self.model_name))
+                    entry = await asyncio.wait_for(
+                        loop.run_in_executor(None, lambda: self._load_resident(self.model_name)),
+                        timeout=60.0  # 1 minute timeout for loading existing model
+                    )
+                    self._register(entry)
+                self.model = entry.model
+                self.prefix_cache = entry.prefix_cache
+            
+            # A first tiny generation touches the weights and evaluates the cached prompt prefix
+            await self._set_load_stage("warming_up", 0.8)
+            await self._warm_up()
             
             self.model_initialized = True
-            logging.info(f"GPT4All model {self.model_name} loaded successfully")
+            self.unloaded = False
+            self.last_used = time.monotonic()
+            self.breaker.record_success()
+            await self._set_load_stage("ready", 1.0)
+            logging.info(f"Model {self.model_name} loaded successfully")
             return True
             
         except asyncio.TimeoutError:
             logging.error("Model loading timed out after 1 minute")
             self.model_initialized = False
+            self.breaker.record_failure("Model loading timed out")
+            await self._set_load_stage("failed", 0.0, "Model loading timed out")
             return False
         except Exception as e:
-            logging.error(f"Failed to load GPT4All model: {e}")
+            logging.error(f"Failed to load model: {e}")
             logging.error("Model may not be downloaded. Try running the startup script again.")
             self.model_initialized = False
+            self.breaker.record_failure(str(e))
+            await self._set_load_stage("failed", 0.0, str(e))
             return False
 
-    async def generate_response(self, user_input: str, context: str = "") -> Dict[str, Any]:
-        """Generate response from the LLM"""
-        # Use mock responses if enabled (for testing without model download)
-        if self.use_mock_responses:
-            return self._generate_mock_response(user_input)
+    def _create_model(self, model_name: str, n_threads: Optional[int] = None, backend=None):
+        """Load a model from the serving backend, or from ``backend`` if given"""
+        return (backend or self.backend).load(model_name, n_threads=n_threads)
+
+    def _create_pool(self, model_name: str, size: int, backend=None) -> ModelPool:
+        """Load ``size`` instances of a model, each with threads for its slice of cores"""
+        return ModelPool.load(
+            lambda n_threads: self._create_model(model_name, n_threads=n_threads, backend=backend),
+            size, self.system_prompt, **settings.get_scheduler_settings()
+        )
+
+    async def _warm_up(self):
+        """Run a one-token generation so the first real request is not the slow one"""
+        try:
+            if self.pool:
+                await self.pool.warm_up("\n\nUser: hello\nJARVIS:")
+                return
+            await self.worker.submit(
+                self.prefix_cache.generate, self.model, "\n\nUser: hello\nJARVIS:", max_tokens=1
+            )
+        except Exception as e:
+            logging.warning(f"Model warm-up failed (continuing): {e}")
+
+    async def generate_response(self, user_input: str, context: str = "",
+                                on_token: Optional[TokenCallback] = None,
+                                cancel_token: Optional[CancellationToken] = None,
+                                priority: str = "interactive", model_name: Optional[str] = None,
+                                on_action: Optional[ActionCallback] = None,
+                                history: str = "") -> Dict[str, Any]:
+        """Generate response from the LLM
+
+        ``context`` (e.g. context the client sent) and ``history`` (the
+        conversation so far) are placed between the system prompt and the user
+        turn. If ``on_token`` is given it is awaited with each new piece of the
+        user-facing response text while the model is still generating. Firing ``cancel_token`` stops generation at the
+        next token and returns a reply marked ``cancelled``. ``priority`` is the
+        scheduler class ("interactive" or "background"); generated replies
+        report their queue position and wait under ``queue`` and their token
+        counts and timings under ``metrics``. ``model_name`` answers with
+        another model than the configured one, loading it if it is not
+        resident (e.g. a small model for classification). A command that
+        clearly names one action may be answered action-only: the reply then
+        has ``action_only`` set and an empty ``response``, which the caller
+        writes from the action result (see ``action_catalog.render_reply``).
+        ``on_action`` is called on the event loop with the action name as
+        soon as the model has written it, before generation finishes.
+        Action-only answers leave ``history`` out of the prompt, so they are
+        cached on the user turn and hit whatever was said before; other
+        replies are cached per history, and semantically only without one.
+        """
+        self.last_used = time.monotonic()
+        if model_name == self.model_name:
+            model_name = None
+        full_context = "\n".join(filter(None, [context, history]))
+        # Clear commands don't depend on the conversation, so they are cached without it
+        action_only = self.wants_action_only(user_input, model_name)
+        model_key = f"{self.backend.name}:{model_name or self.model_name}"
+        command_key = cache_key = None
+        if settings.is_response_cache_enabled():
+            if action_only:
+                command_key = self.response_cache.make_key(
+                    user_input, model_key, self.generation_params, context, self.system_prompt
+                )
+            cache_key = self.response_cache.make_key(
+                user_input, model_key, self.generation_params, full_context, self.system_prompt
+            )
+            for key in filter(None, (command_key, cache_key)):
+                cached_response = self.response_cache.get(key)
+                if cached_response is not None:
+                    if on_token:
+                        await on_token(cached_response.get("response", ""))
+                    return cached_response
+        
+        # Paraphrases of earlier requests can be served from the semantic cache
+        embedding = None
+        if not context and (action_only or not history) and settings.get_semantic_cache_settings()["enabled"]:
+            embedding = await self._embed(user_input)
+            if embedding is not None:
+                cached_response = self._semantic_lookup(user_input, embedding, model_key)
+                if cached_response is not None:
+                    if on_token:
+                        await on_token(cached_response.get("response", ""))
+                    return cached_response
             
-        if not self.model_initialized:
-            success = await self.initialize()
-            if not success:
+        entry = None
+        if model_name:
+            try:
+                entry = await self._resident_model(model_name)
+            except Exception as e:
+                logging.error(f"Could not load requested model {model_name}: {e}")
                 return {
-                    "response": "I'm sorry, I'm having trouble initializing my AI model. You can try setting JARVIS_USE_MOCK=true for testing without the full model.",
+                    "response": f"I'm sorry, I couldn't load the model {model_name}.",
                     "action": None,
                     "params": {}
                 }
         
+        if entry is None and not self.model_initialized and self.unloaded and self.breaker.state != OPEN:
+            # Unloaded to save memory: reload transparently (sharing a prewarm already under way)
+            await self.start_background_load()
+        
+        if entry is None and not self.model_initialized:
+            # Never block a request on the first model load; answer right away and load in the background
+            self.start_background_load()
+            if not self.is_loading:
+                # The breaker is open: fail fast until the background retry
+                return {
+                    "response": "I'm sorry, I'm having trouble initializing my AI model. You can try setting JARVIS_USE_MOCK=true for testing without the full model.",
+                    "action": None,
+                    "params": {},
+                    "model_unavailable": True,
+                    "retry_in_seconds": round(self.breaker.retry_in, 1)
+                }
+            return {
+                "response": "I'm still warming up my AI model. Please try again in a moment.",
+                "action": None,
+                "params": {},
+                "warming_up": True
+            }
+        
+        if cancel_token is not None and cancel_token.cancelled:
+            self._record_cancel(cancel_token.reason, 0)
+            return self._cancelled_reply(cancel_token)
+        
         try:
-            # Improved prompt with better structure
-            prompt = f"""You are JARVIS, a helpful AI assistant. You help users with various tasks.
-
-IMPORTANT: You must respond with ONLY a JSON object in this exact format:
-{{"response": "Your helpful response to the user", "action": "action_name or null", "params": {{"param": "value"}}}}
-
-Available actions:
-- create_document: Create files. Params: {{"name": "filename.txt", "content": "file content"}}
-- find_files: Search files. Params: {{"extension": "txt", "folder": "."}}
-- set_alarm: Set reminders. Params: {{"minutes": 5, "message": "reminder text"}}
-- open_app: Open applications. Params: {{"app_name": "calculator"}}
-- get_system_info: Get system info. Params: {{}}
-- read_document: Read files. Params: {{"name": "filename.txt"}}
-
-Examples:
-User: "Create a file called hello.txt"
-JARVIS: {{"response": "I'll create a file called hello.txt for you.", "action": "create_document", "params": {{"name": "hello.txt", "content": "Hello World!"}}}}
-
-User: "What can you do?"
-JARVIS: {{"response": "I can help you create files, set reminders, open apps, and get system information. What would you like me to do?", "action": null, "params": {{}}}}
+            # Only the actions for this utterance, the conversation so far and the user turn are new;
+            # the system prompt comes from the prefix cache
+            catalogue = self.prompt_catalogue(user_input)
+            actions = f"\n\n{catalogue}" if catalogue else ""
+            before = f"\n\n{full_context}" if full_context else ""
+            user_turn = f"""{actions}{before}
 
 User: {user_input}
 JARVIS:"""
             
-            # Generate with better parameters for JSON output
-            response = self.model.generate(
-                prompt,
-                max_tokens=256,
-                temp=0.3,
-                top_p=0.8,
-                repeat_penalty=1.1
-            )
+            if action_only:
+                reply = await self._generate_action_only(
+                    user_input, f"{actions}\n\n{context}" if context else actions, cancel_token, priority, entry,
+                    model_name or self.model_name, on_action
+                )
+                if reply is not None:
+                    cacheable = {k: v for k, v in reply.items() if k not in ("queue", "metrics")}
+                    if command_key:
+                        self.response_cache.put(command_key, cacheable)
+                    if embedding is not None:
+                        self.semantic_cache.add(embedding, {"input": user_input, "model": model_key, "result": cacheable})
+                    return reply
             
-            # Clean the response
-            response = response.strip()
+            # Generate with better parameters for JSON output on the inference thread
+            started = time.monotonic()
+            ticket: Dict[str, Any] = {}
+            timings: Dict[str, Any] = {}
+            response, scanner = await self._generate_text(
+                user_turn, on_token, cancel_token, priority, ticket, timings, entry,
+                on_action=on_action, **self.generation_params
+            )
+            self._record_generation_time(time.monotonic() - started)
+            metrics = self._record_metrics(user_turn, ticket, timings)
             
-            # Extract JSON if wrapped in other text
-            if response.startswith('```'):
-                response = response.split('```')[1]
-            if response.startswith('json'):
-                response = response[4:].strip()
+            if scanner.complete:
+                # Generation stopped on the closing brace; the object is already isolated
+                response = scanner.object_text
+            else:
+                # Clean the response
+                response = response.strip()
+                
+                # Extract JSON if wrapped in other text
+                if response.startswith('```'):
+                    response = response.split('```')[1]
+                if response.startswith('json'):
+                    response = response[4:].strip()
             
             # Try to parse JSON response
             try:
@@ -177,6 +701,23 @@ JARVIS:"""
                 if "params" not in parsed_response:
                     parsed_response["params"] = {}
                 
+                # Baseline for the tokens action-only answers save
+                if parsed_response["action"]:
+                    generated = timings["generated_tokens"]
+                    if self.avg_action_reply_tokens == 0.0:
+                        self.avg_action_reply_tokens = generated
+                    else:
+                        self.avg_action_reply_tokens = 0.8 * self.avg_action_reply_tokens + 0.2 * generated
+                
+                # Only well-formed model answers are worth caching
+                if cache_key:
+                    self.response_cache.put(cache_key, parsed_response)
+                if embedding is not None and not history:
+                    self.semantic_cache.add(embedding, {"input": user_input, "model": model_key, "result": parsed_response})
+                
+                # Where the request waited in the scheduler (not cached: it differs per request)
+                parsed_response["queue"] = dict(ticket)
+                parsed_response["metrics"] = metrics
                 return parsed_response
                 
             except (json.JSONDecodeError, ValueError) as e:
@@ -214,51 +755,416 @@ JARVIS:"""
                         "params": {}
                     }
                 
-        except Exception as e:
-            logging.error(f"Error generating response: {e}")
+        except InferenceQueueFull as e:
+            logging.warning(f"Rejecting request: {e}")
             return {
-                "response": "I'm sorry, I encountered an error processing your request.",
+                "response": "I'm busy with other requests right now. Please try again in a moment.",
                 "action": None,
                 "params": {}
             }
-    
-    def _generate_mock_response(self, user_input: str) -> Dict[str, Any]:
-        """Generate mock responses for testing without model download"""
-        user_lower = user_input.lower()
-        
-        if any(word in user_lower for word in ["create", "make", "write", "file", "document"]):
-            return {
-                "response": "I'll create a document for you using mock mode.",
-                "action": "create_document",
-                "params": {"name": "test_document.txt", "content": "This is a test document created in mock mode."}
-            }
-        elif any(word in user_lower for word in ["find", "search", "look"]):
+        except GenerationCancelled:
+            return self._cancelled_reply(cancel_token)
+        except InferenceProcessDied as e:
+            logging.error(f"Inference process unavailable: {e}")
             return {
-                "response": "I'll search for files using mock mode.",
-                "action": "find_files", 
-                "params": {"extension": "txt", "folder": "."}
-            }
-        elif any(word in user_lower for word in ["alarm", "reminder", "remind"]):
-            return {
-                "response": "I'll set a reminder for you using mock mode.",
-                "action": "set_alarm",
-                "params": {"minutes": 5, "message": "Test reminder"}
-            }
-        elif any(word in user_lower for word in ["system", "info", "status"]):
-            return {
-                "response": "Here's your system information in mock mode.",
-                "action": "get_system_info",
+                "response": "My language model is restarting. Please try again in a moment.",
+                "action": None,
                 "params": {}
             }
-        elif any(word in user_lower for word in ["open", "launch", "start"]):
-            return {
-                "response": "I'll open an application for you using mock mode.",
-                "action": "open_app",
-                "params": {"app_name": "calculator"}
-            }
-        else:
+        except Exception as e:
+            logging.error(f"Error generating response: {e}")
             return {
-                "response": f"I understand you said: '{user_input}'. I'm running in mock mode for testing. Try asking me to create a file, set a reminder, or get system info!",
+                "response": "I'm sorry, I encountered an error processing your request.",
                 "action": None,
                 "params": {}
-            }
\ No newline at end of file
+            }
+    
+    def prompt_catalogue(self, user_input: str) -> str:
+        """Actions and examples for this utterance, or "" when the whole catalogue is in the preamble"""
+        if not self.prompt_top_k:
+            return ""
+        actions, examples = self.action_prefilter.select(user_input, self.prompt_top_k, self.prompt_examples)
+        return render_catalogue(actions, examples)
+
+    def wants_action_only(self, user_input: str, model_name: Optional[str] = None) -> bool:
+        """Check if a message clearly names one action and the model is still trusted to answer action-only"""
+        if not self.action_only["enabled"]:
+            return False
+        if self.action_only_failures.get(model_name or self.model_name, 0) >= self.action_only["max_failures"]:
+            return False
+        ranked = self.action_prefilter.rank(user_input)
+        best = ranked[0][1] if ranked else 0.0
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return best >= self.action_only["min_score"] and best > runner_up
+
+    async def _generate_action_only(self, user_input: str, prompt_context: str,
+                                    cancel_token: Optional[CancellationToken], priority: str,
+                                    entry: Optional[ResidentModel], model_key: str,
+                                    on_action: Optional[ActionCallback] = None) -> Optional[Dict[str, Any]]:
+        """Let the model choose only the action and its params, under a tight token cap
+
+        The answer is primed with ``{"action": "`` and generation stops as
+        soon as ``params`` closes, so no friendly sentence is generated.
+        Returns None if the model answered no catalogued action; the caller
+        then generates a full reply. A model whose output is not such an
+        object ``max_failures`` times in a row is not asked again until the
+        settings are reloaded.
+        """
+        user_turn = f"""{prompt_context}
+
+User: {user_input}
+Answer with only the action and its params.
+JARVIS: {ACTION_ONLY_PRIMER}"""
+        params = {**self.generation_params, "max_tokens": self.action_only["max_tokens"]}
+        started = time.monotonic()
+        ticket: Dict[str, Any] = {}
+        timings: Dict[str, Any] = {}
+        self.action_only_stats["attempts"] += 1
+        _, scanner = await self._generate_text(
+            user_turn, None, cancel_token, priority, ticket, timings, entry,
+            primer=ACTION_ONLY_PRIMER, stop_after="params", on_action=on_action, **params
+        )
+        elapsed = time.monotonic() - started
+        metrics = self._record_metrics(user_turn, ticket, timings)
+        generated = timings["generated_tokens"]
+        self.action_only_stats["tokens_generated"] += generated
+        
+        reply = None
+        if scanner.complete:
+            try:
+                reply = json.loads(scanner.object_text)
+            except json.JSONDecodeError:
+                pass
+        if not isinstance(reply, dict) or not isinstance(reply.get("params"), dict):
+            failures = self.action_only_failures.get(model_key, 0) + 1
+            self.action_only_failures[model_key] = failures
+            logging.info(f"No action-only answer from {model_key} after {generated} tokens: {scanner.object_text!r}")
+            if failures == self.action_only["max_failures"]:
+                logging.warning(f"Model {model_key} does not follow the action-only format; using full replies")
+            reply = None
+        else:
+            self.action_only_failures[model_key] = 0
+        
+        if reply is None or reply.get("action") not in LLM_ACTIONS_BY_NAME:
+            # Chit-chat or an unknown action needs a reply written by the model
+            self.action_only_stats["fallbacks"] += 1
+            return None
+        
+        self.action_only_stats["answered"] += 1
+        self.action_only_stats["tokens_saved"] += max(round(self.avg_action_reply_tokens) - generated, 0)
+        if self.avg_generation_seconds:
+            self.action_only_stats["time_saved_ms"] += max(self.avg_generation_seconds - elapsed, 0.0) * 1000
+        return {
+            "response": "",
+            "action": reply["action"],
+            "params": model_params(reply["params"]),
+            "action_only": True,
+            "queue": dict(ticket),
+            "metrics": metrics
+        }
+
+    async def _generate_text(self, user_turn: str, on_token: Optional[TokenCallback] = None,
+                             cancel_token: Optional[CancellationToken] = None,
+                             priority: str = "interactive", ticket: Optional[Dict[str, Any]] = None,
+                             timings: Optional[Dict[str, Any]] = None,
+                             entry: Optional[ResidentModel] = None, primer: str = "",
+                             stop_after: Optional[str] = None, on_action: Optional[ActionCallback] = None,
+                             **params) -> Tuple[str, IncrementalJsonScanner]:
+        """Run the model on the inference worker until its JSON object is complete
+
+        Every token is fed to an incremental JSON scanner on the inference
+        thread; generation stops as soon as the top-level object balances and,
+        if ``on_token`` is given, the response text is streamed to it. If
+        ``cancel_token`` fires, a queued job is dropped, a running one stops at
+        its next token, and GenerationCancelled is raised. ``timings``, if
+        given, is filled with monotonic submission, first-token and finish
+        times and the number of generated tokens. ``entry`` is a resident model
+        to use instead of the serving one. ``primer`` is the start of the
+        answer already written at the end of the prompt, and ``stop_after``
+        a top-level field after which generation stops. ``on_action`` is
+        called on the event loop once the ``"action"`` string is complete.
+        """
+        if entry is None and self.pool is None:
+            entry = self.registry.get(self.model_name)
+            if entry is not None and entry.model is not self.model:
+                entry = None
+        model, prefix_cache = (entry.model, entry.prefix_cache) if entry else (self.model, self.prefix_cache)
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+        scanner = IncrementalJsonScanner("response", stop_after=stop_after)
+        scanner.feed(primer)
+        generated = 0
+        first_token_at = None
+        action_seen = False
+        
+        def callback(token_id: int, text: str) -> bool:
+            # Called on the inference thread for every generated token
+            nonlocal generated, first_token_at, action_seen
+            if cancel_token is not None and cancel_token.cancelled:
+                return False
+            if first_token_at is None:
+                first_token_at = time.monotonic()
+            generated += 1
+            delta = scanner.feed(text)
+            if delta and on_token:
+                loop.call_soon_threadsafe(deltas.put_nowait, delta)
+            if on_action is not None and not action_seen and "action" in scanner.strings:
+                action_seen = True
+                loop.call_soon_threadsafe(on_action, scanner.strings["action"])
+            return not scanner.complete
+        
+        submitted = time.monotonic()
+        self.active_generations += 1
+        if entry is not None:
+            entry.requests += 1
+            entry.in_flight += 1
+        if self.pool and entry is None:
+            # The pool picks the least loaded instance
+            generation = self.pool.generate(user_turn, callback, priority=priority, ticket=ticket, **params)
+        else:
+            generation = self.worker.submit(
+                prefix_cache.generate, model, user_turn, callback,
+                priority=priority, ticket=ticket, **params
+            )
+        job = asyncio.ensure_future(generation)
+        job.add_done_callback(lambda _: deltas.put_nowait(None))
+        job.add_done_callback(lambda _: self._generation_done(entry))
+        if cancel_token is not None:
+            # Cancelling the job takes it off the queue; a running one sees the token at its next token
+            cancel_token.add_callback(lambda _: loop.call_soon_threadsafe(job.cancel))
+        
+        while True:
+            delta = await deltas.get()
+            if delta is None:
+                break
+            if on_token:
+                try:
+                    await on_token(delta)
+                except Exception as e:
+                    logging.warning(f"Stopped streaming tokens: {e}")
+                    on_token = None
+        
+        try:
+            text = await job
+        except asyncio.CancelledError:
+            if cancel_token is None or not cancel_token.cancelled:
+                raise
+            text = None
+        
+        if cancel_token is not None and cancel_token.cancelled and not scanner.complete:
+            self._record_cancel(cancel_token.reason, generated)
+            raise GenerationCancelled(cancel_token.reason)
+        
+        self._record_early_stop(scanner.complete, generated, params.get("max_tokens", 0))
+        if timings is not None:
+            timings.update(submitted=submitted, first_token_at=first_token_at,
+                           finished=time.monotonic(), generated_tokens=generated)
+        return (primer + text if text is not None else scanner.object_text), scanner
+
+    def _generation_done(self, entry: Optional[ResidentModel]):
+        self.active_generations -= 1
+        if entry is not None:
+            entry.in_flight -= 1
+        self.last_used = time.monotonic()
+
+    def _record_cancel(self, reason: str, wasted_tokens: int):
+        """Count a cancelled generation and the tokens generated for nothing"""
+        self.cancel_stats["cancelled"] += 1
+        self.cancel_stats["wasted_tokens"] += wasted_tokens
+        self.cancel_stats["by_reason"][reason] = self.cancel_stats["by_reason"].get(reason, 0) + 1
+        logging.info(f"Generation cancelled ({reason}) after {wasted_tokens} tokens")
+
+    @staticmethod
+    def _cancelled_reply(cancel_token: CancellationToken) -> Dict[str, Any]:
+        return {
+            "response": "",
+            "action": None,
+            "params": {},
+            "cancelled": True,
+            "cancel_reason": cancel_token.reason
+        }
+
+    def _record_early_stop(self, stopped: bool, generated: int, max_tokens: int):
+        """Count tokens not generated because the JSON object closed early"""
+        saved = max(max_tokens - generated, 0) if stopped else 0
+        self.last_tokens_saved = saved
+        self.early_stop_stats["requests"] += 1
+        self.early_stop_stats["tokens_generated"] += generated
+        if stopped:
+            self.early_stop_stats["stopped_early"] += 1
+            self.early_stop_stats["tokens_saved"] += saved
+            logging.info(f"JSON object closed after {generated} tokens, {saved} of {max_tokens} saved")
+
+    def _record_metrics(self, user_turn: str, ticket: Dict[str, Any], timings: Dict[str, Any]) -> Dict[str, Any]:
+        """Derive a generation's token counts and latencies and add them to the histograms
+
+        Prompt-eval time runs from leaving the queue to the first token, so it
+        includes sampling that token; time to first token also includes the
+        queue wait. Prompt tokens are estimated from the full prompt length.
+        """
+        submitted, first_token_at, finished = timings["submitted"], timings["first_token_at"], timings["finished"]
+        generated = timings["generated_tokens"]
+        queue_wait_ms = ticket.get("queue_wait_ms") or 0.0
+        
+        metrics = {
+            "prompt_tokens": estimate_tokens(self.system_prompt + user_turn),
+            "generated_tokens": generated,
+            "queue_wait_ms": queue_wait_ms,
+            "prompt_eval_ms": None,
+            "time_to_first_token_ms": None,
+            "tokens_per_second": None,
+            "total_ms": round((finished - submitted) * 1000, 2)
+        }
+        if first_token_at is not None:
+            ttft_ms = (first_token_at - submitted) * 1000
+            metrics["time_to_first_token_ms"] = round(ttft_ms, 2)
+            metrics["prompt_eval_ms"] = round(max(ttft_ms - queue_wait_ms, 0.0), 2)
+            decode_seconds = finished - first_token_at
+            if generated > 1 and decode_seconds > 0:
+                metrics["tokens_per_second"] = round((generated - 1) / decode_seconds, 2)
+        
+        self.metrics.record(metrics)
+        return metrics
+
+    def _record_generation_time(self, elapsed: float):
+        """Fold a generation time into the moving average"""
+        if self.avg_generation_seconds == 0.0:
+            self.avg_generation_seconds = elapsed
+        else:
+            self.avg_generation_seconds = 0.8 * self.avg_generation_seconds + 0.2 * elapsed
+
+    async def _embed(self, text: str):
+        """Embed an utterance with the local embedding model, or None if unavailable"""
+        if self.embedder_failed:
+            return None
+        
+        loop = asyncio.get_running_loop()
+        try:
+            if self.embedder is None:
+                # Only a model that is already on disk; never a download in the middle of a request
+                self.embedder = await loop.run_in_executor(None, lambda: Embed4All(allow_download=False))
+            return await loop.run_in_executor(None, self.embedder.embed, text)
+        except Exception as e:
+            logging.warning(f"Semantic cache disabled, embedding model unavailable: {e}")
+            self.embedder_failed = True
+            return None
+    
+    def _semantic_lookup(self, user_input: str, embedding, model_key: str) -> Optional[Dict[str, Any]]:
+        """Find a cached response of the same model for a similar utterance"""
+        if self.semantic_cache is None:
+            options = settings.get_semantic_cache_settings()
+            self.semantic_cache = SemanticCache(
+                dim=len(embedding),
+                capacity=options["capacity"],
+                threshold=options["threshold"]
+            )
+        
+        entry = self.semantic_cache.lookup(embedding)
+        if entry is None or entry.get("model") != model_key:
+            return None
+        
+        # Similar wording with different numbers ("in 5 minutes" vs "in 50 minutes") is not a match
+        if re.findall(r'\d+', entry["input"]) != re.findall(r'\d+', user_input):
+            return None
+        # Nor one naming another target ("open the report" vs "open the invoice"): every cached
+        # param must be spelled out in the new utterance, so an action never runs on the wrong one
+        if not self._params_in_utterance(entry["result"].get("params"), user_input):
+            return None
+        return entry["result"]
+    
+    @staticmethod
+    def _params_in_utterance(params: Any, user_input: str) -> bool:
+        """Check every param value appears verbatim (case included) in ``user_input``"""
+        if not params:
+            return True
+        if not isinstance(params, dict):
+            return False
+        for value in params.values():
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                return False
+            if str(value) not in user_input:
+                return False
+        return True
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Get depth and wait-time statistics of the inference queue"""
+        return self.worker.get_stats()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get per-instance load of the model pool"""
+        if self.pool is None:
+            return {"size": 1}
+        return self.pool.get_stats()
+
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """Get reuse statistics of the cached system-prompt prefix"""
+        return self.prefix_cache.get_stats()
+
+    def get_response_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics of the response cache"""
+        return self.response_cache.get_stats()
+
+    def get_early_stop_stats(self) -> Dict[str, Any]:
+        """Get how often generation stopped at the closing brace and the tokens saved"""
+        return dict(self.early_stop_stats, last_tokens_saved=self.last_tokens_saved)
+
+    def get_cancel_stats(self) -> Dict[str, Any]:
+        """Get how many generations were cancelled and the tokens they wasted"""
+        return dict(self.cancel_stats, by_reason=dict(self.cancel_stats["by_reason"]))
+
+    def get_action_only_stats(self) -> Dict[str, Any]:
+        """Get how many commands were answered action-only and the tokens and time saved"""
+        stats = dict(self.action_only_stats)
+        stats["time_saved_ms"] = round(stats["time_saved_ms"], 1)
+        stats["enabled"] = self.action_only["enabled"]
+        stats["avg_full_reply_tokens"] = round(self.avg_action_reply_tokens, 1)
+        stats["disabled_models"] = sorted(
+            name for name, failures in self.action_only_failures.items()
+            if failures >= self.action_only["max_failures"]
+        )
+        return stats
+    
+    def get_inference_metrics(self) -> Dict[str, Any]:
+        """Get rolling histograms of token counts and generation timings"""
+        return self.metrics.get_stats()
+
+    def get_resident_model_stats(self) -> Dict[str, Any]:
+        """Get the models kept loaded, the memory each uses and the budget"""
+        return self.registry.get_stats(serving=self.model_name)
+
+    def get_breaker_stats(self) -> Dict[str, Any]:
+        """Get the circuit breaker state of model loading"""
+        return self.breaker.get_stats()
+
+    @property
+    def model_unavailable(self) -> bool:
+        """Check if the model failed to load and is waiting for a background retry"""
+        return not self.model_initialized and self.breaker.state == OPEN
+
+    def get_residency_stats(self) -> Dict[str, Any]:
+        """Get the idle/memory-pressure unload policy and how often it unloaded the model"""
+        return self.residency.get_stats()
+
+    def get_semantic_cache_stats(self) -> Dict[str, Any]:
+        """Get statistics of the semantic cache"""
+        if self.semantic_cache is None:
+            return {"entries": 0, "enabled": settings.get_semantic_cache_settings()["enabled"]}
+        return self.semantic_cache.get_stats()
+
+    def get_inference_process_stats(self) -> Dict[str, Any]:
+        """Get the state of the inference process, if the model is hosted in one"""
+        if isinstance(self.model, InferenceProcess):
+            return self.model.get_stats()
+        return {"enabled": False}
+
+    def shutdown(self):
+        """Stop the inference worker and any inference process, and save the response cache"""
+        self.response_cache.flush()
+        self.residency.stop()
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+        self.worker.shutdown()
+        if self.pool:
+            self.pool.close()
+        elif isinstance(self.model, InferenceProcess):
+            self.model.close()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, List, Optional
+
+from inference_worker import InferenceWorker
+from prompt_cache import PromptPrefixCache
+
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_slices(size: int, cores: Optional[List[int]] = None) -> List[List[int]]:
+    """Split the cores into ``size`` contiguous, equally sized slices"""
+    cores = cores or available_cores()
+    per_instance = max(1, len(cores) // size)
+    slices = []
+    for i in range(size):
+        start = (i * per_instance) % len(cores)
+        slices.append(cores[start:start + per_instance])
+    return slices
+
+
+def _pin_current_thread(cores: List[int]):
+    """Restrict the calling thread (and threads it starts) to the given cores"""
+    if hasattr(os, "sched_setaffinity"):
+        # pid 0 is the calling thread on Linux; llama.cpp compute threads inherit the mask
+        os.sched_setaffinity(0, cores)
+
+
+@dataclass
+class PoolMember:
+    model: Any
+    worker: InferenceWorker
+    prefix_cache: PromptPrefixCache
+    cores: List[int]
+    in_flight: int = 0
+    completed: int = 0
+
+
+class ModelPool:
+    """Several model instances that generate in parallel, each on its own slice of cores.
+
+    Every instance gets ``n_threads`` equal to its slice size and its own
+    inference worker, whose thread is pinned to that slice, so instances
+    do not fight over cores. Requests go to the instance with the fewest
+    queued and running generations.
+    """
+
+    def __init__(self, members: List[PoolMember]):
+        self.members = members
+        self.dispatched = 0
+
+    @classmethod
+    def load(cls, create_model: Callable[[int], Any], size: int, prefix: str,
+             max_queue_size: int = 16, cores: Optional[List[int]] = None,
+             class_limits: Optional[Dict[str, int]] = None, aging_seconds: float = 10.0) -> "ModelPool":
+        """Load ``size`` instances; ``create_model(n_threads)`` builds one. Blocking."""
+        members = []
+        try:
+            for i, core_slice in enumerate(plan_core_slices(size, cores)):
+                model = create_model(len(core_slice))
+                members.append(PoolMember(
+                    model=model,
+                    worker=InferenceWorker(max_queue_size=max_queue_size, name=f"llm-inference-{i}",
+                                           class_limits=class_limits, aging_seconds=aging_seconds),
+                    prefix_cache=PromptPrefixCache(prefix),
+                    cores=core_slice
+                ))
+                logging.info(f"Loaded pool instance {i} on cores {core_slice}")
+        except Exception:
+            for member in members:
+                cls._close_member(member)
+            raise
+        return cls(members)
+
+    async def start(self):
+        """Pin each instance's worker thread to its cores"""
+        for member in self.members:
+            try:
+                await member.worker.submit(_pin_current_thread, member.cores)
+            except OSError as e:
+                logging.warning(f"Could not pin {member.worker.name} to cores {member.cores}: {e}")
+
+    def least_loaded(self) -> PoolMember:
+        """Instance with the fewest queued and running generations"""
+        return min(self.members, key=lambda member: member.in_flight)
+
+    async def generate(self, suffix: str, callback=None, priority: str = "interactive",
+                       ticket: Optional[Dict[str, Any]] = None, **params) -> str:
+        """Generate on the least loaded instance"""
+        member = self.least_loaded()
+        member.in_flight += 1
+        self.dispatched += 1
+        try:
+            return await member.worker.submit(
+                member.prefix_cache.generate, member.model, suffix, callback,
+                priority=priority, ticket=ticket, **params
+            )
+        finally:
+            member.in_flight -= 1
+            member.completed += 1
+
+    async def warm_up(self, suffix: str):
+        """Evaluate the prefix on every instance"""
+        await asyncio.gather(*(
+            member.worker.submit(member.prefix_cache.generate, member.model, suffix, max_tokens=1)
+            for member in self.members
+        ))
+
+    async def retire(self):
+        """Release every instance once its queued generations have finished"""
+        for member in self.members:
+            close = getattr(member.model, "close", None)
+            if close:
+                await member.worker.submit(close, barrier=True)
+            member.worker.shutdown()
+
+    @staticmethod
+    def _close_member(member: PoolMember):
+        close = getattr(member.model, "close", None)
+        if close:
+            close()
+        member.worker.shutdown()
+
+    def close(self):
+        """Release every instance immediately"""
+        for member in self.members:
+            self._close_member(member)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-instance load"""
+        return {
+            "size": len(self.members),
+            "dispatched": self.dispatched,
+            "instances": [
+                {
+                    "cores": member.cores,
+                    "in_flight": member.in_flight,
+                    "completed": member.completed,
+                    "queue": member.worker.get_stats()
+                }
+                for member in self.members
+            ]
+        }
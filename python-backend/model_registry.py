@@ -0,0 +1,126 @@
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import psutil
+
+from prompt_cache import PromptPrefixCache
+
+
+def process_rss_mb(pid: Optional[int] = None) -> float:
+    """Resident memory of a process (this one by default) in MB"""
+    return psutil.Process(pid or os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def default_memory_budget_mb() -> float:
+    """Half of physical memory, used when no budget is configured"""
+    return psutil.virtual_memory().total / (1024 * 1024) / 2
+
+
+@dataclass
+class ResidentModel:
+    name: str
+    model: Any
+    prefix_cache: PromptPrefixCache
+    memory_mb: float = 0.0
+    loaded_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    in_flight: int = 0
+
+
+class ModelRegistry:
+    """Loaded models kept resident in least-recently-used order under a memory budget.
+
+    Switching back to a resident model is instant. Adding a model evicts the
+    least recently used ones until the total fits ``budget_mb``; the serving
+    model and models with generations in flight are never evicted, so the
+    total can briefly exceed the budget. Evicted entries are returned to the
+    caller, which releases them.
+    """
+
+    def __init__(self, budget_mb: float = 0.0):
+        self.set_budget(budget_mb)
+        self._models: "OrderedDict[str, ResidentModel]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_budget(self, budget_mb: float):
+        """Change the budget; 0 means half of physical memory"""
+        self.budget_mb = budget_mb if budget_mb > 0 else default_memory_budget_mb()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._models
+
+    def get(self, name: str) -> Optional[ResidentModel]:
+        """Look up a resident model and mark it most recently used"""
+        entry = self._models.get(name)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry.last_used = time.monotonic()
+        self._models.move_to_end(name)
+        return entry
+
+    def make_room(self, needed_mb: float, keep: Optional[str] = None) -> List[ResidentModel]:
+        """Evict least recently used models until ``needed_mb`` more fits the budget"""
+        evicted = []
+        for name, entry in list(self._models.items()):
+            if self.used_mb + needed_mb <= self.budget_mb:
+                break
+            if name == keep or entry.in_flight:
+                continue
+            del self._models[name]
+            self.evictions += 1
+            evicted.append(entry)
+            logging.info(f"Evicting resident model {name} ({entry.memory_mb:.0f} MB)")
+        return evicted
+
+    def add(self, entry: ResidentModel, keep: Optional[str] = None) -> List[ResidentModel]:
+        """Register a loaded model; returns the entries evicted to make room"""
+        self._models.pop(entry.name, None)
+        evicted = self.make_room(entry.memory_mb, keep=keep or entry.name)
+        self._models[entry.name] = entry
+        return evicted
+
+    def holds(self, model) -> bool:
+        """Check if a model object is one of the resident models"""
+        return any(entry.model is model for entry in self._models.values())
+
+    def clear(self) -> List[ResidentModel]:
+        """Forget every model; returns them for release"""
+        entries = list(self._models.values())
+        self._models.clear()
+        return entries
+
+    @property
+    def used_mb(self) -> float:
+        return sum(entry.memory_mb for entry in self._models.values())
+
+    def get_stats(self, serving: Optional[str] = None) -> Dict[str, Any]:
+        """Get the budget, per-model memory and hit/eviction counts"""
+        now = time.monotonic()
+        return {
+            "budget_mb": round(self.budget_mb, 1),
+            "used_mb": round(self.used_mb, 1),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "models": [
+                {
+                    "name": entry.name,
+                    "memory_mb": round(entry.memory_mb, 1),
+                    "requests": entry.requests,
+                    "in_flight": entry.in_flight,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "serving": entry.name == serving
+                }
+                # Most recently used first
+                for entry in reversed(self._models.values())
+            ]
+        }
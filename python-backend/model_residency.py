@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Optional
+
+import psutil
+
+
+class ResidencyMonitor:
+    """Unloads the model when it sits idle or the machine runs short of memory.
+
+    Every ``check_interval`` seconds the monitor looks at how long the model
+    has been unused and at system memory. It unloads the model after
+    ``idle_timeout`` seconds without requests (0 disables this), or earlier
+    when available memory drops below ``min_available_mb`` or usage rises
+    above ``max_memory_percent``. A model that is generating is never
+    unloaded; the next request or a prewarm loads it again.
+    """
+
+    def __init__(self, llm, idle_timeout: float = 900.0, min_available_mb: float = 1024.0,
+                 max_memory_percent: float = 90.0, check_interval: float = 30.0,
+                 memory_probe: Callable[[], Any] = psutil.virtual_memory):
+        self.llm = llm
+        self.memory_probe = memory_probe
+        self.configure(idle_timeout, min_available_mb, max_memory_percent, check_interval)
+        self._task: Optional[asyncio.Task] = None
+        self.unloads = {"idle": 0, "memory_pressure": 0}
+        self.last_memory: Dict[str, Any] = {}
+
+    def configure(self, idle_timeout: float, min_available_mb: float,
+                  max_memory_percent: float, check_interval: float):
+        """Change the policy (e.g. after a settings reload)"""
+        self.idle_timeout = idle_timeout
+        self.min_available_mb = min_available_mb
+        self.max_memory_percent = max_memory_percent
+        self.check_interval = check_interval
+
+    def start(self):
+        """Start checking periodically on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logging.warning(f"Model residency check failed: {e}")
+
+    def _memory_pressure(self) -> bool:
+        memory = self.memory_probe()
+        available_mb = memory.available / (1024 * 1024)
+        self.last_memory = {"available_mb": round(available_mb, 1), "percent": memory.percent}
+        return available_mb < self.min_available_mb or memory.percent > self.max_memory_percent
+
+    async def check(self) -> Optional[str]:
+        """Unload the model if the policy says so; returns the reason, or None"""
+        if not self.llm.is_resident or self.llm.is_busy:
+            return None
+
+        reason = None
+        if self._memory_pressure():
+            reason = "memory_pressure"
+        elif self.idle_timeout and self.llm.idle_seconds >= self.idle_timeout:
+            reason = "idle"
+
+        if reason and await self.llm.unload(reason):
+            self.unloads[reason] += 1
+            logging.info(f"Unloaded model ({reason}, memory {self.last_memory})")
+            return reason
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the policy, the last memory reading and unload counts"""
+        return {
+            "resident": self.llm.is_resident,
+            "idle_seconds": round(self.llm.idle_seconds, 1),
+            "idle_timeout": self.idle_timeout,
+            "min_available_mb": self.min_available_mb,
+            "max_memory_percent": self.max_memory_percent,
+            "memory": dict(self.last_memory),
+            "unloads": dict(self.unloads)
+        }
@@ -0,0 +1,116 @@
+import logging
+from typing import Dict, Any, Callable, List, Optional
+
+ResponseCallback = Callable[[int, str], bool]
+
+
+def _empty_callback(token_id: int, text: str) -> bool:
+    return True
+
+
+class PromptPrefixCache:
+    """Evaluates a fixed prompt prefix once and reuses the model state for it.
+
+    After the prefix has been ingested the llama.cpp context position
+    (``n_past``) is remembered. Each request rewinds the context to that
+    position and only evaluates its own suffix, so the action catalogue and
+    examples are not re-read on every call. Models without the low-level
+    context API fall back to generating from the full prompt.
+
+    Must only be used from the thread that owns the model.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._model = None
+        self._prefix_tokens: Optional[List[int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def invalidate(self):
+        """Forget the saved prefix state (e.g. after the model changed)"""
+        self._model = None
+        self._prefix_tokens = None
+
+    @staticmethod
+    def supports(model) -> bool:
+        """Check whether the model exposes the context API needed for prefix reuse"""
+        llmodel = getattr(model, 'model', None)
+        return llmodel is not None and hasattr(llmodel, 'prompt_model') and hasattr(llmodel, 'context')
+
+    def generate(self, model, suffix: str, callback: Optional[ResponseCallback] = None, **params) -> str:
+        """Generate a completion for prefix + suffix, evaluating only the suffix when possible"""
+        if hasattr(model, 'generate_with_prefix'):
+            # Out-of-process models keep the prefix state on their side
+            self.hits += 1
+            return model.generate_with_prefix(self.prefix, suffix, callback, **params)
+
+        if not self.supports(model):
+            self.fallbacks += 1
+            if callback:
+                params['callback'] = callback
+            return model.generate(self.prefix + suffix, **params)
+
+        llmodel = model.model
+        if not self._prefix_is_loaded(model):
+            self._ingest_prefix(model)
+        else:
+            self.hits += 1
+
+        # Rewind to the end of the prefix; the suffix overwrites whatever followed it
+        llmodel.context.n_past = len(self._prefix_tokens)
+
+        collected = []
+
+        def collect(token_id: int, text: str) -> bool:
+            collected.append(text)
+            return callback(token_id, text) if callback else True
+
+        llmodel.prompt_model(
+            suffix,
+            "%1",
+            collect,
+            n_predict=params.get('max_tokens', 200),
+            temp=params.get('temp', 0.7),
+            top_k=params.get('top_k', 40),
+            top_p=params.get('top_p', 0.4),
+            repeat_penalty=params.get('repeat_penalty', 1.18),
+            reset_context=False
+        )
+        return ''.join(collected)
+
+    def _ingest_prefix(self, model):
+        """Evaluate the prefix from an empty context and remember the resulting tokens"""
+        llmodel = model.model
+        llmodel.prompt_model(self.prefix, "%1", _empty_callback, n_predict=0, reset_context=True)
+
+        context = llmodel.context
+        self._prefix_tokens = [context.tokens[i] for i in range(context.n_past)]
+        self._model = model
+        self.misses += 1
+        logging.info(f"Cached prompt prefix ({len(self._prefix_tokens)} tokens)")
+
+    def _prefix_is_loaded(self, model) -> bool:
+        """Check the model context still starts with the cached prefix"""
+        if self._model is not model or self._prefix_tokens is None:
+            return False
+
+        context = model.model.context
+        n_prefix = len(self._prefix_tokens)
+        try:
+            if context.tokens_size < n_prefix:
+                return False
+            return all(context.tokens[i] == token for i, token in enumerate(self._prefix_tokens))
+        except Exception as e:
+            logging.warning(f"Could not verify cached prompt prefix: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prefix reuse statistics"""
+        return {
+            "prefix_tokens": len(self._prefix_tokens) if self._prefix_tokens else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks
+        }
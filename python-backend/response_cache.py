@@ -0,0 +1,178 @@
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+class ResponseCache:
+    """Bounded LRU cache of parsed LLM responses with a per-entry TTL.
+
+    Keys combine the normalized user input with everything that changes the
+    model's answer (model name, prompt version, sampling parameters), so a
+    settings change that swaps the model can never serve a stale entry.
+    Inputs differing only in case share an entry unless it carries action
+    params, which may be case-sensitive ("Report.txt" vs "report.txt").
+    Changes are written to ``persist_path`` at most every ``save_delay``
+    seconds on a timer thread; ``flush`` writes them at once.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600,
+                 persist_path: Optional[str] = None, save_delay: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.save_delay = save_delay
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Guards entries against the save timer's snapshot
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.persist_path:
+            self.persist_path.parent.mkdir(exist_ok=True)
+            self.load()
+
+    @staticmethod
+    def normalize(text: str, fold_case: bool = True) -> str:
+        """Normalize user input so trivially different phrasings share a key"""
+        text = re.sub(r'\s+', ' ', text.strip())
+        if fold_case:
+            text = text.lower()
+        return text.rstrip('?!. ')
+
+    def make_key(self, user_input: str, model_name: str, params: Dict[str, Any],
+                 context: str = "", prompt: str = "") -> str:
+        """Build the cache key for a request: the entry's key, then a digest of the input's exact case"""
+        key_data = {
+            "input": self.normalize(user_input),
+            "context": context,
+            "model": model_name,
+            "prompt": hashlib.sha1(prompt.encode('utf-8')).hexdigest(),
+            "params": params
+        }
+        entry_key = hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+        case = hashlib.sha1(self.normalize(user_input, fold_case=False).encode('utf-8')).hexdigest()[:16]
+        return f"{entry_key}:{case}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response, or None on a miss"""
+        key, _, case = key.partition(":")
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry["expires"] < time.time():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            # Params come from the exact wording; another casing only shares replies without them
+            if entry["value"].get("params") and entry.get("case") != case:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry["value"])
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a response, evicting the least recently used entries if full"""
+        key, _, case = key.partition(":")
+        with self._lock:
+            self.entries[key] = {
+                "value": copy.deepcopy(value),
+                "case": case,
+                "expires": time.time() + self.ttl_seconds
+            }
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        self._schedule_save()
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self.entries.clear()
+        self._schedule_save()
+
+    def _schedule_save(self):
+        """Write the file once ``save_delay`` after the first unsaved change, off the caller's thread"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write unsaved changes now (e.g. on shutdown)"""
+        with self._lock:
+            pending, self._save_timer = self._save_timer, None
+        if pending is None:
+            # Nothing new, but wait for a write the timer may have under way
+            with self._write_lock:
+                return
+        pending.cancel()
+        self.save()
+
+    def load(self):
+        """Load unexpired entries saved by a previous run"""
+        try:
+            if self.persist_path and self.persist_path.exists():
+                with open(self.persist_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+
+                now = time.time()
+                for key, entry in saved.items():
+                    if entry.get("expires", 0) > now:
+                        self.entries[key] = entry
+
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        except Exception as e:
+            logging.error(f"Error loading response cache: {e}")
+            self.entries.clear()
+
+    def save(self):
+        """Persist the cache if a path was configured"""
+        if not self.persist_path:
+            return
+        with self._write_lock:
+            with self._lock:
+                snapshot = dict(self.entries)
+            try:
+                with open(self.persist_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f)
+            except Exception as e:
+                logging.error(f"Error saving response cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and occupancy"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -0,0 +1,163 @@
+import copy
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of structured responses keyed on utterance embeddings.
+
+    Vectors live in a preallocated ``capacity x dim`` float32 matrix and are
+    L2-normalized on insert, so cosine similarity is a single mat-vec. Once
+    the cache holds enough entries an inverted-file index is built: a sample
+    of stored vectors becomes the coarse centroids, every row is filed under
+    its nearest centroid, and a lookup only scores the rows of the
+    ``nprobe`` closest lists. That keeps lookups sub-millisecond at 100k
+    entries. When full, the least recently used row is overwritten.
+    """
+
+    def __init__(self, dim: int, capacity: int = 10000, threshold: float = 0.92,
+                 n_lists: int = 256, nprobe: int = 8):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.train_size = n_lists * 4
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.values: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.size = 0
+        self._clock = 0.0
+
+        # Inverted-file index, built once train_size entries exist
+        self.centroids: Optional[np.ndarray] = None
+        self.row_list = np.full(capacity, -1, dtype=np.int32)
+        self.lists: List[List[int]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _tick(self) -> float:
+        self._clock += 1.0
+        return self._clock
+
+    def _candidate_rows(self, vector: np.ndarray) -> Optional[np.ndarray]:
+        """Rows to score for a query; None means scan everything"""
+        if self.centroids is None:
+            return None
+
+        centroid_scores = self.centroids @ vector
+        nprobe = min(self.nprobe, self.n_lists)
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = [self.lists[i] for i in probe if self.lists[i]]
+        if not rows:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.asarray(r, dtype=np.int64) for r in rows])
+
+    def search(self, vector) -> Tuple[int, float]:
+        """Return (row, cosine similarity) of the nearest stored vector, or (-1, 0.0)"""
+        if self.size == 0:
+            return -1, 0.0
+
+        query = self._normalize(vector)
+        rows = self._candidate_rows(query)
+        if rows is None:
+            scores = self.vectors[:self.size] @ query
+            best = int(np.argmax(scores))
+            return best, float(scores[best])
+
+        if len(rows) == 0:
+            return -1, 0.0
+        scores = np.take(self.vectors, rows, axis=0) @ query
+        best = int(np.argmax(scores))
+        return int(rows[best]), float(scores[best])
+
+    def lookup(self, vector) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response if a similar enough utterance is stored"""
+        row, score = self.search(vector)
+        if row < 0 or score < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.last_used[row] = self._tick()
+        result = copy.deepcopy(self.values[row])
+        result["cache_similarity"] = round(score, 4)
+        return result
+
+    def add(self, vector, value: Dict[str, Any]):
+        """Store a response for an utterance embedding"""
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            row = int(np.argmin(self.last_used[:self.size]))
+            self._unfile(row)
+            self.evictions += 1
+
+        self.vectors[row] = self._normalize(vector)
+        self.values[row] = copy.deepcopy(value)
+        self.last_used[row] = self._tick()
+
+        if self.centroids is not None:
+            self._file(row)
+        elif self.size >= self.train_size:
+            self._build_index()
+
+    def _build_index(self):
+        """Pick coarse centroids from the stored vectors and file every row"""
+        sample = np.random.default_rng(0).choice(self.size, self.n_lists, replace=False)
+        self.centroids = self.vectors[sample].copy()
+        self.lists = [[] for _ in range(self.n_lists)]
+
+        chunk = 4096
+        for start in range(0, self.size, chunk):
+            end = min(start + chunk, self.size)
+            assignment = np.argmax(self.vectors[start:end] @ self.centroids.T, axis=1)
+            for offset, list_id in enumerate(assignment):
+                self.row_list[start + offset] = list_id
+                self.lists[list_id].append(start + offset)
+
+        logging.info(f"Built semantic cache index with {self.n_lists} lists over {self.size} entries")
+
+    def _file(self, row: int):
+        list_id = int(np.argmax(self.centroids @ self.vectors[row]))
+        self.row_list[row] = list_id
+        self.lists[list_id].append(row)
+
+    def _unfile(self, row: int):
+        list_id = self.row_list[row]
+        if list_id >= 0:
+            self.lists[list_id].remove(row)
+            self.row_list[row] = -1
+
+    def clear(self):
+        """Drop all entries and the index"""
+        self.size = 0
+        self.values = [None] * self.capacity
+        self.last_used[:] = 0
+        self.centroids = None
+        self.row_list[:] = -1
+        self.lists = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get occupancy and hit/miss counters"""
+        return {
+            "entries": self.size,
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "indexed": self.centroids is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+class SessionStore:
+    """Conversation history per session id, assembled into a token-budgeted context.
+
+    Turns are stored compactly (assistant turns keep only the reply text and
+    the action name, not the raw JSON) with their token count computed once.
+    When a session grows past ``max_turns`` the oldest turns are folded into
+    a short running summary, and ``build_context`` only includes as many
+    recent turns as fit the budget, so prompt size stays bounded however long
+    the conversation gets.
+    """
+
+    def __init__(self, persist_path: Optional[str] = None, max_sessions: int = 100,
+                 max_turns: int = 20, summary_chars: int = 400,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.summary_chars = summary_chars
+        self.count_tokens = count_tokens
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+
+        if self.persist_path:
+            self.persist_path.parent.mkdir(exist_ok=True)
+            self.load_sessions()
+
+    def load_sessions(self):
+        """Load saved sessions from file"""
+        try:
+            if self.persist_path and self.persist_path.exists():
+                with open(self.persist_path, 'r', encoding='utf-8') as f:
+                    self.sessions = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading sessions: {e}")
+            self.sessions = {}
+
+    def save_sessions(self):
+        """Save sessions to file"""
+        if not self.persist_path:
+            return
+        try:
+            with open(self.persist_path, 'w', encoding='utf-8') as f:
+                json.dump(self.sessions, f)
+        except Exception as e:
+            logging.error(f"Error saving sessions: {e}")
+
+    def _get_session(self, session_id: str) -> Dict[str, Any]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = {"turns": [], "summary": "", "summary_tokens": 0, "last_active": time.time()}
+            self.sessions[session_id] = session
+            self._evict_sessions()
+        return session
+
+    def _evict_sessions(self):
+        """Drop the least recently active sessions beyond max_sessions"""
+        while len(self.sessions) > self.max_sessions:
+            oldest = min(self.sessions, key=lambda sid: self.sessions[sid]["last_active"])
+            del self.sessions[oldest]
+
+    def add_exchange(self, session_id: str, user_text: str, response: str, action: Optional[str] = None):
+        """Record a user message and the assistant's reply"""
+        session = self._get_session(session_id)
+
+        assistant_text = response.strip()
+        if action:
+            assistant_text += f" [action: {action}]"
+
+        for role, text in (("user", user_text.strip()), ("assistant", assistant_text)):
+            session["turns"].append({"role": role, "text": text, "tokens": self.count_tokens(text)})
+
+        self._compact(session)
+        session["last_active"] = time.time()
+        self.save_sessions()
+
+    def _compact(self, session: Dict[str, Any]):
+        """Fold turns beyond max_turns into the running summary"""
+        overflow = len(session["turns"]) - self.max_turns
+        if overflow <= 0:
+            return
+
+        dropped = session["turns"][:overflow]
+        session["turns"] = session["turns"][overflow:]
+
+        # Keep what the user asked for; replies are mostly recoverable from that
+        notes = [turn["text"][:80] for turn in dropped if turn["role"] == "user"]
+        summary = "; ".join(filter(None, [session["summary"]] + notes))
+        if len(summary) > self.summary_chars:
+            summary = "..." + summary[-(self.summary_chars - 3):]
+        session["summary"] = summary
+        session["summary_tokens"] = self.count_tokens(summary)
+
+    def build_context(self, session_id: str, token_budget: int) -> str:
+        """Assemble the most recent history that fits in the token budget"""
+        session = self.sessions.get(session_id)
+        if not session or token_budget <= 0:
+            return ""
+
+        selected: List[str] = []
+        used = 0
+        for turn in reversed(session["turns"]):
+            if used + turn["tokens"] > token_budget:
+                break
+            speaker = "User" if turn["role"] == "user" else "JARVIS"
+            selected.append(f"{speaker}: {turn['text']}")
+            used += turn["tokens"]
+        selected.reverse()
+
+        # Older turns survive only as the summary, if there is room for it
+        if session["summary"] and used + session["summary_tokens"] <= token_budget:
+            selected.insert(0, f"Earlier in this conversation: {session['summary']}")
+
+        return "\n".join(selected)
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session's turns and summary"""
+        return self.sessions.get(session_id)
+
+    def clear_session(self, session_id: str) -> bool:
+        """Forget a session"""
+        if session_id in self.sessions:
+            del self.sessions[session_id]
+            self.save_sessions()
+            return True
+        return False
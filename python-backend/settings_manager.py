@@ -14,7 +14,47 @@ class SettingsManager:
             "backend_port": 8000,
             "theme": "dark",
             "auto_start": False,
-            "log_level": "INFO"
+            "log_level": "INFO",
+            "response_cache_enabled": True,
+            "response_cache_size": 256,
+            "response_cache_ttl": 3600,
+            "response_cache_persist": True,
+            "semantic_cache_enabled": False,
+            "semantic_cache_size": 10000,
+            "semantic_cache_threshold": 0.92,
+            "fast_path_enabled": True,
+            "fast_path_threshold": 0.9,
+            "context_token_budget": 384,
+            "session_max_turns": 20,
+            "reconnect_grace_seconds": 5.0,
+            "inference_process_enabled": False,
+            "model_pool_size": 1,
+            "interactive_queue_limit": 16,
+            "background_queue_limit": 32,
+            "queue_aging_seconds": 10.0,
+            "llm_backend": "gpt4all",
+            "llm_server_url": "http://127.0.0.1:8080/v1",
+            "llm_server_api_key": "",
+            "llm_server_connections": 4,
+            "mock_prompt_eval_ms": 0.0,
+            "mock_tokens_per_second": 0.0,
+            "mock_jitter": 0.2,
+            "mock_failure_rate": 0.0,
+            "metrics_window": 500,
+            "idle_unload_minutes": 15,
+            "memory_pressure_min_available_mb": 1024,
+            "memory_pressure_max_percent": 90,
+            "residency_check_seconds": 30,
+            "model_memory_budget_mb": 0,
+            "model_retry_base_seconds": 5,
+            "model_retry_max_seconds": 300,
+            "prompt_top_k_actions": 0,
+            "prompt_examples": 2,
+            "action_only_enabled": False,
+            "action_only_max_tokens": 48,
+            "action_only_min_score": 4.0,
+            "action_only_max_failures": 3,
+            "speculative_actions_enabled": True
         }
         self.settings = self.load_settings()
     
@@ -113,6 +153,29 @@ class SettingsManager:
         """Check if mock mode is enabled"""
         return self.get('mock_mode', False) or os.getenv("JARVIS_USE_MOCK", "false").lower() == "true"
     
+    def get_llm_backend_settings(self) -> Dict[str, Any]:
+        """Get which LLM backend to use and its options (mock mode overrides the backend)"""
+        backend = "mock" if self.is_mock_mode() else self.get('llm_backend', 'gpt4all')
+        if backend == "openai":
+            return {
+                "backend": backend,
+                "base_url": self.get('llm_server_url', 'http://127.0.0.1:8080/v1'),
+                "api_key": self.get('llm_server_api_key', '') or None,
+                "max_connections": self.get('llm_server_connections', 4)
+            }
+        if backend == "gpt4all":
+            return {"backend": backend, "process_isolation": self.is_inference_process_enabled()}
+        if backend == "mock":
+            # Simulated inference cost for load testing; all zero means instant answers
+            return {
+                "backend": backend,
+                "prompt_eval_ms": self.get('mock_prompt_eval_ms', 0.0),
+                "tokens_per_second": self.get('mock_tokens_per_second', 0.0),
+                "jitter": self.get('mock_jitter', 0.2),
+                "failure_rate": self.get('mock_failure_rate', 0.0)
+            }
+        return {"backend": backend}
+    
     def get_backend_port(self) -> int:
         """Get the backend port"""
         return self.get('backend_port', 8000)
@@ -121,6 +184,104 @@ class SettingsManager:
         """Check if voice is enabled"""
         return self.get('voice_enabled', True)
     
+    def is_response_cache_enabled(self) -> bool:
+        """Check if the LLM response cache is enabled"""
+        return self.get('response_cache_enabled', True)
+    
+    def get_response_cache_settings(self) -> Dict[str, Any]:
+        """Get size, TTL and persistence options of the response cache"""
+        return {
+            "max_entries": self.get('response_cache_size', 256),
+            "ttl_seconds": self.get('response_cache_ttl', 3600),
+            "persist": self.get('response_cache_persist', True)
+        }
+    
+    def get_semantic_cache_settings(self) -> Dict[str, Any]:
+        """Get options of the embedding-based semantic cache"""
+        return {
+            "enabled": self.get('semantic_cache_enabled', False),
+            "capacity": self.get('semantic_cache_size', 10000),
+            "threshold": self.get('semantic_cache_threshold', 0.92)
+        }
+    
+    def is_fast_path_enabled(self) -> bool:
+        """Check if confident rule matches may skip the LLM"""
+        return self.get('fast_path_enabled', True)
+    
+    def is_speculation_enabled(self) -> bool:
+        """Check if side-effect-free actions may start before the model has finished"""
+        return self.get('speculative_actions_enabled', True)
+    
+    def get_fast_path_threshold(self) -> float:
+        """Get the minimum rule confidence needed to skip the LLM"""
+        return self.get('fast_path_threshold', 0.9)
+    
+    def get_context_token_budget(self) -> int:
+        """Get how many tokens of conversation history go into each prompt"""
+        return self.get('context_token_budget', 384)
+    
+    def get_reconnect_grace_seconds(self) -> float:
+        """Get how long a disconnected client's generations keep running for a reconnect to rejoin"""
+        return self.get('reconnect_grace_seconds', 5.0)
+    
+    def get_scheduler_settings(self) -> Dict[str, Any]:
+        """Get per-priority queue limits and the aging period of the inference scheduler"""
+        return {
+            "class_limits": {
+                "interactive": self.get('interactive_queue_limit', 16),
+                "background": self.get('background_queue_limit', 32)
+            },
+            "aging_seconds": self.get('queue_aging_seconds', 10.0)
+        }
+    
+    def is_inference_process_enabled(self) -> bool:
+        """Check if the model should be hosted in a separate inference process"""
+        return self.get('inference_process_enabled', False)
+    
+    def get_model_pool_size(self) -> int:
+        """Get how many model instances generate in parallel"""
+        return max(1, int(self.get('model_pool_size', 1)))
+    
+    def get_metrics_window(self) -> int:
+        """Get how many recent generations the inference metrics histograms cover"""
+        return max(1, int(self.get('metrics_window', 500)))
+    
+    def get_residency_settings(self) -> Dict[str, Any]:
+        """Get when an idle model is unloaded and what counts as memory pressure"""
+        return {
+            "idle_timeout": float(self.get('idle_unload_minutes', 15)) * 60,
+            "min_available_mb": float(self.get('memory_pressure_min_available_mb', 1024)),
+            "max_memory_percent": float(self.get('memory_pressure_max_percent', 90)),
+            "check_interval": float(self.get('residency_check_seconds', 30))
+        }
+    
+    def get_model_memory_budget_mb(self) -> float:
+        """Get the RAM budget for resident models (0 means half of physical memory)"""
+        return float(self.get('model_memory_budget_mb', 0))
+    
+    def get_model_retry_settings(self) -> Dict[str, Any]:
+        """Get the backoff for retrying a model that failed to load"""
+        return {
+            "base_delay": float(self.get('model_retry_base_seconds', 5)),
+            "max_delay": float(self.get('model_retry_max_seconds', 300))
+        }
+    
+    def get_prompt_selection_settings(self) -> Dict[str, Any]:
+        """Get how many actions and examples go into each prompt (0 actions: the whole catalogue, cached)"""
+        return {
+            "top_k": max(0, int(self.get('prompt_top_k_actions', 0))),
+            "examples": max(0, int(self.get('prompt_examples', 2)))
+        }
+    
+    def get_action_only_settings(self) -> Dict[str, Any]:
+        """Get when clear commands are answered with only an action and a templated reply"""
+        return {
+            "enabled": bool(self.get('action_only_enabled', False)),
+            "max_tokens": max(1, int(self.get('action_only_max_tokens', 48))),
+            "min_score": float(self.get('action_only_min_score', 4.0)),
+            "max_failures": max(1, int(self.get('action_only_max_failures', 3)))
+        }
+    
     def export_settings(self, file_path: str = None) -> bool:
         """Export settings to a file"""
         try:
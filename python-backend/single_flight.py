@@ -0,0 +1,117 @@
+import asyncio
+import copy
+import logging
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+from cancellation import CancellationToken
+
+TokenCallback = Callable[[str], Awaitable[None]]
+
+
+class _Subscriber:
+    """One caller's view of a shared stream of token deltas"""
+
+    def __init__(self, on_token: Optional[TokenCallback], cancel_token: Optional[CancellationToken]):
+        self.on_token = on_token
+        self.cancel_token = cancel_token
+        self.sent = 0
+        self.lock = asyncio.Lock()
+
+    async def catch_up(self, deltas: List[str]):
+        """Send every delta this caller has not seen yet, in order"""
+        async with self.lock:
+            while self.sent < len(deltas):
+                delta = deltas[self.sent]
+                self.sent += 1
+                if self.on_token:
+                    try:
+                        await self.on_token(delta)
+                    except Exception as e:
+                        logging.warning(f"Stopped streaming tokens to a coalesced caller: {e}")
+                        self.on_token = None
+
+
+class _Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.deltas: List[str] = []
+        self.subscribers: List[_Subscriber] = []
+        # Fires only once every caller waiting on the call has cancelled
+        self.cancel_token = CancellationToken()
+
+    def check_cancelled(self, token: CancellationToken):
+        if all(s.cancel_token is not None and s.cancel_token.cancelled for s in self.subscribers):
+            self.cancel_token.cancel(token.reason)
+
+    async def publish(self, delta: str):
+        self.deltas.append(delta)
+        for subscriber in list(self.subscribers):
+            await subscriber.catch_up(self.deltas)
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares it with every concurrent caller.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight wait for the same result instead of starting their own. Token
+    deltas are fanned out to every caller, and late joiners first get the
+    deltas they missed. The call runs as its own task, so a caller going away
+    does not cancel it for the others; the call's own cancellation token only
+    fires once every waiting caller's token has.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str,
+                  fn: Callable[[TokenCallback, CancellationToken], Awaitable[Dict[str, Any]]],
+                  on_token: Optional[TokenCallback] = None,
+                  cancel_token: Optional[CancellationToken] = None) -> Tuple[Dict[str, Any], bool]:
+        """Return (result, shared); ``fn(publish, cancel_token)`` is called only if no call is in flight"""
+        flight = self._flights.get(key)
+        if flight is not None and flight.cancel_token.cancelled:
+            # Everyone gave up on that call; start a fresh one
+            flight = None
+        shared = flight is not None
+
+        if shared:
+            self.coalesced += 1
+        else:
+            flight = _Flight()
+            self._flights[key] = flight
+            self.started += 1
+            flight.task = asyncio.ensure_future(fn(flight.publish, flight.cancel_token))
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+
+        subscriber = _Subscriber(on_token, cancel_token)
+        flight.subscribers.append(subscriber)
+        if cancel_token is not None:
+            cancel_token.add_callback(flight.check_cancelled)
+        if shared:
+            await subscriber.catch_up(flight.deltas)
+
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.subscribers.remove(subscriber)
+
+        await subscriber.catch_up(flight.deltas)
+        return (copy.deepcopy(result) if shared else result), shared
+
+    def _finish(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get how many calls were started and how many callers joined one already running"""
+        return {
+            "in_flight": self.in_flight,
+            "started": self.started,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Callable, Optional
+
+
+class Speculation:
+    """One request's speculative action, started while the model is still generating"""
+
+    def __init__(self, speculator: "ActionSpeculator", message: str):
+        self.speculator = speculator
+        self.message = message
+        self.action: Optional[str] = None
+        self.params: Dict[str, Any] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.started_at = 0.0
+        self.finished_at: Optional[float] = None
+
+    def start(self, action: str):
+        """Run ``action`` now if it is side-effect free; called when the model names it"""
+        if self.task is not None or not self.speculator.router.can_speculate(action):
+            return
+        self.action = action
+        self.params = self.speculator.guess_params(self.message, action)
+        self.started_at = time.monotonic()
+        self.task = asyncio.ensure_future(self.speculator.router.execute_action(action, dict(self.params)))
+        self.task.add_done_callback(self._finished)
+        self.speculator.stats["started"] += 1
+        logging.info(f"Speculatively running {action} with {self.params}")
+
+    def _finished(self, _task: asyncio.Task):
+        self.finished_at = time.monotonic()
+
+    async def result(self, action: Optional[str], params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The speculative result if the model chose the same action and params, else None"""
+        if self.task is None:
+            return None
+        if action != self.action or params != self.params:
+            self.discard()
+            return None
+
+        # Handler time that overlapped with generation
+        overlap = (self.finished_at or time.monotonic()) - self.started_at
+        result = await self.task
+        self.speculator.stats["used"] += 1
+        self.speculator.stats["time_saved_ms"] += overlap * 1000
+        return result
+
+    def discard(self):
+        """Drop the speculative run (the final action or params differ, or nobody needs it)"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        self.task = None
+        self.speculator.stats["discarded"] += 1
+        logging.info(f"Discarded speculative {self.action}")
+
+
+class ActionSpeculator:
+    """Starts side-effect-free actions as soon as the model names them.
+
+    Streaming the model's JSON reveals ``"action"`` before the object is
+    finished. If the catalogue marks that action ``speculative`` its handler
+    starts right away with params guessed from the user's message, in
+    parallel with the rest of generation. The result is used if the model's
+    final action and params match the guess and discarded otherwise, in
+    which case the action runs normally.
+    """
+
+    def __init__(self, router, guess_params: Callable[[str, str], Dict[str, Any]]):
+        self.router = router
+        self.guess_params = guess_params
+        self.stats = {"started": 0, "used": 0, "discarded": 0, "time_saved_ms": 0.0}
+
+    def begin(self, message: str) -> Speculation:
+        return Speculation(self, message)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get how many speculative runs were used or discarded and the handler time hidden"""
+        stats = dict(self.stats)
+        stats["time_saved_ms"] = round(stats["time_saved_ms"], 1)
+        return stats
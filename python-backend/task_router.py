@@ -1,5 +1,6 @@
 import logging
 from typing import Dict, Any
+from action_catalog import ACTIONS, ACTIONS_BY_NAME
 from tasks.file_tasks import FileTasks
 from tasks.alarm_tasks import AlarmTasks
 from tasks.system_tasks import SystemTasks
@@ -12,26 +13,17 @@ class TaskRouter:
         self.system_tasks = SystemTasks()
         self.voice_tasks = VoiceTasks()
         
-        # Map actions to handler methods
+        # Map actions to handler methods; the catalogue is shared with the LLM prompt
         self.action_handlers = {
-            'create_document': self.file_tasks.create_document,
-            'find_files': self.file_tasks.find_files,
-            'read_document': self.file_tasks.read_document,
-            'delete_document': self.file_tasks.delete_document,
-            
-            'set_alarm': self.alarm_tasks.set_alarm,
-            'list_alarms': self.alarm_tasks.list_alarms,
-            'cancel_alarm': self.alarm_tasks.cancel_alarm,
-            
-            'open_app': self.system_tasks.open_app,
-            'get_system_info': self.system_tasks.get_system_info,
-            'run_command': self.system_tasks.run_command,
-            
-            'speak': self.voice_tasks.speak,
-            'listen': self.voice_tasks.listen,
-            'get_voice_info': self.voice_tasks.get_voice_info
+            spec.name: getattr(getattr(self, f"{spec.group}_tasks"), spec.name)
+            for spec in ACTIONS
         }
     
+    def can_speculate(self, action: str) -> bool:
+        """Check if an action has no side effects and may run before the model has finished"""
+        spec = ACTIONS_BY_NAME.get(action)
+        return spec is not None and spec.speculative and action in self.action_handlers
+    
     async def execute_action(self, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Route and execute an action with given parameters"""
         try:
@@ -71,24 +63,7 @@ class TaskRouter:
     
     def get_available_actions(self) -> Dict[str, Any]:
         """Get list of all available actions"""
-        action_descriptions = {
-            'create_document': 'Create a new document with specified name and content',
-            'find_files': 'Find files with specific extension in a folder',
-            'read_document': 'Read the content of a document',
-            'delete_document': 'Delete a document (requires confirmation)',
-            
-            'set_alarm': 'Set an alarm for X minutes with a message',
-            'list_alarms': 'List all active alarms',
-            'cancel_alarm': 'Cancel an active alarm by ID',
-            
-            'open_app': 'Open an application by name',
-            'get_system_info': 'Get comprehensive system information',
-            'run_command': 'Run a system command (safe mode by default)',
-            
-            'speak': 'Convert text to speech',
-            'listen': 'Listen for speech input and convert to text',
-            'get_voice_info': 'Get information about available voices and audio devices'
-        }
+        action_descriptions = {spec.name: spec.description for spec in ACTIONS}
         
         return {
             "success": True,
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import subprocess
 import platform
@@ -74,7 +75,8 @@ class SystemTasks:
         """Get comprehensive system information"""
         try:
             # CPU information
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Sampled for a second on a thread so the event loop (and token streaming) keeps running
+            cpu_percent = await asyncio.to_thread(psutil.cpu_percent, 1)
             cpu_count = psutil.cpu_count()
             cpu_freq = psutil.cpu_freq()
             
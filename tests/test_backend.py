@@ -14,7 +14,24 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../python-backend'))
 
 from llm_interface import LLMInterface
+from llm_backends import MockBackend, OpenAICompatibleBackend
+from inference_worker import InferenceWorker, InferenceQueueFull
+from inference_process import InferenceProcess, InferenceProcessDied, SHM_THRESHOLD
+from model_pool import ModelPool, plan_core_slices
+from model_registry import ModelRegistry, ResidentModel
+from json_stream import IncrementalJsonScanner
+from prompt_cache import PromptPrefixCache
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from session_store import SessionStore
+from single_flight import SingleFlight
+from cancellation import CancellationToken, LatestGenerations
+from action_catalog import ACTIONS, EXAMPLES, ActionPrefilter, render_catalogue, render_reply
+from circuit_breaker import CircuitBreaker
+from speculation import ActionSpeculator
+from inference_metrics import RollingHistogram
 from intent_parser import IntentParser
+from intent_matcher import IntentMatcher, LiteralAutomaton, required_literals
 from task_router import TaskRouter
 from tasks.file_tasks import FileTasks
 from tasks.alarm_tasks import AlarmTasks
@@ -38,6 +55,1566 @@ class TestLLMInterface:
         assert "JSON" in self.llm.system_prompt
         assert "action" in self.llm.system_prompt
 
+class FakeModel:
+    """Stand-in for GPT4All that records overlapping generate calls"""
+    
+    def __init__(self, output='{"response": "Hello", "action": null, "params": {}}', delay=0.05, token_delay=0):
+        import threading
+        self.output = output
+        self.delay = delay
+        self.token_delay = token_delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.closed = False
+        self._lock = threading.Lock()
+    
+    def close(self):
+        self.closed = True
+    
+    def generate(self, prompt, callback=None, **kwargs):
+        import time
+        if self.closed:
+            raise RuntimeError("generate on a closed model")
+        with self._lock:
+            self.last_prompt = prompt
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        output = self.output
+        if callback:
+            # Emit the output a few characters at a time like a tokenizer would
+            for i in range(0, len(self.output), 3):
+                time.sleep(self.token_delay)
+                if callback(0, self.output[i:i + 3]) is False:
+                    output = self.output[:i + 3]
+                    break
+        with self._lock:
+            self.active -= 1
+        return output
+
+def make_test_llm(model):
+    """Create an LLMInterface around a fake model with an in-memory response cache"""
+    llm = LLMInterface()
+    llm.model = model
+    llm.model_initialized = True
+    llm.response_cache = ResponseCache(persist_path=None)
+    return llm
+
+class TestInferenceWorker:
+    """Test the single-owner inference worker"""
+    
+    @pytest.mark.asyncio
+    async def test_jobs_never_overlap(self):
+        """Test concurrent submissions run one at a time"""
+        worker = InferenceWorker(max_queue_size=8)
+        model = FakeModel(delay=0.02)
+        
+        results = await asyncio.gather(*[worker.submit(model.generate, "hi") for _ in range(5)])
+        
+        assert len(results) == 5
+        assert model.max_active == 1
+        stats = worker.get_stats()
+        assert stats['processed'] == 5
+        assert stats['max_wait_ms'] > 0
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_queue_full_rejected(self):
+        """Test that a full queue rejects new work"""
+        worker = InferenceWorker(max_queue_size=1)
+        model = FakeModel(delay=0.1)
+        
+        first = asyncio.ensure_future(worker.submit(model.generate, "a"))
+        await asyncio.sleep(0.01)  # let the consumer pick up the first job
+        second = asyncio.ensure_future(worker.submit(model.generate, "b"))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(InferenceQueueFull):
+            await worker.submit(model.generate, "c")
+        
+        await asyncio.gather(first, second)
+        assert worker.get_stats()['rejected'] == 1
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_jobs_free_their_slots(self):
+        """Test cancelling queued jobs makes room for new ones before the consumer reaches them"""
+        worker = InferenceWorker(max_queue_size=2)
+        model = FakeModel(delay=0.1)
+        
+        running = asyncio.ensure_future(worker.submit(model.generate, "a"))
+        await asyncio.sleep(0.01)
+        queued = [asyncio.ensure_future(worker.submit(model.generate, text)) for text in "bc"]
+        await asyncio.sleep(0)
+        assert worker.queue_depth == 2
+        for job in queued:
+            job.cancel()
+        await asyncio.sleep(0)
+        
+        assert worker.queue_depth == 0
+        assert await worker.submit(model.generate, "d") == model.output
+        await running
+        assert model.calls == 2
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_generate_response_does_not_block_loop(self):
+        """Test generate_response runs the model off the event loop"""
+        llm = make_test_llm(FakeModel(delay=0.2))
+        
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        
+        task = asyncio.ensure_future(ticker())
+        result = await llm.generate_response("hello")
+        task.cancel()
+        
+        assert result['response'] == "Hello"
+        assert ticks > 5
+        llm.shutdown()
+
+class TestPriorityScheduling:
+    """Test priority classes, per-class limits and aging in the inference worker"""
+    
+    @staticmethod
+    async def run_jobs(worker, jobs, first_delay=0.05):
+        """Occupy the worker, queue (name, priority) jobs, and return the order they ran in"""
+        import time
+        order = []
+        blocker = asyncio.ensure_future(worker.submit(time.sleep, first_delay))
+        await asyncio.sleep(0.01)
+        
+        tickets = {}
+        tasks = []
+        for name, priority in jobs:
+            tickets[name] = {}
+            tasks.append(asyncio.ensure_future(
+                worker.submit(order.append, name, priority=priority, ticket=tickets[name])
+            ))
+            await asyncio.sleep(0)
+        await asyncio.gather(blocker, *tasks)
+        return order, tickets
+    
+    @pytest.mark.asyncio
+    async def test_interactive_runs_before_background(self):
+        """Test interactive work overtakes queued background work and reports its position"""
+        worker = InferenceWorker()
+        order, tickets = await self.run_jobs(
+            worker, [("batch1", "background"), ("batch2", "background"), ("chat", "interactive")]
+        )
+        
+        assert order == ["chat", "batch1", "batch2"]
+        assert tickets["chat"]["queue_position"] == 1
+        assert tickets["batch2"]["queue_position"] == 2
+        assert tickets["chat"]["queue_wait_ms"] > 0
+        assert worker.get_stats()["classes"]["background"]["processed"] == 2
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_aging_prevents_starvation(self):
+        """Test background work that waited long enough runs ahead of new interactive work"""
+        import time
+        worker = InferenceWorker(aging_seconds=0.02)
+        order = []
+        blocker = asyncio.ensure_future(worker.submit(time.sleep, 0.1))
+        await asyncio.sleep(0.01)
+        batch = asyncio.ensure_future(worker.submit(order.append, "batch", priority="background"))
+        await asyncio.sleep(0.05)
+        chat = asyncio.ensure_future(worker.submit(order.append, "chat"))
+        await asyncio.gather(blocker, batch, chat)
+        
+        assert order == ["batch", "chat"]
+        assert worker.get_stats()["promotions"] == 1
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_per_class_limits(self):
+        """Test a full background queue does not block interactive requests"""
+        import time
+        worker = InferenceWorker(class_limits={"background": 1})
+        blocker = asyncio.ensure_future(worker.submit(time.sleep, 0.05))
+        await asyncio.sleep(0.01)
+        
+        queued = asyncio.ensure_future(worker.submit(len, "a", priority="background"))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceQueueFull):
+            await worker.submit(len, "b", priority="background")
+        assert await worker.submit(len, "abc") == 3
+        
+        await asyncio.gather(blocker, queued)
+        assert worker.get_stats()["classes"]["background"]["rejected"] == 1
+        worker.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_response_reports_queue(self):
+        """Test generated responses carry their scheduler class and wait"""
+        llm = make_test_llm(FakeModel(delay=0))
+        result = await llm.generate_response("hello", priority="background")
+        
+        assert result['queue']['priority'] == "background"
+        assert result['queue']['queue_position'] == 0
+        assert result['queue']['queue_wait_ms'] >= 0
+        llm.shutdown()
+
+class TestTokenStreaming:
+    """Test incremental extraction and streaming of the response text"""
+    
+    def test_scanner_extracts_response_field(self):
+        """Test the scanner yields only the decoded response value across chunk splits"""
+        raw = 'Sure! {"action": "x", "params": {"response": "no"}, "response": "Line\\n \\"quoted\\" \\u00e9"}'
+        scanner = IncrementalJsonScanner()
+        
+        text = ''.join(scanner.feed(raw[i:i + 2]) for i in range(0, len(raw), 2))
+        
+        assert text == 'Line\n "quoted" \u00e9'
+    
+    @pytest.mark.asyncio
+    async def test_generate_response_streams_deltas(self):
+        """Test on_token receives the response text before generation returns"""
+        llm = make_test_llm(FakeModel(output='{"response": "Hello there", "action": null, "params": {}}', delay=0))
+        
+        deltas = []
+        async def on_token(delta):
+            deltas.append(delta)
+        
+        result = await llm.generate_response("hi", on_token=on_token)
+        
+        assert len(deltas) > 1
+        assert ''.join(deltas) == "Hello there"
+        assert result['response'] == "Hello there"
+        llm.shutdown()
+
+class FakeLLModel:
+    """Mimics the llama.cpp context of a GPT4All model, one token per character"""
+    
+    class Context:
+        def __init__(self):
+            self.n_past = 0
+            self.tokens = []
+            self.tokens_size = 0
+    
+    def __init__(self, output):
+        self.output = output
+        self.context = self.Context()
+        self.evaluated = 0
+    
+    def prompt_model(self, prompt, template, callback, n_predict=200, reset_context=False, **kwargs):
+        if reset_context:
+            self.context.n_past = 0
+        del self.context.tokens[self.context.n_past:]
+        self.context.tokens.extend(ord(c) for c in prompt)
+        self.context.n_past = len(self.context.tokens)
+        self.context.tokens_size = len(self.context.tokens)
+        self.evaluated += len(prompt)
+        if n_predict:
+            callback(0, self.output)
+
+class FakeChatModel:
+    def __init__(self, output):
+        self.model = FakeLLModel(output)
+
+class TestEarlyStop:
+    """Test generation stops once the JSON object is complete"""
+    
+    def test_scanner_detects_closed_object(self):
+        """Test braces inside strings do not close the object"""
+        scanner = IncrementalJsonScanner()
+        scanner.feed('{"response": "use } and {", "params": {"a": [1, 2]')
+        assert not scanner.complete
+        
+        scanner.feed('}} trailing chatter')
+        assert scanner.complete
+        assert json.loads(scanner.object_text)["params"] == {"a": [1, 2]}
+    
+    @pytest.mark.asyncio
+    async def test_trailing_chatter_not_generated(self):
+        """Test the model is stopped at the closing brace and saved tokens are counted"""
+        output = '{"response": "Done", "action": null, "params": {}}' + " Let me know if you need anything else!" * 5
+        llm = make_test_llm(FakeModel(output=output, delay=0))
+        
+        result = await llm.generate_response("hello")
+        result.pop("queue")
+        result.pop("metrics")
+        
+        assert result == {"response": "Done", "action": None, "params": {}}
+        stats = llm.get_early_stop_stats()
+        assert stats['stopped_early'] == 1
+        assert stats['tokens_saved'] > 0
+        llm.shutdown()
+
+class TestActionOnlyMode:
+    """Test answering clear commands with only an action and a templated reply"""
+    
+    def make_llm(self, output):
+        llm = make_test_llm(FakeModel(output=output, delay=0))
+        llm.action_only = {"enabled": True, "max_tokens": 48, "min_score": 4.0, "max_failures": 2}
+        return llm
+    
+    def test_scanner_stops_after_params(self):
+        """Test the object is closed as soon as params is complete"""
+        scanner = IncrementalJsonScanner(stop_after="params")
+        scanner.feed('{"action": "open_app", "params": {"app_name": "x"}, "response": "Opening')
+        assert scanner.complete
+        assert json.loads(scanner.object_text) == {"action": "open_app", "params": {"app_name": "x"}}
+    
+    @pytest.mark.asyncio
+    async def test_command_answered_action_only(self):
+        """Test the model continues the primed object and no response text is generated"""
+        llm = self.make_llm('set_alarm", "params": {"minutes": 5, "message": "Tea"}, "response": "I will remind you')
+        
+        result = await llm.generate_response("Remind me in 5 minutes to make tea")
+        
+        assert result["action_only"] is True
+        assert (result["action"], result["params"], result["response"]) == ("set_alarm", {"minutes": 5, "message": "Tea"}, "")
+        assert llm.model.last_prompt.endswith('JARVIS: {"action": "')
+        assert llm.get_early_stop_stats()["stopped_early"] == 1
+        assert llm.get_action_only_stats()["answered"] == 1
+        assert render_reply(result["action"], result["params"], {"success": True, "message": "ok"}) == \
+            "Reminder set for 5 minutes from now: Tea."
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_chit_chat_not_attempted(self):
+        """Test messages that don't clearly name an action get a full reply"""
+        llm = self.make_llm('{"response": "Hi there", "action": null, "params": {}}')
+        
+        result = await llm.generate_response("How are you today?")
+        
+        assert result["response"] == "Hi there"
+        assert llm.get_action_only_stats()["attempts"] == 0
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_noncompliant_model_falls_back(self):
+        """Test a model ignoring the format gets full replies and stops being asked"""
+        llm = self.make_llm('I am not sure what you mean.')
+        
+        for _ in range(3):
+            result = await llm.generate_response("Open the calculator app")
+            assert "action_only" not in result
+        
+        stats = llm.get_action_only_stats()
+        assert stats["attempts"] == 2
+        assert stats["fallbacks"] == 2
+        assert stats["disabled_models"] == [llm.model_name]
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_unsafe_action_falls_back(self):
+        """Test an action the model may not choose gets a full reply instead"""
+        llm = self.make_llm('delete_document", "params": {"name": "a.txt", "confirm": true}}')
+        
+        result = await llm.generate_response("Open the calculator app")
+        
+        assert "action_only" not in result
+        assert llm.get_action_only_stats()["fallbacks"] == 1
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_command_cached_whatever_the_history(self):
+        """Test clear commands are answered without the conversation and cached on the user turn"""
+        llm = self.make_llm('set_alarm", "params": {"minutes": 5, "message": "Tea"}}')
+        
+        await llm.generate_response("Remind me in 5 minutes to make tea", history="User: hi\nJARVIS: Hello")
+        second = await llm.generate_response("Remind me in 5 minutes to make tea", history="User: thanks")
+        
+        assert "User: hi" not in llm.model.last_prompt
+        assert second["action"] == "set_alarm"
+        assert llm.model.calls == 1
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_conversation_cached_per_history(self):
+        """Test replies that may depend on the conversation are not reused under another one"""
+        llm = self.make_llm('{"response": "Hi there", "action": null, "params": {}}')
+        
+        await llm.generate_response("How are you today?", history="User: hi\nJARVIS: Hello")
+        await llm.generate_response("How are you today?", history="User: hi\nJARVIS: Hello")
+        await llm.generate_response("How are you today?", history="User: I'm sad")
+        
+        assert "User: I'm sad" in llm.model.last_prompt
+        assert llm.model.calls == 2
+        llm.shutdown()
+    
+    def test_failed_action_reports_error(self):
+        """Test the reply for a failed action carries its error"""
+        reply = render_reply("delete_document", {"name": "a.txt"}, {"success": False, "message": "File 'a.txt' not found"})
+        assert reply == "Sorry, I couldn't do that: File 'a.txt' not found"
+
+class CountingRouter:
+    """TaskRouter stand-in that counts executions"""
+    
+    def __init__(self):
+        self.router = TaskRouter()
+        self.executed = []
+    
+    def can_speculate(self, action):
+        return self.router.can_speculate(action)
+    
+    async def execute_action(self, action, params):
+        self.executed.append((action, params))
+        return {"success": True, "message": f"ran {action}"}
+
+
+class TestSpeculativeActions:
+    """Test read-only actions starting before the model has finished"""
+    
+    def test_catalogue_declares_safe_actions(self):
+        """Test only side-effect-free actions may be speculated"""
+        router = TaskRouter()
+        assert router.can_speculate("get_system_info")
+        assert router.can_speculate("list_alarms")
+        assert not router.can_speculate("set_alarm")
+        assert not router.can_speculate("delete_document")
+        assert not router.can_speculate("no_such_action")
+    
+    @pytest.mark.asyncio
+    async def test_action_reported_before_generation_ends(self):
+        """Test the action name is seen while the params are still being generated"""
+        output = '{"response": "Checking", "action": "get_system_info", "params": {}}'
+        llm = make_test_llm(FakeModel(output=output, delay=0, token_delay=0.02))
+        seen = []
+        
+        result = await llm.generate_response(
+            "How busy is my CPU?", on_action=lambda action: seen.append((action, llm.active_generations))
+        )
+        
+        assert result["action"] == "get_system_info"
+        # Still generating when the action was reported
+        assert seen == [("get_system_info", 1)]
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_matching_result_is_reused(self):
+        """Test a speculative run is used when the final action and params match"""
+        router = CountingRouter()
+        speculator = ActionSpeculator(router, lambda message, action: {})
+        
+        speculation = speculator.begin("show my reminders")
+        speculation.start("list_alarms")
+        result = await speculation.result("list_alarms", {})
+        
+        assert result == {"success": True, "message": "ran list_alarms"}
+        assert router.executed == [("list_alarms", {})]
+        assert speculator.get_stats()["used"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_mismatched_params_are_discarded(self):
+        """Test a guess with different params is thrown away"""
+        router = CountingRouter()
+        speculator = ActionSpeculator(router, lambda message, action: {"extension": "txt", "folder": "."})
+        
+        speculation = speculator.begin("find my pdfs")
+        speculation.start("find_files")
+        assert await speculation.result("find_files", {"extension": "pdf", "folder": "."}) is None
+        
+        # Actions with side effects never start early
+        unsafe = speculator.begin("remind me")
+        unsafe.start("set_alarm")
+        assert await unsafe.result("set_alarm", {}) is None
+        
+        stats = speculator.get_stats()
+        assert (stats["started"], stats["used"], stats["discarded"]) == (1, 0, 1)
+
+class TestCancellation:
+    """Test cancelling generations nobody is waiting for"""
+    
+    @pytest.mark.asyncio
+    async def test_cancel_stops_generation(self):
+        """Test a running generation stops at the next token and reports wasted tokens"""
+        import time
+        model = FakeModel(output='{"response": "' + "word " * 40 + '", "action": null, "params": {}}',
+                          delay=0, token_delay=0.01)
+        llm = make_test_llm(model)
+        token = CancellationToken()
+        
+        async def cancel_soon():
+            await asyncio.sleep(0.05)
+            token.cancel("client")
+        
+        started = time.monotonic()
+        result, _ = await asyncio.gather(llm.generate_response("talk", cancel_token=token), cancel_soon())
+        
+        assert result['cancelled'] is True
+        assert result['cancel_reason'] == "client"
+        assert time.monotonic() - started < 0.3
+        stats = llm.get_cancel_stats()
+        assert stats['cancelled'] == 1
+        assert 0 < stats['wasted_tokens'] < 20
+        assert stats['by_reason'] == {"client": 1}
+        assert llm.response_cache.get_stats()['entries'] == 0
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_while_queued_never_runs(self):
+        """Test a queued generation is dropped without touching the model"""
+        model = FakeModel(delay=0.1)
+        llm = make_test_llm(model)
+        token = CancellationToken()
+        
+        first = asyncio.ensure_future(llm.generate_response("first"))
+        second = asyncio.ensure_future(llm.generate_response("second", cancel_token=token))
+        await asyncio.sleep(0.02)
+        token.cancel("superseded")
+        
+        assert (await second)['cancelled'] is True
+        assert (await first)['response'] == "Hello"
+        assert model.calls == 1
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_shared_call_cancelled_only_by_all_callers(self):
+        """Test a coalesced call keeps running until every caller has cancelled"""
+        flights = SingleFlight()
+        seen = []
+        
+        async def answer(publish, cancel_token):
+            seen.append(cancel_token)
+            await asyncio.sleep(0.05)
+            return {"cancelled": cancel_token.cancelled}
+        
+        first, second = CancellationToken(), CancellationToken()
+        calls = asyncio.gather(flights.run("key", answer, cancel_token=first),
+                               flights.run("key", answer, cancel_token=second))
+        await asyncio.sleep(0.01)
+        first.cancel("client")
+        assert not seen[0].cancelled
+        second.cancel("client")
+        
+        assert [result['cancelled'] for result, _ in await calls] == [True, True]
+    
+    def test_supersede_only_within_scope(self):
+        """Test a newer message cancels only an older one from the same scope"""
+        generations = LatestGenerations()
+        first, second, other, unscoped = (CancellationToken() for _ in range(4))
+        
+        generations.begin(None, "hi", unscoped)
+        generations.begin(("ws:a:chat", "interactive"), "hi", first)
+        generations.begin(("ws:b:chat", "interactive"), "bye", other)
+        generations.begin(("ws:a:chat", "background"), "bye", CancellationToken())
+        generations.begin(None, "bye", CancellationToken())
+        assert not any(token.cancelled for token in (first, other, unscoped))
+        
+        # The same message joins the running one; a different one replaces it
+        generations.begin(("ws:a:chat", "interactive"), "hi", first)
+        assert not first.cancelled
+        generations.begin(("ws:a:chat", "interactive"), "bye", second)
+        assert first.reason == "superseded"
+        
+        # The superseded request finishing doesn't forget its replacement
+        generations.end(("ws:a:chat", "interactive"), first)
+        assert generations.latest[("ws:a:chat", "interactive")][1] is second
+        generations.end(("ws:a:chat", "interactive"), second)
+        assert ("ws:a:chat", "interactive") not in generations.latest
+
+class TestInferenceMetrics:
+    """Test per-request token counts and timings"""
+    
+    def test_rolling_histogram(self):
+        """Test percentiles and buckets only cover the most recent samples"""
+        histogram = RollingHistogram([10, 100], window=4)
+        for value in [1000, 5, 50, 50, 500]:
+            histogram.add(value)
+        
+        stats = histogram.get_stats()
+        assert stats['count'] == 5
+        assert stats['window'] == 4
+        assert stats['p50'] == 50
+        assert stats['max'] == 500
+        assert stats['buckets'] == {"<=10": 1, "<=100": 2, "+Inf": 1}
+    
+    @pytest.mark.asyncio
+    async def test_generation_metrics(self):
+        """Test a generation reports queue wait, prompt-eval time, TTFT and decode speed"""
+        model = FakeModel(delay=0.05, token_delay=0.005)
+        llm = make_test_llm(model)
+        
+        first, second = await asyncio.gather(llm.generate_response("one"), llm.generate_response("two"))
+        
+        metrics = second['metrics']
+        assert metrics['prompt_tokens'] > 100
+        assert metrics['generated_tokens'] > 1
+        assert metrics['queue_wait_ms'] >= 40
+        assert metrics['prompt_eval_ms'] >= 40
+        assert metrics['time_to_first_token_ms'] >= metrics['queue_wait_ms'] + metrics['prompt_eval_ms'] - 1
+        assert metrics['tokens_per_second'] > 0
+        assert metrics['total_ms'] >= metrics['time_to_first_token_ms']
+        
+        stats = llm.get_inference_metrics()
+        assert stats['requests'] == 2
+        assert stats['time_to_first_token_ms']['window'] == 2
+        assert stats['last'] == metrics
+        llm.shutdown()
+
+class TestBackgroundLoading:
+    """Test background model loading and readiness reporting"""
+    
+    @pytest.mark.asyncio
+    async def test_status_listeners_see_ready(self):
+        """Test listeners are told when the model becomes ready"""
+        llm = LLMInterface()
+        llm.backend = MockBackend()
+        statuses = []
+        
+        async def listener(status):
+            statuses.append(status)
+        
+        llm.add_status_listener(listener)
+        assert await llm.start_background_load() is True
+        
+        assert statuses[-1]['stage'] == "ready"
+        assert llm.get_load_status()['ready'] is True
+    
+    @pytest.mark.asyncio
+    async def test_requests_answered_while_loading(self):
+        """Test requests during loading get an immediate warming-up reply"""
+        import time
+        llm = make_test_llm(None)
+        llm.model_initialized = False
+        
+        async def slow_initialize():
+            await asyncio.sleep(0.5)
+            return False
+        llm.initialize = slow_initialize
+        
+        started = time.monotonic()
+        result = await llm.generate_response("write me a poem")
+        
+        assert time.monotonic() - started < 0.1
+        assert result['warming_up'] is True
+        assert llm.is_loading
+        llm._load_task.cancel()
+        llm.shutdown()
+
+class FlakyBackend(MockBackend):
+    """Mock backend whose loads fail until ``failing`` is cleared"""
+    
+    def __init__(self):
+        super().__init__()
+        self.failing = True
+        self.loads = 0
+    
+    def load(self, model_name, n_threads=None):
+        self.loads += 1
+        if self.failing:
+            raise RuntimeError("corrupt model file")
+        return super().load(model_name, n_threads)
+
+class TestLoadCircuitBreaker:
+    """Test failed model loads are retried in the background while requests fail fast"""
+    
+    def test_breaker_states_and_backoff(self):
+        """Test the breaker opens, lets one trial through after the backoff, and backs off further"""
+        import time
+        breaker = CircuitBreaker(base_delay=0.05, max_delay=0.08)
+        assert breaker.allow_attempt()
+        
+        breaker.record_failure("boom")
+        assert breaker.state == "open"
+        assert not breaker.allow_attempt()
+        time.sleep(0.06)
+        assert breaker.allow_attempt()
+        assert breaker.state == "half_open"
+        assert not breaker.allow_attempt()
+        
+        breaker.record_failure("boom again")
+        assert breaker.state == "open"
+        assert 0.06 < breaker.retry_in <= 0.08
+        
+        breaker.reset()
+        assert breaker.allow_attempt()
+        assert breaker.get_stats()['times_opened'] == 2
+    
+    @pytest.mark.asyncio
+    async def test_requests_fail_fast_while_retrying(self):
+        """Test requests return immediately while the load is retried in the background"""
+        import time
+        llm = LLMInterface()
+        llm.backend = FlakyBackend()
+        llm.response_cache = ResponseCache(persist_path=None)
+        llm.breaker = CircuitBreaker(base_delay=0.2)
+        
+        assert await llm.start_background_load() is False
+        assert llm.get_breaker_stats()['state'] == "open"
+        
+        started = time.monotonic()
+        result = await llm.generate_response("hello")
+        assert time.monotonic() - started < 0.05
+        assert result['model_unavailable'] is True
+        assert llm.backend.loads == 1
+        
+        # The retry happens without any request triggering it
+        llm.backend.failing = False
+        await asyncio.sleep(0.35)
+        assert llm.backend.loads == 2
+        assert llm.get_load_status()['ready'] is True
+        assert llm.get_breaker_stats()['state'] == "closed"
+        llm.shutdown()
+
+class TestModelResidency:
+    """Test unloading an idle model and reloading it on demand"""
+    
+    async def loaded_llm(self):
+        llm = LLMInterface()
+        llm.backend = MockBackend()
+        llm.response_cache = ResponseCache(persist_path=None)
+        assert await llm.start_background_load() is True
+        return llm
+    
+    @staticmethod
+    def memory(available_mb, percent):
+        from types import SimpleNamespace
+        return lambda: SimpleNamespace(available=available_mb * 1024 * 1024, percent=percent)
+    
+    @pytest.mark.asyncio
+    async def test_idle_unload_and_transparent_reload(self):
+        """Test an idle model is unloaded and the next request reloads it instead of failing"""
+        llm = await self.loaded_llm()
+        monitor = llm.residency
+        monitor.configure(idle_timeout=60, min_available_mb=0, max_memory_percent=100, check_interval=30)
+        monitor.memory_probe = self.memory(8192, 40)
+        
+        assert await monitor.check() is None
+        llm.last_used -= 120
+        assert await monitor.check() == "idle"
+        assert llm.model is None
+        assert llm.get_load_status()['stage'] == "unloaded"
+        
+        result = await llm.generate_response("What can you do?")
+        assert "mock mode" in result['response']
+        assert llm.get_load_status()['ready'] is True
+        assert llm.get_residency_stats()['unloads'] == {"idle": 1, "memory_pressure": 0}
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_memory_pressure_unloads_unless_busy(self):
+        """Test low memory evicts a recently used model, but never one that is generating"""
+        llm = await self.loaded_llm()
+        monitor = llm.residency
+        monitor.configure(idle_timeout=0, min_available_mb=1024, max_memory_percent=90, check_interval=30)
+        monitor.memory_probe = self.memory(512, 80)
+        
+        llm.active_generations = 1
+        assert await monitor.check() is None
+        llm.active_generations = 0
+        assert await monitor.check() == "memory_pressure"
+        assert not llm.is_resident
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_prewarm_reloads(self):
+        """Test a prewarm starts loading an unloaded model"""
+        llm = await self.loaded_llm()
+        assert await llm.unload() is True
+        
+        assert llm.prewarm()['stage'] == "unloaded"
+        assert llm.is_loading
+        assert await llm._load_task is True
+        assert llm.is_resident
+        llm.shutdown()
+
+class TestHotSwap:
+    """Test zero-downtime model swaps from reload_settings"""
+    
+    @pytest.mark.asyncio
+    async def test_swap_keeps_serving_and_drains_old_model(self, monkeypatch):
+        """Test the old model serves until the swap and is closed after its in-flight work"""
+        import llm_backends
+        from settings_manager import settings
+        
+        old_model = FakeModel(output='{"response": "old", "action": null, "params": {}}', delay=0.3)
+        new_model = FakeModel(output='{"response": "new", "action": null, "params": {}}', delay=0)
+        llm = make_test_llm(old_model)
+        llm.model_name = "old.gguf"
+        
+        monkeypatch.setattr(settings, "get_ai_model", lambda: "new.gguf")
+        monkeypatch.setattr(settings, "is_mock_mode", lambda: False)
+        monkeypatch.setattr(llm_backends, "GPT4All", lambda name, **kwargs: new_model)
+        swaps = []
+        async def listener(status):
+            swaps.append(status['state'])
+        llm.add_swap_listener(listener)
+        
+        in_flight = asyncio.ensure_future(llm.generate_response("first"))
+        await asyncio.sleep(0.05)
+        await llm.reload_settings()
+        await llm._swap_task
+        
+        assert llm.model is new_model
+        assert llm.model_name == "new.gguf"
+        assert swaps == ["loading", "warming_up", "swapped"]
+        assert not old_model.closed
+        
+        assert (await in_flight)['response'] == "old"
+        assert (await llm.generate_response("second"))['response'] == "new"
+        assert old_model.closed
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_background_job_queued_before_swap_completes(self, monkeypatch):
+        """Test the old model is closed only after background work queued for it, not ahead of it"""
+        import llm_backends
+        from settings_manager import settings
+        
+        old_model = FakeModel(output='{"response": "old", "action": null, "params": {}}', delay=0.2)
+        new_model = FakeModel(output='{"response": "new", "action": null, "params": {}}', delay=0)
+        llm = make_test_llm(old_model)
+        llm.model_name = "old.gguf"
+        
+        monkeypatch.setattr(settings, "get_ai_model", lambda: "new.gguf")
+        monkeypatch.setattr(settings, "is_mock_mode", lambda: False)
+        monkeypatch.setattr(llm_backends, "GPT4All", lambda name, **kwargs: new_model)
+        
+        running = asyncio.ensure_future(llm.generate_response("first"))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(llm.generate_response("summarise my day", priority="background"))
+        await asyncio.sleep(0.01)
+        await llm.reload_settings()
+        await llm._swap_task
+        
+        assert (await running)['response'] == "old"
+        assert (await queued)['response'] == "old"
+        await asyncio.sleep(0.05)
+        assert old_model.closed
+        llm.shutdown()
+
+class TestActionCatalogue:
+    """Test the shared action registry and per-request prompt selection"""
+
+    def test_router_handlers_match_catalogue(self):
+        """Test TaskRouter runs exactly the catalogued actions"""
+        router = TaskRouter()
+        assert set(router.action_handlers) == {spec.name for spec in ACTIONS}
+        assert set(router.get_available_actions()["actions"]) == {spec.name for spec in ACTIONS}
+
+    def test_prompt_omits_unsafe_actions(self):
+        """Test shell, delete and cancel actions and safety switches never reach the prompt"""
+        catalogue = render_catalogue(ACTIONS, EXAMPLES)
+        for name in ("run_command", "delete_document", "cancel_alarm", "listen"):
+            assert name not in catalogue
+        assert "safe_mode" not in catalogue and "confirm" not in catalogue
+        assert "run_command" not in LLMInterface().system_prompt
+        assert "run_command" not in [spec.name for spec, _ in ActionPrefilter().rank("run ls in the terminal")]
+    
+    def test_prefilter_ranks_relevant_action(self):
+        """Test the expected action survives the top-k prefilter"""
+        prefilter = ActionPrefilter()
+        for text, expected in [("Remind me to call mom in 10 minutes", "set_alarm"),
+                               ("How busy is my CPU right now?", "get_system_info"),
+                               ("Find my pdf files", "find_files")]:
+            actions, examples = prefilter.select(text, 4)
+            assert expected in [spec.name for spec in actions]
+            assert len(actions) == 4
+            # The no-action example is always kept for chit-chat
+            assert examples[-1].action is None
+
+    def test_prompt_lists_only_selected_actions(self):
+        """Test the per-request prompt carries k actions and the preamble none"""
+        llm = LLMInterface()
+        llm.prompt_top_k = 3
+        catalogue = llm.prompt_catalogue("Set an alarm in 5 minutes")
+        assert len([line for line in catalogue.splitlines() if line.startswith("- ")]) == 3
+        assert "set_alarm" in catalogue
+
+        llm.prompt_top_k = 0
+        assert llm.prompt_catalogue("Set an alarm in 5 minutes") == ""
+        assert "Available actions:" in LLMInterface().system_prompt
+
+class TestModelRegistry:
+    """Test keeping recently used models resident under a memory budget"""
+    
+    def test_lru_eviction_within_budget(self):
+        """Test the least recently used idle model is evicted first"""
+        registry = ModelRegistry(budget_mb=100)
+        for name in ["a", "b"]:
+            assert registry.add(ResidentModel(name, object(), None, memory_mb=40)) == []
+        registry.get("a")
+        
+        evicted = registry.add(ResidentModel("c", object(), None, memory_mb=40))
+        assert [entry.name for entry in evicted] == ["b"]
+        assert [m['name'] for m in registry.get_stats()['models']] == ["c", "a"]
+        
+        # Models still generating are never evicted, even over budget
+        registry.get("a").in_flight = 1
+        registry.get("c").in_flight = 1
+        assert registry.add(ResidentModel("d", object(), None, memory_mb=40)) == []
+        assert registry.used_mb == 120
+    
+    @staticmethod
+    async def mock_llm(monkeypatch, loads):
+        from settings_manager import settings
+        original_load = MockBackend.load
+        def counting_load(self, model_name, n_threads=None):
+            loads.append(model_name)
+            return original_load(self, model_name, n_threads)
+        monkeypatch.setattr(MockBackend, "load", counting_load)
+        monkeypatch.setattr(settings, "get_llm_backend_settings", lambda: {"backend": "mock"})
+        
+        llm = LLMInterface("a.gguf")
+        llm.backend, llm.backend_config = MockBackend(), {"backend": "mock"}
+        llm.response_cache = ResponseCache(persist_path=None)
+        llm.registry.set_budget(64 * 1024)
+        assert await llm.start_background_load() is True
+        return llm
+    
+    @pytest.mark.asyncio
+    async def test_switching_back_is_instant(self, monkeypatch):
+        """Test a model swapped out stays resident and swapping back does not reload it"""
+        from settings_manager import settings
+        loads = []
+        llm = await self.mock_llm(monkeypatch, loads)
+        
+        for name in ["b.gguf", "a.gguf"]:
+            monkeypatch.setattr(settings, "get_ai_model", lambda name=name: name)
+            await llm.reload_settings()
+            await llm._swap_task
+            assert llm.model_name == name
+        
+        assert loads == ["a.gguf", "b.gguf"]
+        stats = llm.get_resident_model_stats()
+        assert [(m['name'], m['serving']) for m in stats['models']] == [("a.gguf", True), ("b.gguf", False)]
+        assert all(m['memory_mb'] >= 0 for m in stats['models'])
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_request_selects_model(self, monkeypatch):
+        """Test a request can ask for another model, which is loaded once and kept resident"""
+        loads = []
+        llm = await self.mock_llm(monkeypatch, loads)
+        
+        results = await asyncio.gather(
+            llm.generate_response("What can you do?", model_name="small.gguf"),
+            llm.generate_response("Tell me more", model_name="small.gguf")
+        )
+        assert all("mock mode" in result['response'] for result in results)
+        assert loads == ["a.gguf", "small.gguf"]
+        assert llm.model_name == "a.gguf"
+        
+        models = {m['name']: m for m in llm.get_resident_model_stats()['models']}
+        assert models["small.gguf"]['requests'] == 2
+        assert models["small.gguf"]['in_flight'] == 0
+        llm.shutdown()
+
+class TestModelPool:
+    """Test parallel generation on a pool of model instances"""
+    
+    def test_core_slices(self):
+        """Test cores are split evenly and reused when there are more instances than cores"""
+        assert plan_core_slices(4, list(range(8))) == [[0, 1], [2, 3], [4, 5], [6, 7]]
+        assert plan_core_slices(3, [0, 1]) == [[0], [1], [0]]
+    
+    @pytest.mark.asyncio
+    async def test_dispatches_to_least_loaded(self):
+        """Test concurrent requests run on different instances with per-slice threads"""
+        threads = []
+        
+        def create_model(n_threads):
+            threads.append(n_threads)
+            return FakeModel(delay=0.2)
+        
+        pool = ModelPool.load(create_model, 2, "SYSTEM", cores=[0, 0])
+        await pool.start()
+        
+        await asyncio.gather(pool.generate("a"), pool.generate("b"))
+        
+        assert threads == [1, 1]
+        assert [member.model.calls for member in pool.members] == [1, 1]
+        assert pool.get_stats()['dispatched'] == 2
+        pool.close()
+    
+    @pytest.mark.asyncio
+    async def test_llm_interface_uses_pool(self):
+        """Test LLMInterface spreads requests over the pool"""
+        pool = ModelPool.load(lambda n_threads: FakeModel(delay=0.1), 2, "SYSTEM", cores=[0])
+        llm = make_test_llm(pool.members[0].model)
+        llm.pool = pool
+        
+        results = await asyncio.gather(llm.generate_response("one"), llm.generate_response("two"))
+        
+        assert [r['response'] for r in results] == ["Hello", "Hello"]
+        assert [i['completed'] for i in llm.get_pool_stats()['instances']] == [1, 1]
+        llm.shutdown()
+
+def make_completion_server(output):
+    """Local stand-in for an OpenAI-compatible completions server"""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+        
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            body = json.dumps({"data": [{"id": "test-model"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.server.requests.append((self.path, request))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            
+            events = [{"choices": [{"text": output[i:i + 3]}]} for i in range(0, len(output), 3)]
+            try:
+                for event in events:
+                    self.write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+                self.write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+        
+        def write_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.connections = 0
+    server.requests = []
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class TestLLMBackends:
+    """Test the mock and OpenAI-compatible HTTP backends"""
+    
+    OUTPUT = '{"response": "From the server", "action": null, "params": {}}'
+    
+    @pytest.fixture
+    def server(self):
+        server = make_completion_server(self.OUTPUT)
+        yield server
+        server.shutdown()
+        server.server_close()
+    
+    @pytest.mark.asyncio
+    async def test_mock_backend_goes_through_pipeline(self):
+        """Test mock answers are generated, streamed and parsed like model output"""
+        llm = make_test_llm(None)
+        llm.backend = MockBackend()
+        llm.model_initialized = False
+        assert await llm.start_background_load() is True
+        
+        deltas = []
+        async def on_token(delta):
+            deltas.append(delta)
+        result = await llm.generate_response("remind me to stretch", on_token=on_token)
+        
+        assert result['action'] == "set_alarm"
+        assert "".join(deltas) == result['response']
+        llm.shutdown()
+    
+    def test_mock_latency_model(self):
+        """Test the mock charges prompt evaluation once per prefix and paces tokens"""
+        import time
+        from llm_backends import MockModel
+        model = MockModel(prompt_eval_ms=1.0, tokens_per_second=100, jitter=0.0)
+        prefix = "x" * 400
+        times = []
+        
+        started = time.monotonic()
+        model.generate_with_prefix(prefix, "\nUser: hello\nJARVIS:",
+                                   callback=lambda token_id, t: times.append(time.monotonic()) is None)
+        first = time.monotonic() - started
+        started = time.monotonic()
+        model.generate_with_prefix(prefix, "\nUser: hello\nJARVIS:")
+        second = time.monotonic() - started
+        
+        tokens = len(times)
+        assert first >= 0.1 + tokens / 100
+        assert first - second >= 0.09
+        assert times[-1] - times[0] >= (tokens - 1) / 100 * 0.9
+        assert model.get_stats()['generated_tokens'] == 2 * tokens
+    
+    @pytest.mark.asyncio
+    async def test_mock_failure_rate(self):
+        """Test simulated failures surface as errors and are counted"""
+        from llm_backends import MockModel
+        model = MockModel(failure_rate=1.0, seed=1)
+        with pytest.raises(RuntimeError):
+            model.generate("User: hi\nJARVIS:")
+        
+        llm = make_test_llm(model)
+        result = await llm.generate_response("hello")
+        
+        assert "error" in result['response']
+        assert model.get_stats()['failures'] == 2
+        llm.shutdown()
+    
+    def test_http_backend_streams_over_one_connection(self, server):
+        """Test completions stream token by token and reuse a keep-alive connection"""
+        backend = OpenAICompatibleBackend(f"http://127.0.0.1:{server.server_port}/v1")
+        backend.locate("test-model")
+        model = backend.load("test-model")
+        
+        tokens = []
+        for _ in range(3):
+            tokens = []
+            text = model.generate("prompt", callback=lambda token_id, t: tokens.append(t) is None,
+                                  max_tokens=64, temp=0.3, repeat_penalty=1.1)
+            assert text == self.OUTPUT
+        
+        assert tokens[0] == '{"r'
+        path, request = server.requests[-1]
+        assert path == "/v1/completions"
+        assert request["stream"] is True
+        assert request["temperature"] == 0.3
+        assert request["repeat_penalty"] == 1.1
+        assert model.get_stats() == {"requests": 3, "connections_opened": 1}
+        model.close()
+    
+    def test_http_backend_stops_early(self, server):
+        """Test returning False from the callback ends the completion"""
+        model = OpenAICompatibleBackend(f"http://127.0.0.1:{server.server_port}/v1").load("test-model")
+        
+        tokens = []
+        text = model.generate("prompt", callback=lambda token_id, t: tokens.append(t) or len(tokens) < 2)
+        
+        assert text == self.OUTPUT[:6]
+        assert model.generate("prompt") == self.OUTPUT
+        model.close()
+    
+    @pytest.mark.asyncio
+    async def test_llm_interface_with_http_backend(self, server):
+        """Test LLMInterface loads and answers through the HTTP backend"""
+        llm = make_test_llm(None)
+        llm.backend = OpenAICompatibleBackend(f"http://127.0.0.1:{server.server_port}/v1")
+        llm.model_initialized = False
+        assert await llm.start_background_load() is True
+        
+        result = await llm.generate_response("hello there")
+        
+        assert result['response'] == "From the server"
+        llm.shutdown()
+
+class TestPromptPrefixCache:
+    """Test reuse of the evaluated system prompt"""
+    
+    def test_prefix_evaluated_once(self):
+        """Test only the user turn is evaluated after the first request"""
+        cache = PromptPrefixCache("SYSTEM PROMPT")
+        model = FakeChatModel("{}")
+        
+        assert cache.generate(model, "\nUser: one\nJARVIS:", max_tokens=10) == "{}"
+        evaluated_first = model.model.evaluated
+        cache.generate(model, "\nUser: two\nJARVIS:", max_tokens=10)
+        
+        assert model.model.evaluated - evaluated_first == len("\nUser: two\nJARVIS:")
+        assert cache.get_stats()['hits'] == 1
+        assert cache.get_stats()['misses'] == 1
+    
+    def test_invalidated_for_new_model(self):
+        """Test a different model instance re-ingests the prefix"""
+        cache = PromptPrefixCache("SYSTEM PROMPT")
+        cache.generate(FakeChatModel("{}"), "a")
+        cache.generate(FakeChatModel("{}"), "b")
+        
+        assert cache.get_stats()['misses'] == 2
+    
+    def test_fallback_without_context_api(self):
+        """Test models without a context API get the full prompt"""
+        cache = PromptPrefixCache("SYSTEM")
+        model = FakeModel(output="ok", delay=0)
+        
+        assert cache.generate(model, " user") == "ok"
+        assert cache.get_stats()['fallbacks'] == 1
+
+class ProcessFakeModel(FakeModel):
+    """Model hosted by the inference process tests; "crash" in a prompt kills the process"""
+    
+    def generate(self, prompt, callback=None, **kwargs):
+        if "crash" in prompt:
+            os._exit(1)
+        if "big" in prompt:
+            return "x" * (SHM_THRESHOLD * 2)
+        return super().generate(prompt, callback=callback, **kwargs)
+
+def make_process_model(model_name, n_threads=None):
+    # Paced tokens, so a cancel from the parent arrives before the output runs out
+    return ProcessFakeModel(output='{"response": "from child", "action": null, "params": {}}', delay=0, token_delay=0.01)
+
+class TestInferenceProcess:
+    """Test hosting the model in a separate process"""
+    
+    @pytest.fixture
+    def process(self):
+        process = InferenceProcess("fake", factory="test_backend:make_process_model", watchdog_interval=0.2)
+        yield process
+        process.close()
+    
+    def test_generate_streams_tokens(self, process):
+        """Test tokens stream back and generation can be stopped early"""
+        tokens = []
+        text = process.generate("hi", callback=lambda token_id, t: tokens.append(t) or len(tokens) < 2)
+        
+        assert process.get_stats()['pid'] != os.getpid()
+        assert tokens[0] == '{"r'
+        assert len(text) < len('{"response": "from child", "action": null, "params": {}}')
+        assert process.generate("hi") == '{"response": "from child", "action": null, "params": {}}'
+    
+    def test_large_output_uses_shared_memory(self, process):
+        """Test results above the threshold come back intact"""
+        assert process.generate("big") == "x" * (SHM_THRESHOLD * 2)
+    
+    def test_restarts_after_crash(self, process):
+        """Test a crash fails the request and the process is restarted"""
+        import time
+        with pytest.raises(InferenceProcessDied):
+            process.generate("crash")
+        
+        deadline = time.monotonic() + 10
+        while process.restarts == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        
+        assert process.restarts == 1
+        assert "from child" in process.generate("hi")
+    
+    @pytest.mark.asyncio
+    async def test_llm_interface_uses_process(self, process):
+        """Test LLMInterface generates through the process with the same API"""
+        llm = make_test_llm(process)
+        
+        result = await llm.generate_response("hello there")
+        
+        assert result['response'] == "from child"
+        assert llm.get_prompt_cache_stats()['hits'] == 1
+        llm.shutdown()
+
+class TestResponseCache:
+    """Test the LRU/TTL response cache"""
+    
+    def test_normalized_hit(self):
+        """Test trivially different phrasings share an entry"""
+        cache = ResponseCache()
+        params = {"max_tokens": 256, "temp": 0.3}
+        cache.put(cache.make_key("List my alarms", "m", params), {"response": "ok"})
+        
+        assert cache.get(cache.make_key("  list my   alarms? ", "m", params)) == {"response": "ok"}
+        assert cache.get(cache.make_key("list my alarms", "other-model", params)) is None
+        assert cache.get(cache.make_key("list my alarms", "m", {"max_tokens": 64, "temp": 0.3})) is None
+        assert cache.get_stats()['hits'] == 1
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test the cache stays bounded and expires entries"""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", {"response": "a"})
+        cache.put("b", {"response": "b"})
+        cache.get("a")
+        cache.put("c", {"response": "c"})
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        
+        expiring = ResponseCache(ttl_seconds=-1)
+        expiring.put("x", {"response": "x"})
+        assert expiring.get("x") is None
+        assert expiring.get_stats()['expirations'] == 1
+    
+    def test_persistence(self, tmp_path):
+        """Test entries survive a restart"""
+        path = tmp_path / "cache.json"
+        cache = ResponseCache(persist_path=str(path))
+        cache.put("k", {"response": "saved"})
+        cache.flush()
+        
+        assert ResponseCache(persist_path=str(path)).get("k") == {"response": "saved"}
+    
+    def test_writes_debounced(self, tmp_path):
+        """Test a burst of inserts is written once, after the delay, not on every put"""
+        import time
+        path = tmp_path / "cache.json"
+        cache = ResponseCache(persist_path=str(path), save_delay=0.1)
+        for i in range(20):
+            cache.put(str(i), {"response": str(i)})
+        
+        assert not path.exists()
+        time.sleep(0.3)
+        assert len(json.loads(path.read_text())) == 20
+    
+    def test_case_kept_for_params(self):
+        """Test inputs differing in case share replies, but never another casing's params"""
+        cache = ResponseCache()
+        params = {"max_tokens": 256, "temp": 0.3}
+        cache.put(cache.make_key("Open Report.txt", "m", params),
+                  {"response": "ok", "action": "read_document", "params": {"name": "Report.txt"}})
+        cache.put(cache.make_key("What time is it", "m", params), {"response": "noon", "action": None, "params": {}})
+        
+        assert cache.get(cache.make_key("open report.txt", "m", params)) is None
+        assert cache.get(cache.make_key("Open Report.txt", "m", params))["params"] == {"name": "Report.txt"}
+        assert cache.get(cache.make_key("what time is it", "m", params))["response"] == "noon"
+    
+    @pytest.mark.asyncio
+    async def test_generate_response_uses_cache(self):
+        """Test a repeated utterance skips generation"""
+        model = FakeModel(delay=0)
+        llm = make_test_llm(model)
+        
+        first = await llm.generate_response("What can you do?")
+        second = await llm.generate_response("what can you do")
+        
+        # Cached answers never waited in the scheduler
+        assert "queue" not in second and "metrics" not in second
+        first.pop("queue")
+        first.pop("metrics")
+        assert first == second
+        assert model.calls == 1
+        llm.shutdown()
+
+class TestSemanticCache:
+    """Test the embedding nearest-neighbour cache"""
+    
+    def test_threshold(self):
+        """Test only sufficiently similar vectors hit"""
+        cache = SemanticCache(dim=3, capacity=4, threshold=0.9)
+        cache.add([1.0, 0.0, 0.0], {"response": "status"})
+        
+        assert cache.lookup([0.95, 0.1, 0.0])["response"] == "status"
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+    
+    def test_capacity_eviction(self):
+        """Test the least recently used entry is overwritten when full"""
+        cache = SemanticCache(dim=2, capacity=2, threshold=0.99)
+        cache.add([1.0, 0.0], {"response": "a"})
+        cache.add([0.0, 1.0], {"response": "b"})
+        cache.lookup([1.0, 0.0])
+        cache.add([-1.0, 0.0], {"response": "c"})
+        
+        assert cache.size == 2
+        assert cache.lookup([0.0, 1.0]) is None
+        assert cache.lookup([1.0, 0.0])["response"] == "a"
+        assert cache.get_stats()['evictions'] == 1
+    
+    def test_indexed_lookup(self):
+        """Test lookups still find entries once the inverted index is built"""
+        import numpy as np
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((200, 16))
+        cache = SemanticCache(dim=16, capacity=300, threshold=0.99, n_lists=8, nprobe=2)
+        for i, vector in enumerate(vectors):
+            cache.add(vector, {"response": str(i)})
+        
+        assert cache.get_stats()['indexed'] is True
+        assert cache.lookup(vectors[123])["response"] == "123"
+    
+    def semantic_llm(self, monkeypatch, output):
+        """LLMInterface whose embedder maps every utterance to the same vector"""
+        from settings_manager import settings
+        monkeypatch.setattr(settings, "get_semantic_cache_settings",
+                            lambda: {"enabled": True, "capacity": 16, "threshold": 0.9})
+        llm = make_test_llm(FakeModel(output=output, delay=0))
+        llm.response_cache.put = lambda key, value: None
+        
+        class Embedder:
+            def embed(self, text):
+                return [1.0, 0.0, 0.0]
+        llm.embedder = Embedder()
+        return llm
+    
+    @pytest.mark.asyncio
+    async def test_paraphrase_naming_another_target_misses(self, monkeypatch):
+        """Test a cached action is not reused for an utterance that doesn't name its params"""
+        llm = self.semantic_llm(monkeypatch, '{"response": "Opening", "action": "open_app", "params": {"app_name": "Spotify"}}')
+        
+        await llm.generate_response("Open Spotify please")
+        same = await llm.generate_response("Could you open Spotify")
+        assert same["params"] == {"app_name": "Spotify"}
+        assert llm.model.calls == 1
+        
+        await llm.generate_response("Could you open Slack")
+        assert llm.model.calls == 2
+        llm.shutdown()
+    
+    def test_lookup_keyed_on_model(self, monkeypatch):
+        """Test an answer cached for one model is not returned for another"""
+        llm = self.semantic_llm(monkeypatch, "")
+        llm._semantic_lookup("show system info", [1.0, 0.0, 0.0], "gpt4all:a.gguf")
+        llm.semantic_cache.add([1.0, 0.0, 0.0], {"input": "show system info", "model": "gpt4all:a.gguf",
+                                                 "result": {"action": "get_system_info", "params": {}}})
+        
+        assert llm._semantic_lookup("show the system info", [1.0, 0.0, 0.0], "gpt4all:a.gguf") is not None
+        assert llm._semantic_lookup("show the system info", [1.0, 0.0, 0.0], "gpt4all:b.gguf") is None
+        llm.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_embedder_never_downloads(self, monkeypatch):
+        """Test a missing embedding model disables the semantic cache instead of being downloaded"""
+        import llm_interface
+        calls = []
+        def missing(**kwargs):
+            calls.append(kwargs)
+            raise ValueError("Failed to retrieve model")
+        monkeypatch.setattr(llm_interface, "Embed4All", missing)
+        llm = make_test_llm(FakeModel(delay=0))
+        
+        assert await llm._embed("hello") is None
+        assert await llm._embed("hello again") is None
+        assert calls == [{"allow_download": False}]
+        llm.shutdown()
+
+class TestSessionStore:
+    """Test conversation sessions and token-budgeted context"""
+    
+    def test_context_fits_budget(self):
+        """Test only the most recent turns that fit the budget are included"""
+        store = SessionStore(count_tokens=lambda text: 10)
+        for i in range(5):
+            store.add_exchange("s1", f"question {i}", f"answer {i}", "get_system_info" if i == 4 else None)
+        
+        context = store.build_context("s1", token_budget=40)
+        
+        assert context.splitlines() == [
+            "User: question 3", "JARVIS: answer 3",
+            "User: question 4", "JARVIS: answer 4 [action: get_system_info]"
+        ]
+        assert store.build_context("other", token_budget=40) == ""
+    
+    def test_old_turns_summarized(self):
+        """Test sessions stay bounded and old requests survive as a summary"""
+        store = SessionStore(max_turns=4)
+        for i in range(6):
+            store.add_exchange("s1", f"question {i}", f"answer {i}")
+        
+        session = store.get_session("s1")
+        assert len(session['turns']) == 4
+        assert "question 0" in session['summary']
+        assert store.build_context("s1", 1000).startswith("Earlier in this conversation:")
+    
+    def test_persistence(self, tmp_path):
+        """Test sessions survive a restart"""
+        path = str(tmp_path / "sessions.json")
+        SessionStore(persist_path=path).add_exchange("s1", "hi", "hello")
+        
+        assert "User: hi" in SessionStore(persist_path=path).build_context("s1", 100)
+    
+    @pytest.mark.asyncio
+    async def test_context_reaches_prompt(self):
+        """Test conversation context is placed before the user turn"""
+        model = FakeModel(delay=0)
+        llm = make_test_llm(model)
+        
+        await llm.generate_response("and now?", context="User: hi\nJARVIS: hello")
+        
+        assert model.last_prompt.endswith("User: hi\nJARVIS: hello\n\nUser: and now?\nJARVIS:")
+        llm.shutdown()
+
+class TestSingleFlight:
+    """Test coalescing of identical in-flight requests"""
+    
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_call(self):
+        """Test concurrent callers with the same key run the call once and all get tokens"""
+        flights = SingleFlight()
+        calls = []
+        
+        async def answer(publish, cancel_token):
+            calls.append(1)
+            await publish("Hel")
+            await asyncio.sleep(0.05)
+            await publish("lo")
+            return {"response": "Hello", "action": "set_alarm"}
+        
+        leader_tokens, joiner_tokens = [], []
+        
+        async def leader_token(delta):
+            leader_tokens.append(delta)
+        
+        async def joiner_token(delta):
+            joiner_tokens.append(delta)
+        
+        async def join_late():
+            await asyncio.sleep(0.01)
+            return await flights.run("key", answer, joiner_token)
+        
+        (first, first_shared), (second, second_shared) = await asyncio.gather(
+            flights.run("key", answer, leader_token), join_late()
+        )
+        
+        assert len(calls) == 1
+        assert first == second == {"response": "Hello", "action": "set_alarm"}
+        assert (first_shared, second_shared) == (False, True)
+        assert leader_tokens == joiner_tokens == ["Hel", "lo"]
+        assert flights.get_stats() == {"in_flight": 0, "started": 1, "coalesced": 1}
+    
+    @pytest.mark.asyncio
+    async def test_different_keys_and_later_requests_run_again(self):
+        """Test only concurrent calls with the same key are shared"""
+        flights = SingleFlight()
+        calls = []
+        
+        async def answer(publish, cancel_token):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"response": "ok"}
+        
+        await asyncio.gather(flights.run("a", answer), flights.run("b", answer))
+        await flights.run("a", answer)
+        
+        assert len(calls) == 3
+    
+    @pytest.mark.asyncio
+    async def test_leader_cancel_keeps_call_running(self):
+        """Test a caller going away does not cancel the call for the others"""
+        flights = SingleFlight()
+        
+        async def answer(publish, cancel_token):
+            await asyncio.sleep(0.05)
+            return {"response": "done"}
+        
+        leader = asyncio.ensure_future(flights.run("key", answer))
+        await asyncio.sleep(0)
+        joiner = asyncio.ensure_future(flights.run("key", answer))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        
+        result, shared = await joiner
+        assert result == {"response": "done"}
+        assert shared
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_replay_joins_generation(self, tmp_path, monkeypatch):
+        """Test a message resent on a new connection in the same session shares the running answer"""
+        monkeypatch.chdir(tmp_path)
+        import ipc_server
+        model = FakeModel(output='{"response": "Once upon a time", "action": null, "params": {}}', delay=0.1)
+        monkeypatch.setattr(ipc_server, "llm", make_test_llm(model))
+        monkeypatch.setattr(ipc_server, "sessions", SessionStore())
+        
+        dropped = CancellationToken()
+        first = asyncio.ensure_future(ipc_server.process_chat(
+            "Tell me a story", session_id="desktop", cancel_token=dropped, supersede_scope="ws:old:desktop"
+        ))
+        await asyncio.sleep(0.02)
+        replay = asyncio.ensure_future(ipc_server.process_chat(
+            "Tell me a story ", session_id="desktop", supersede_scope="ws:new:desktop"
+        ))
+        await asyncio.sleep(0.02)
+        # The old connection's grace period ends while the replay is waiting
+        dropped.cancel("disconnected")
+        
+        result = await replay
+        assert result["response"] == "Once upon a time"
+        assert result["coalesced"] is True
+        assert (await first)["response"] == "Once upon a time"
+        assert model.calls == 1
+        ipc_server.llm.shutdown()
+
 class TestIntentParser:
     """Test intent parsing functionality"""
     
@@ -62,6 +1639,18 @@ class TestIntentParser:
         assert result['params']['name'] == "test.txt"
         assert result['response'] == "Creating document..."
     
+    def test_model_cannot_pick_unsafe_actions(self):
+        """Test shell and delete actions from model output are not run, and safety switches are dropped"""
+        result = self.parser.parse_intent({
+            "response": "", "action": "run_command", "params": {"command": "echo hi; id", "safe_mode": False}
+        })
+        assert result['action'] != "run_command"
+        
+        result = self.parser.parse_intent({
+            "response": "", "action": "read_document", "params": {"name": "a.txt", "confirm": True}
+        })
+        assert result == {'action': "read_document", 'params': {"name": "a.txt"}, 'response': ""}
+    
     def test_keyword_matching(self):
         """Test fallback keyword matching"""
         response = {"response": "I will create a new document for you"}
@@ -76,6 +1665,69 @@ class TestIntentParser:
         
         assert "name" in params
         assert "content" in params
+    
+    def test_fast_path_confident_command(self):
+        """Test unambiguous commands are answered without the LLM"""
+        result = self.parser.fast_path("set a reminder in 10 minutes to call mom")
+        
+        assert result['action'] == "set_alarm"
+        assert result['params'] == {"minutes": 10, "message": "call mom"}
+        assert "10 minutes" in result['response']
+        assert self.parser.fast_path("get system info")['action'] == "get_system_info"
+    
+    def test_fast_path_threshold(self):
+        """Test weak or missing rule matches fall through to the LLM"""
+        assert self.parser.fast_path("what's the weather like?") is None
+        assert self.parser.classify("remind me about the meeting")['confidence'] < 0.9
+        assert self.parser.fast_path("remind me about the meeting") is None
+        assert self.parser.fast_path("remind me about the meeting", threshold=0.5)['action'] == "set_alarm"
+    
+    def test_fast_path_stats(self):
+        """Test short-circuited requests and saved time are recorded"""
+        self.parser.record_fast_path(0.001, 2.0)
+        
+        stats = self.parser.get_fast_path_stats()
+        assert stats['short_circuited'] == 1
+        assert stats['time_saved_ms'] == pytest.approx(1999.0, abs=0.1)
+
+class TestIntentMatcher:
+    """Test the compiled, literal-prefiltered intent matching engine"""
+    
+    def test_required_literals(self):
+        """Test every match must contain one of the extracted literals"""
+        assert required_literals(r'remind.*me|set.*(?:alarm|timer)') == {"remind", "alarm", "timer"}
+        assert required_literals(r'^(?:please\s+)?(?:set|create)\s+(?:reminder|alarm)') == {"reminder", "alarm"}
+        # An optional part guarantees nothing
+        assert required_literals(r'(?:hello)?\d+') is None
+    
+    def test_automaton_finds_overlapping_literals(self):
+        """Test literals inside other literals are all reported"""
+        automaton = LiteralAutomaton(["he", "she", "hers", "in", "find"])
+        assert automaton.find("ushers find") == {"he", "she", "hers", "in", "find"}
+        assert automaton.find("xyz") == set()
+    
+    def test_scores_all_candidates(self):
+        """Test the best match wins regardless of declaration order"""
+        matcher = IntentMatcher({
+            "weak": [(r'remind', 0.5)],
+            "strong": [(r'remind\s+me\s+in\s+\d+', 0.9)],
+            "other": [(r'cpu.*usage', 1.0)]
+        })
+        assert matcher.match("remind me in 5 minutes") == [("strong", 0.9), ("weak", 0.5)]
+        assert matcher.match("hello") == []
+    
+    def test_only_candidate_patterns_run(self):
+        """Test the prefilter skips patterns whose literals are absent"""
+        patterns = {f"action_{i}": [(rf'verb{i}.*noun{i}', 1.0)] for i in range(200)}
+        matcher = IntentMatcher(patterns)
+        assert matcher.candidates("verb7 the noun7") == [7]
+        assert matcher.match("verb7 the noun7") == [("action_7", 1.0)]
+    
+    def test_keyword_match_prefers_leading_verb(self):
+        """Test ties go to the action whose match starts first"""
+        parser = IntentParser()
+        assert parser._keyword_match("write a file about my system status")["action"] == "create_document"
+        assert parser._keyword_match("start the music app in 5 minutes")["action"] == "open_app"
 
 class TestFileTasks:
     """Test file operation tasks"""